@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Agendador das tarefas de obter_proposicoes.
+
+Os tipos e anos pedidos na linha de comando viram tarefas (tipo, ano), que são
+executadas por várias threads ao mesmo tempo. O estado de cada tarefa
+(pendente, executando, concluida ou falhou) é salvo num arquivo json, para
+que as tarefas que falharam possam ser executadas de novo sozinhas, com a
+opção -refazer_falhas.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+
+
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+
+
+def nome_tarefa(tipo, ano):
+    """
+    Nome de uma tarefa no arquivo de estado. Ex.: 'PL_2011'.
+    Args:
+        tipo (str)
+        ano (int)
+    """
+    return '{}_{}'.format(tipo, ano)
+
+
+def expandir_tarefas(tipos, anos):
+    """
+    Expande tipos e anos em tarefas (tipo, ano).
+    Args:
+        tipos (list)
+        anos (list)
+    Return:
+        tarefas (list): lista de (tipo, ano).
+    """
+    return [(tipo, ano) for tipo in tipos for ano in anos]
+
+
+class AgendadorTarefas:
+    """
+    Executa tarefas (tipo, ano) num pool de threads e registra o estado de
+    cada uma.
+    """
+
+
+    def __init__(self, executar, caminho='down_files/tarefas_proposicoes.json'):
+        """
+        Método construtor. Carrega o estado salvo, se existir.
+        Args:
+            executar (function): recebe (tipo, ano) e executa a tarefa.
+            caminho (str): arquivo json com o estado das tarefas.
+        """
+        self.executar = executar
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        self.tarefas = {}
+        if os.path.isfile(caminho):
+            with open(caminho, encoding='utf-8') as arq:
+                self.tarefas = json.load(arq)
+
+
+    def falhas(self):
+        """
+        Retorna as tarefas que falharam na última execução.
+        Return:
+            tarefas (list): lista de (tipo, ano). Inclui as que ficaram
+                executando, caso o processo tenha sido interrompido.
+        """
+        return [(tarefa['tipo'], tarefa['ano'])
+                for tarefa in self.tarefas.values()
+                if tarefa['estado'] in (FALHOU, EXECUTANDO)]
+
+
+    def _atualizar(self, tipo, ano, **campos):
+        """
+        Altera o estado de uma tarefa e salva o arquivo.
+        Args:
+            tipo (str)
+            ano (int)
+            campos: campos da tarefa a alterar.
+        """
+        with self._trava:
+            tarefa = self.tarefas.setdefault(
+                nome_tarefa(tipo, ano),
+                {'tipo': tipo, 'ano': ano, 'tentativas': 0})
+            tarefa.update(campos)
+            self._salvar()
+
+
+    def _salvar(self):
+        """
+        Grava o estado das tarefas (num temporário, que depois é renomeado).
+        """
+        pasta = os.path.dirname(self.caminho) or '.'
+        with tempfile.NamedTemporaryFile('w', dir=pasta, delete=False,
+                                         encoding='utf-8') as tmp:
+            json.dump(self.tarefas, tmp, indent=2, sort_keys=True)
+        os.replace(tmp.name, self.caminho)
+
+
+    def _executar_tarefa(self, tipo, ano):
+        """
+        Executa uma tarefa e registra o resultado. Um erro não interrompe as
+        outras tarefas.
+        Args:
+            tipo (str)
+            ano (int)
+        Return:
+            sucesso (boolean)
+        """
+        tentativas = self.tarefas[nome_tarefa(tipo, ano)]['tentativas'] + 1
+        self._atualizar(tipo, ano, estado=EXECUTANDO, tentativas=tentativas,
+                        inicio=time.time(), fim=None, erro=None)
+        try:
+            self.executar(tipo, ano)
+        except Exception:
+            self._atualizar(tipo, ano, estado=FALHOU, fim=time.time(),
+                            erro=traceback.format_exc())
+            print('Tarefa {} {} falhou'.format(tipo, ano))
+            return False
+        self._atualizar(tipo, ano, estado=CONCLUIDA, fim=time.time())
+        return True
+
+
+    def executar_tarefas(self, tarefas, trabalhadores=1):
+        """
+        Executa as tarefas no pool de threads.
+        Args:
+            tarefas (list): lista de (tipo, ano).
+            trabalhadores (int): número de tarefas executadas ao mesmo tempo.
+        Return:
+            falhas (list): lista de (tipo, ano) que falharam.
+        """
+        for tipo, ano in tarefas:
+            self._atualizar(tipo, ano, estado=PENDENTE)
+        with ThreadPoolExecutor(max_workers=max(1, trabalhadores)) as executor:
+            resultados = list(executor.map(lambda tarefa:
+                                           self._executar_tarefa(*tarefa),
+                                           tarefas))
+        return [tarefa for tarefa, sucesso in zip(tarefas, resultados)
+                if not sucesso]
@@ -0,0 +1,488 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Banco SQLite com os deputados e as proposições já baixados.
+
+Os objetos são gravados em tabelas normalizadas (os tipos, regimes,
+apreciações, órgãos, situações e partidos ficam em tabelas próprias, e as
+listas, como as apensadas e os períodos de exercício, em tabelas filhas), com
+índices para as consultas mais comuns:
+    banco = BancoSQLite()
+    banco.proposicoes_do_autor('141428', ano=2015, sigla='PL')
+A data de apresentação é gravada como AAAA-MM-DD, para que as buscas por
+período usem o índice.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import argparse
+import os
+import pickle as pkl
+import sqlite3
+from indice_proposicoes import carrega_proposicoes
+from indice_proposicoes import chave_proposicao
+from obter_proposicoes import arquivo_proposicoes
+
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tipos_proposicao (
+    id TEXT PRIMARY KEY, sigla TEXT, nome TEXT);
+CREATE TABLE IF NOT EXISTS orgaos_numeradores (
+    id TEXT PRIMARY KEY, sigla TEXT, nome TEXT);
+CREATE TABLE IF NOT EXISTS regimes (
+    id TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS apreciacoes (
+    id TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS situacoes (
+    id TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS orgaos (
+    id TEXT PRIMARY KEY, sigla TEXT);
+CREATE TABLE IF NOT EXISTS partidos (
+    id TEXT PRIMARY KEY, sigla TEXT, nome TEXT);
+
+CREATE TABLE IF NOT EXISTS proposicoes (
+    id INTEGER PRIMARY KEY,
+    nome TEXT,
+    sigla TEXT,
+    numero INTEGER,
+    ano INTEGER,
+    data_apresentacao TEXT,
+    ementa TEXT,
+    exp_ementa TEXT,
+    qtde_autores TEXT,
+    ind_genero TEXT,
+    qtd_orgaos_com_estado TEXT,
+    tema TEXT,
+    link_inteiro_teor TEXT,
+    tipo_id TEXT REFERENCES tipos_proposicao(id),
+    orgao_numerador_id TEXT REFERENCES orgaos_numeradores(id),
+    regime_id TEXT REFERENCES regimes(id),
+    apreciacao_id TEXT REFERENCES apreciacoes(id),
+    autor1_nome TEXT,
+    autor1_ide_cadastro TEXT,
+    autor1_cod_partido TEXT,
+    autor1_sigla_partido TEXT,
+    autor1_uf TEXT,
+    ultimo_despacho_data TEXT,
+    ultimo_despacho_texto TEXT,
+    situacao_id TEXT REFERENCES situacoes(id),
+    situacao_orgao_id TEXT REFERENCES orgaos(id),
+    cod_prop_principal TEXT,
+    prop_principal TEXT);
+CREATE INDEX IF NOT EXISTS proposicoes_chave
+    ON proposicoes (sigla, numero, ano);
+CREATE INDEX IF NOT EXISTS proposicoes_autor
+    ON proposicoes (autor1_ide_cadastro, ano);
+CREATE INDEX IF NOT EXISTS proposicoes_data
+    ON proposicoes (data_apresentacao);
+
+CREATE TABLE IF NOT EXISTS indices_proposicao (
+    id_prop INTEGER REFERENCES proposicoes(id), indice TEXT);
+CREATE INDEX IF NOT EXISTS indices_proposicao_prop
+    ON indices_proposicao (id_prop);
+CREATE TABLE IF NOT EXISTS apensadas (
+    id_prop INTEGER REFERENCES proposicoes(id), nome TEXT, cod TEXT);
+CREATE INDEX IF NOT EXISTS apensadas_prop ON apensadas (id_prop);
+
+CREATE TABLE IF NOT EXISTS deputados (
+    ide_cadastro TEXT PRIMARY KEY,
+    condicao TEXT,
+    nome TEXT,
+    nome_parlamentar TEXT,
+    url_foto TEXT,
+    sexo TEXT,
+    uf TEXT,
+    partido TEXT,
+    gabinete TEXT,
+    anexo TEXT,
+    fone TEXT,
+    email TEXT);
+CREATE TABLE IF NOT EXISTS detalhes_deputado (
+    ide_cadastro TEXT PRIMARY KEY REFERENCES deputados(ide_cadastro),
+    email TEXT,
+    nome_profissao TEXT,
+    data_nascimento TEXT,
+    data_falecimento TEXT,
+    uf_representacao_atual TEXT,
+    situacao_na_legislatura_atual TEXT,
+    nome_parlamentar_atual TEXT,
+    nome_civil TEXT,
+    sexo TEXT,
+    partido_atual_id TEXT REFERENCES partidos(id));
+CREATE TABLE IF NOT EXISTS gabinetes (
+    ide_cadastro TEXT, numero TEXT, anexo TEXT, telefone TEXT);
+CREATE TABLE IF NOT EXISTS comissoes (
+    ide_cadastro TEXT, id_orgao_legislativo_cd TEXT, sigla_comissao TEXT,
+    nome_comissao TEXT, condicao_membro TEXT, data_entrada TEXT,
+    data_saida TEXT);
+CREATE TABLE IF NOT EXISTS cargos_comissoes (
+    ide_cadastro TEXT, id_orgao_legislativo_cd TEXT, sigla_comissao TEXT,
+    nome_comissao TEXT, id_cargo TEXT, nome_cargo TEXT, data_entrada TEXT,
+    data_saida TEXT);
+CREATE TABLE IF NOT EXISTS periodos_exercicio (
+    ide_cadastro TEXT, sigla_uf_representacao TEXT, situacao_exercicio TEXT,
+    data_inicio TEXT, data_fim TEXT, id_causa_fim_exercicio TEXT,
+    descricao_causa_fim_exercicio TEXT,
+    id_cadastro_parlamentar_anterior TEXT);
+CREATE TABLE IF NOT EXISTS historico_nomes (
+    ide_cadastro TEXT, nome_parlamentar_anterior TEXT,
+    nome_parlamentar_posterior TEXT, data_inicio_vigencia TEXT);
+CREATE TABLE IF NOT EXISTS filiacoes_partidarias (
+    ide_cadastro TEXT, id_partido_anterior TEXT,
+    sigla_partido_anterior TEXT, nome_partido_anterior TEXT,
+    id_partido_posterior TEXT, sigla_partido_posterior TEXT,
+    nome_partido_posterior TEXT, data_filiacao_partido_posterior TEXT);
+CREATE TABLE IF NOT EXISTS historico_lider (
+    ide_cadastro TEXT, id_historico_lider TEXT, id_cargo_lideranca TEXT,
+    descricao_cargo_lideranca TEXT, num_ordem_cargo TEXT,
+    data_designacao TEXT, data_termino TEXT, codigo_unidade_lideranca TEXT,
+    sigla_unidade_lideranca TEXT, id_bloco_partidario TEXT);
+CREATE INDEX IF NOT EXISTS gabinetes_deputado ON gabinetes (ide_cadastro);
+CREATE INDEX IF NOT EXISTS comissoes_deputado ON comissoes (ide_cadastro);
+CREATE INDEX IF NOT EXISTS cargos_comissoes_deputado ON cargos_comissoes (ide_cadastro);
+CREATE INDEX IF NOT EXISTS periodos_exercicio_deputado ON periodos_exercicio (ide_cadastro);
+CREATE INDEX IF NOT EXISTS historico_nomes_deputado ON historico_nomes (ide_cadastro);
+CREATE INDEX IF NOT EXISTS filiacoes_partidarias_deputado ON filiacoes_partidarias (ide_cadastro);
+CREATE INDEX IF NOT EXISTS historico_lider_deputado ON historico_lider (ide_cadastro);
+"""
+
+#tabelas filhas dos detalhes do deputado:
+#(tabela, lista em DetalhesDeputado, atributos de cada item)
+TABELAS_DETALHES = [
+    ('gabinetes', 'gabinete', ('numero', 'anexo', 'telefone')),
+    ('comissoes', 'comissoes',
+     ('id_orgao_legislativo_cd', 'sigla_comissao', 'nome_comissao',
+      'condicao_membro', 'data_entrada', 'data_saida')),
+    ('cargos_comissoes', 'cargo_comissoes',
+     ('id_orgao_legislativo_cd', 'sigla_comissao', 'nome_comissao',
+      'id_cargo', 'nome_cargo', 'data_entrada', 'data_saida')),
+    ('periodos_exercicio', 'periodos_exercicio',
+     ('sigla_uf_representacao', 'situacao_exercicio', 'data_inicio',
+      'data_fim', 'id_causa_fim_exercicio', 'descricao_causa_fim_exercicio',
+      'id_cadastro_parlamentar_anterior')),
+    ('historico_nomes', 'historico_nome_parlamentar',
+     ('nome_parlamentar_anterior', 'nome_parlamentar_posterior',
+      'data_inicio_vigencia_nome_posterior')),
+    ('filiacoes_partidarias', 'filiacoes_partidarias',
+     ('id_partido_anterior', 'sigla_partido_anterior',
+      'nome_partido_anterior', 'id_partido_posterior',
+      'sigla_partido_posterior', 'nome_partido_posterior',
+      'data_filiacao_partido_posterior')),
+    ('historico_lider', 'historico_lider',
+     ('id_historico_lider', 'id_cargo_lideranca', 'descricao_cargo_lideranca',
+      'num_ordem_cargo', 'data_designacao', 'data_termino',
+      'codigo_unidade_lideranca', 'sigla_unidade_lideranca',
+      'id_bloco_partidario'))]
+
+
+def data_iso(data):
+    """
+    Converte as datas do xml ('dd/mm/aaaa', às vezes com a hora) para
+    'aaaa-mm-dd', que ordena como texto.
+    Args:
+        data (str)
+    Return:
+        data (str): None se data for vazia ou não estiver nesse formato.
+    """
+    if not data:
+        return None
+    partes = data.split()[0].split('/')
+    if len(partes) != 3:
+        return None
+    dia, mes, ano = partes
+    return '{}-{:0>2}-{:0>2}'.format(ano, mes, dia)
+
+
+def _inteiro(valor):
+    if valor is None or valor == '':
+        return None
+    return int(valor)
+
+
+def _atributos(objeto, nomes):
+    """
+    Valores dos atributos nomes de objeto, ou None para todos se objeto for
+    None.
+    """
+    if objeto is None:
+        return (None,) * len(nomes)
+    return tuple(getattr(objeto, nome, None) for nome in nomes)
+
+
+class BancoSQLite:
+    """
+    Banco SQLite com os deputados e as proposições.
+    """
+
+
+    def __init__(self, caminho='down_files/baixa_camara.sqlite'):
+        """
+        Método construtor. Cria as tabelas e os índices, se preciso.
+        Args:
+            caminho (str): arquivo do banco.
+        """
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.row_factory = sqlite3.Row
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.executescript(ESQUEMA)
+
+
+    def fechar(self):
+        self.conexao.close()
+
+
+    def gravar_proposicoes(self, props):
+        """
+        Grava (ou substitui) as proposições, numa transação só.
+        Args:
+            props (list): lista de Proposicao.
+        """
+        tipos, orgaos_num, regimes, apreciacoes = {}, {}, {}, {}
+        situacoes, orgaos = {}, {}
+        linhas, indices, apensadas = [], [], []
+        #uma proposição repetida em props entra uma vez só (a última), senão
+        #os índices e as apensadas dela seriam inseridos duas vezes
+        unicas = {_inteiro(prop.id_): prop for prop in props}
+        for id_, prop in unicas.items():
+            sigla, numero, ano = chave_proposicao(prop)
+            tipo = prop.tipo_proposicao
+            if tipo is not None:
+                tipos[tipo.id_] = (tipo.id_, tipo.sigla, tipo.nome)
+            if prop.orgao_numerador is not None:
+                orgaos_num[prop.orgao_numerador.id_] = _atributos(
+                    prop.orgao_numerador, ('id_', 'sigla', 'nome'))
+            if prop.regime is not None:
+                regimes[prop.regime.id_] = _atributos(
+                    prop.regime, ('id_', 'descricao'))
+            if prop.apreciacao is not None:
+                apreciacoes[prop.apreciacao.id_] = _atributos(
+                    prop.apreciacao, ('id_', 'descricao'))
+            situacao = prop.situacao
+            orgao = situacao.orgao if situacao is not None else None
+            principal = (situacao.prop_principal
+                         if situacao is not None else None) or {}
+            if situacao is not None:
+                situacoes[situacao.id_] = (situacao.id_, situacao.descricao)
+            if orgao is not None:
+                orgaos[orgao.id_] = (orgao.id_, orgao.sigla)
+            linhas.append(
+                (id_, prop.nome, sigla, _inteiro(numero), _inteiro(ano),
+                 data_iso(prop.data_apresentacao), prop.ementa,
+                 prop.exp_ementa, prop.qtde_autores, prop.ind_genero,
+                 prop.qtd_orgaos_com_estado, prop.tema,
+                 prop.link_inteiro_teor,
+                 tipo.id_ if tipo is not None else None,
+                 _atributos(prop.orgao_numerador, ('id_',))[0],
+                 _atributos(prop.regime, ('id_',))[0],
+                 _atributos(prop.apreciacao, ('id_',))[0]) +
+                _atributos(prop.autor1, ('nome', 'ide_cadastro',
+                                         'cod_partido', 'sigla_partido',
+                                         'uf_')) +
+                _atributos(prop.ultimo_despacho, ('data', 'texto')) +
+                (situacao.id_ if situacao is not None else None,
+                 orgao.id_ if orgao is not None else None,
+                 principal.get('cod_prop_principal'),
+                 principal.get('prop_principal')))
+            indices.extend((id_, indice) for indice in prop.indices or [])
+            apensadas.extend((id_, nome, cod)
+                             for nome, cod in prop.apensadas or [])
+        with self.conexao:
+            for tabela, valores in (('tipos_proposicao', tipos),
+                                    ('orgaos_numeradores', orgaos_num),
+                                    ('regimes', regimes),
+                                    ('apreciacoes', apreciacoes),
+                                    ('situacoes', situacoes),
+                                    ('orgaos', orgaos)):
+                self._inserir(tabela, list(valores.values()))
+            ids = [(linha[0],) for linha in linhas]
+            self.conexao.executemany(
+                'DELETE FROM indices_proposicao WHERE id_prop = ?', ids)
+            self.conexao.executemany(
+                'DELETE FROM apensadas WHERE id_prop = ?', ids)
+            self._inserir('proposicoes', linhas)
+            self._inserir('indices_proposicao', indices, substituir=False)
+            self._inserir('apensadas', apensadas, substituir=False)
+
+
+    def gravar_deputados(self, deputados):
+        """
+        Grava (ou substitui) os deputados e os seus detalhes, numa transação
+        só.
+        Args:
+            deputados (list): lista de Deputado.
+        """
+        linhas, detalhes, partidos = [], [], {}
+        filhas = {tabela: [] for tabela, _, _ in TABELAS_DETALHES}
+        unicos = {deputado.ide_cadastro: deputado for deputado in deputados}
+        for deputado in unicos.values():
+            linhas.append(_atributos(deputado, (
+                'ide_cadastro', 'condicao', 'nome', 'nome_parlamentar',
+                'url_foto', 'sexo', 'uf', 'partido', 'gabinete', 'anexo',
+                'fone', 'email')))
+            det = deputado.detalhes_deputado
+            if det is None:
+                continue
+            partido = det.partido_atual
+            if partido is not None:
+                partidos[partido.id_partido] = _atributos(
+                    partido, ('id_partido', 'sigla_partido', 'nome_partido'))
+            detalhes.append(_atributos(det, (
+                'ide_cadastro', 'email', 'nome_profissao', 'data_nascimento',
+                'data_falecimento', 'uf_representacao_atual',
+                'situacao_na_legislatura_atual', 'nome_parlamentar_atual',
+                'nome_civil', 'sexo')) +
+                            (partido.id_partido if partido is not None
+                             else None,))
+            for tabela, lista, nomes in TABELAS_DETALHES:
+                filhas[tabela].extend((deputado.ide_cadastro,) +
+                                      _atributos(item, nomes)
+                                      for item in getattr(det, lista))
+        with self.conexao:
+            self._inserir('partidos', list(partidos.values()))
+            self._inserir('deputados', linhas)
+            self._inserir('detalhes_deputado', detalhes)
+            ides = [(linha[0],) for linha in linhas]
+            for tabela, linhas_filhas in filhas.items():
+                self.conexao.executemany(
+                    'DELETE FROM {} WHERE ide_cadastro = ?'.format(tabela),
+                    ides)
+                self._inserir(tabela, linhas_filhas, substituir=False)
+
+
+    def _inserir(self, tabela, linhas, substituir=True):
+        """
+        Insere linhas em tabela com um executemany. Deve ser chamado dentro
+        de uma transação.
+        Args:
+            tabela (str)
+            linhas (list): tuplas com todas as colunas de tabela, em ordem.
+            substituir (boolean): substitui as linhas com a mesma chave
+                primária.
+        """
+        if not linhas:
+            return
+        comando = 'INSERT OR REPLACE' if substituir else 'INSERT'
+        self.conexao.executemany('{} INTO {} VALUES ({})'.format(
+            comando, tabela, ', '.join('?' * len(linhas[0]))), linhas)
+
+
+    def proposicao(self, sigla, numero, ano):
+        """
+        Busca uma proposição pela chave (sigla, numero, ano).
+        Return:
+            linha (Row): None se não existir.
+        """
+        return self.conexao.execute(
+            'SELECT * FROM proposicoes WHERE sigla = ? AND numero = ? '
+            'AND ano = ?', (sigla.strip().upper(), int(numero),
+                            int(ano))).fetchone()
+
+
+    def proposicoes_do_autor(self, ide_cadastro, ano=None, sigla=None):
+        """
+        Proposições cujo primeiro autor é o deputado ide_cadastro.
+        Args:
+            ide_cadastro (str)
+            ano (int): None para todos os anos.
+            sigla (str): None para todos os tipos.
+        Return:
+            linhas (list): lista de Row.
+        """
+        consulta = 'SELECT * FROM proposicoes WHERE autor1_ide_cadastro = ?'
+        parametros = [str(ide_cadastro)]
+        if ano is not None:
+            consulta += ' AND ano = ?'
+            parametros.append(int(ano))
+        if sigla is not None:
+            consulta += ' AND sigla = ?'
+            parametros.append(sigla.strip().upper())
+        return self.conexao.execute(consulta, parametros).fetchall()
+
+
+    def proposicoes_por_data(self, inicio, fim):
+        """
+        Proposições apresentadas entre inicio e fim (inclusive).
+        Args:
+            inicio (str): 'aaaa-mm-dd'.
+            fim (str): 'aaaa-mm-dd'.
+        Return:
+            linhas (list): lista de Row, por data de apresentação.
+        """
+        return self.conexao.execute(
+            'SELECT * FROM proposicoes WHERE data_apresentacao BETWEEN ? AND ? '
+            'ORDER BY data_apresentacao', (inicio, fim)).fetchall()
+
+
+    def deputado(self, ide_cadastro):
+        """
+        Busca um deputado, com os detalhes, pelo ide_cadastro.
+        Return:
+            linha (Row): None se não existir.
+        """
+        return self.conexao.execute(
+            'SELECT * FROM deputados LEFT JOIN detalhes_deputado '
+            'USING (ide_cadastro) WHERE ide_cadastro = ?',
+            (str(ide_cadastro),)).fetchone()
+
+
+def main():
+    #tratando os argumentos da linha de comando
+    parser = argparse.ArgumentParser(
+            description="""Grava os deputados e as proposições já baixados
+                        (arquivos pickle) num banco SQLite.""",
+            epilog="""Ex. de uso: ./banco_sqlite.py -deputados -anos 2011 2012
+                   -tipos PL -apensadas""")
+    parser.add_argument('-banco', type=str,
+                        default='down_files/baixa_camara.sqlite',
+                        help="""arquivo do banco. Padrão
+                             down_files/baixa_camara.sqlite.""")
+    parser.add_argument('-deputados', action='store_true',
+                        help="""grava down_files/deputados.pkl.""")
+    parser.add_argument('-anos', type=int, nargs='*', default=[],
+                        help="""anos das proposições já baixadas.""")
+    parser.add_argument('-tipos', type=str, nargs='*', default=[],
+                        help="""tipos de proposição já baixadas.""")
+    parser.add_argument('-apensadas', action='store_true',
+                        help="""indica se o arquivo das proposições já baixadas
+                             contém apensadas ou não.""")
+    args = vars(parser.parse_args())
+    banco = BancoSQLite(args['banco'])
+    if args['deputados']:
+        with open('down_files/deputados.pkl', 'rb') as arq:
+            deputados = pkl.load(arq)
+        banco.gravar_deputados(deputados)
+        print('{} deputados gravados'.format(len(deputados)))
+    for tp in args['tipos']:
+        for ano in args['anos']:
+            arquivo = arquivo_proposicoes(tp, ano, args['apensadas'])
+            if not os.path.isfile(arquivo):
+                print('\tarquivo {} não encontrado.'.format(arquivo))
+                continue
+            props = carrega_proposicoes(arquivo)
+            banco.gravar_proposicoes(props)
+            print('{} proposições de {} gravadas'.format(len(props), arquivo))
+    banco.fechar()
+
+if __name__ == '__main__':
+    main()
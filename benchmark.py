@@ -0,0 +1,314 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmark das etapas de download e processamento, contra o servidor_local.py.
+
+Etapas medidas:
+    - deputados: obter_deputados com os detalhes de cada deputado.
+    - proposicoes: monta_proposicao sobre a listagem de um ano.
+    - apensadas: obter_apensadas das proposições desse ano.
+    - inteiro_teor: get_inteiro_teor sobre documentos pdf e docx (precisa de
+    python-magic, pdfminer e python-docx; sem eles a etapa é ignorada).
+
+Para cada etapa são medidos itens por segundo, latência por item (p50 e p99)
+e o pico de memória (RSS). Cada etapa roda num processo novo, para que o pico
+de memória seja só dela. O resultado é salvo em json, junto com o commit do
+git, para comparar versões:
+    ./benchmark.py -saida bench_novo.json -comparar bench_antigo.json
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from servidor_local import GeradorSintetico
+from servidor_local import ServidorLocal
+
+
+ETAPAS = ['deputados', 'proposicoes', 'apensadas', 'inteiro_teor']
+
+
+def percentil(valores, fracao):
+    """
+    Percentil de valores (sem interpolação).
+    Args:
+        valores (list)
+        fracao (float): 0.5 para a mediana, 0.99 para o p99.
+    """
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+def cronometrar(funcao, latencias):
+    """
+    Envolve funcao para guardar a duração de cada chamada em latencias.
+    Args:
+        funcao (function)
+        latencias (list)
+    """
+    def cronometrada(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            latencias.append(time.perf_counter() - inicio)
+    return cronometrada
+
+
+def listar_ano(sigla, ano):
+    """
+    Lista as proposições de sigla em ano, com os detalhes.
+    """
+    import obter_proposicoes
+    params = urllib.parse.urlencode({'sigla': sigla, 'ano': ano})
+    return [obter_proposicoes.detalha_proposicao(prop) for prop in
+            obter_proposicoes.itera_proposicoes(
+                obter_proposicoes.PROP_LISTA_URL % params)]
+
+
+def etapa_deputados(params):
+    """
+    obter_deputados com os detalhes de cada deputado.
+    Return:
+        (itens, latencias, duracao): duracao é o tempo da parte medida.
+    """
+    import obter_deputados
+    latencias = []
+    obter_deputados.obter_detalhes_deputado = cronometrar(
+        obter_deputados.obter_detalhes_deputado, latencias)
+    inicio = time.perf_counter()
+    obter_deputados.obter_deputados(55, trabalhadores=1)
+    return len(latencias), latencias, time.perf_counter() - inicio
+
+
+def etapa_proposicoes(params):
+    """
+    monta_proposicao sobre a listagem de um ano.
+    Return:
+        (itens, latencias, duracao): duracao é o tempo da parte medida.
+    """
+    import cliente_http
+    import obter_proposicoes
+    url = obter_proposicoes.PROP_LISTA_URL % urllib.parse.urlencode(
+        {'sigla': 'PL', 'ano': params['ano']})
+    itens = list(cliente_http.obter_xml(url))
+    latencias = []
+    montar = cronometrar(obter_proposicoes.monta_proposicao, latencias)
+    inicio = time.perf_counter()
+    for item in itens:
+        montar(item)
+    return len(itens), latencias, time.perf_counter() - inicio
+
+
+def etapa_apensadas(params):
+    """
+    obter_apensadas das proposições de um ano. Cada chamada é uma latência, e
+    cada apensada baixada é um item.
+    Return:
+        (itens, latencias, duracao): duracao é o tempo da parte medida.
+    """
+    import obter_proposicoes
+    from indice_proposicoes import IndiceProposicoes
+    props = listar_ano('PL', params['ano'])
+    #índice vazio: todas as apensadas são baixadas (uma vez cada)
+    indice = IndiceProposicoes()
+    arquivo = obter_proposicoes.arquivo_proposicoes('PL', params['ano'], True)
+    latencias = []
+    obter = cronometrar(obter_proposicoes.obter_apensadas, latencias)
+    itens = 0
+    inicio = time.perf_counter()
+    for prop in props:
+        if prop.apensadas:
+            itens += len(obter(prop.apensadas, indice, arquivo))
+    return itens, latencias, time.perf_counter() - inicio
+
+
+def etapa_inteiro_teor(params):
+    """
+    get_inteiro_teor sobre os documentos de um ano (pdf e docx).
+    Return:
+        (itens, latencias, duracao): duracao é o tempo da parte medida.
+    """
+    import obter_inteiro_teor
+    props = listar_ano('PL', params['ano'])
+    latencias = []
+    obter = cronometrar(obter_inteiro_teor.get_inteiro_teor, latencias)
+    inicio = time.perf_counter()
+    for prop in props:
+        obter(prop)
+        #um arquivo que não pôde ser extraído cai em registrar_corrupto, e o
+        #tempo medido não seria o da extração
+        if not getattr(prop, 'inteiro_teor', None):
+            raise RuntimeError('o inteiro teor da proposição {} não foi '
+                               'extraído'.format(prop.id_))
+    return len(props), latencias, time.perf_counter() - inicio
+
+
+def executar_etapa(etapa, url_base, pasta, params):
+    """
+    Executa uma etapa (no processo filho) e mede o tempo e a memória.
+    Args:
+        etapa (str): chave de ETAPAS.
+        url_base (str): endereço do servidor local.
+        pasta (str): pasta de trabalho, com down_files.
+        params (dict): parâmetros das etapas.
+    Return:
+        resultado (dict)
+    """
+    import cliente_http
+    cliente_http.CLIENTE.url_base = url_base
+    #o servidor local não precisa do limitador de taxa
+    cliente_http.CLIENTE.taxa_inicial = cliente_http.CLIENTE.taxa_max = 1e6
+    os.chdir(pasta)
+    funcao = globals()['etapa_' + etapa]
+    #as etapas imprimem o progresso; aqui isso só atrapalha
+    with contextlib.redirect_stdout(io.StringIO()):
+        itens, latencias, duracao = funcao(params)
+    #ru_maxrss é em KB no linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {'itens': itens,
+            'duracao_s': duracao,
+            'itens_por_s': itens / duracao if duracao > 0 else None,
+            'p50_s': percentil(latencias, 0.5),
+            'p99_s': percentil(latencias, 0.99),
+            'chamadas': len(latencias),
+            'pico_rss_bytes': rss}
+
+
+def commit_atual():
+    """
+    Commit do git do código medido, ou None fora de um repositório.
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultado, anterior):
+    """
+    Imprime a variação de cada etapa em relação a um resultado anterior.
+    Args:
+        resultado (dict)
+        anterior (dict)
+    """
+    print('Comparação com {} ({}):'.format(anterior.get('commit'),
+                                           anterior.get('data')))
+    for etapa, atual in resultado['etapas'].items():
+        antes = anterior['etapas'].get(etapa)
+        if not antes or 'itens_por_s' not in antes or \
+                'itens_por_s' not in atual:
+            continue
+        for campo in ('itens_por_s', 'p50_s', 'p99_s', 'pico_rss_bytes'):
+            if antes[campo] and atual[campo] is not None:
+                print('\t{} {}: {:+.1f}%'.format(
+                    etapa, campo, 100 * (atual[campo] / antes[campo] - 1)))
+
+
+def main():
+    #tratando os argumentos da linha de comando
+    parser = argparse.ArgumentParser(
+        description="""Mede as etapas de download e processamento contra o
+                    servidor local, e salva o resultado em json.""",
+        epilog="""Ex. de uso: ./benchmark.py -proposicoes_por_ano 2000
+               -saida bench.json -comparar bench_anterior.json""")
+    parser.add_argument('-etapas', type=str, nargs='*', default=ETAPAS,
+                        choices=ETAPAS,
+                        help="""etapas a medir. Padrão todas.""")
+    parser.add_argument('-proposicoes_por_ano', type=int, default=500,
+                        help="""proposições do ano medido. Padrão 500.""")
+    parser.add_argument('-deputados', type=int, default=513,
+                        help="""número de deputados. Padrão 513.""")
+    parser.add_argument('-fixtures', type=str, default=None,
+                        help="""pasta com respostas gravadas (formato do
+                             cache), usadas antes das sintéticas.""")
+    parser.add_argument('-ano', type=int, default=2011,
+                        help="""ano das proposições. Padrão 2011.""")
+    parser.add_argument('-saida', type=str, default=None,
+                        help="""arquivo json do resultado. Padrão
+                             benchmark_<data>_<commit>.json.""")
+    parser.add_argument('-comparar', type=str, default=None,
+                        help="""json de um benchmark anterior para
+                             comparação.""")
+    args = vars(parser.parse_args())
+
+    gerador = GeradorSintetico(args['proposicoes_por_ano'], args['deputados'])
+    servidor = ServidorLocal(('127.0.0.1', 0), args['fixtures'], gerador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url_base = 'http://127.0.0.1:{}'.format(servidor.server_address[1])
+
+    resultado = {'commit': commit_atual(),
+                 'data': datetime.datetime.now().isoformat(),
+                 'python': sys.version.split()[0],
+                 'plataforma': platform.platform(),
+                 'parametros': {chave: args[chave] for chave in
+                                ('proposicoes_por_ano', 'deputados', 'ano',
+                                 'fixtures')},
+                 'etapas': {}}
+    contexto = multiprocessing.get_context('spawn')
+    for etapa in args['etapas']:
+        print('Medindo {}...'.format(etapa))
+        #cada etapa começa com down_files vazio e num processo novo
+        with tempfile.TemporaryDirectory() as pasta:
+            os.makedirs(os.path.join(pasta, 'down_files'))
+            with ProcessPoolExecutor(1, mp_context=contexto) as executor:
+                try:
+                    medida = executor.submit(executar_etapa, etapa, url_base,
+                                             pasta, args).result()
+                except ImportError as erro:
+                    medida = {'ignorada': str(erro)}
+        resultado['etapas'][etapa] = medida
+        print('\t{}'.format(json.dumps(medida, sort_keys=True)))
+    servidor.shutdown()
+
+    saida = args['saida'] or 'benchmark_{}_{}.json'.format(
+        datetime.datetime.now().strftime('%Y%m%d_%H%M%S'),
+        resultado['commit'] or 'sem_commit')
+    with open(saida, 'w', encoding='utf-8') as arq:
+        json.dump(resultado, arq, indent=2, sort_keys=True)
+    print('Resultado salvo em {}'.format(saida))
+    if args['comparar']:
+        with open(args['comparar'], encoding='utf-8') as arq:
+            comparar(resultado, json.load(arq))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Cache em disco das respostas cruas dos Web Services da Câmara.
+
+Cada resposta é guardada comprimida (gzip) num arquivo cujo nome é o sha256 da
+chave da requisição. A chave é o endpoint (caminho da url) mais os parâmetros
+da consulta em ordem alfabética, sem o host. Assim, a mesma consulta feita com
+os parâmetros em outra ordem, ou contra outro servidor, cai no mesmo arquivo.
+
+As entradas mais velhas que o ttl são removidas, e quando o cache passa do
+tamanho máximo as entradas mais antigas são removidas primeiro.
+
+Com o cache preenchido, os scripts podem ser executados com -offline para
+refazer todos os arquivos pickle sem nenhuma requisição.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+
+
+def chave_requisicao(url):
+    """
+    Monta a chave de uma requisição: endpoint mais os parâmetros ordenados.
+    Args:
+        url (str)
+    Return:
+        chave (str). Ex.: '/SitCamaraWS/Proposicoes.asmx/ObterProposicaoPorID?
+            IdProp=1'
+    """
+    partes = urllib.parse.urlsplit(url)
+    params = sorted(urllib.parse.parse_qsl(partes.query,
+                                           keep_blank_values=True))
+    return '{}?{}'.format(partes.path, urllib.parse.urlencode(params))
+
+
+class CacheRespostas:
+    """
+    Cache das respostas cruas, endereçado pelo conteúdo da requisição.
+    """
+
+
+    def __init__(self, pasta='down_files/cache', ttl=30 * 24 * 3600,
+                 tamanho_maximo=10 * 1024 ** 3):
+        """
+        Método construtor.
+        Args:
+            pasta (str): pasta onde as respostas são guardadas.
+            ttl (int): tempo de vida de uma entrada em segundos. None para
+                nunca expirar.
+            tamanho_maximo (int): tamanho máximo do cache em bytes. None para
+                não ter limite.
+        """
+        self.pasta = pasta
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._trava = threading.Lock()
+        self._tamanho = None
+
+
+    def caminho(self, url):
+        """
+        Caminho do arquivo que guarda a resposta de url.
+        Args:
+            url (str)
+        """
+        nome = hashlib.sha256(chave_requisicao(url).encode('utf-8'))\
+                .hexdigest()
+        return os.path.join(self.pasta, nome[:2], nome + '.gz')
+
+
+    def _expirada(self, mtime, agora=None):
+        """
+        Indica se uma entrada gravada em mtime já passou do ttl.
+        Args:
+            mtime (float)
+            agora (float)
+        """
+        if self.ttl is None:
+            return False
+        return (agora or time.time()) - mtime > self.ttl
+
+
+    def ler(self, url, ignorar_ttl=False):
+        """
+        Lê a resposta de url do cache.
+        Args:
+            url (str)
+            ignorar_ttl (boolean): retorna a entrada mesmo se expirada.
+        Return:
+            corpo (bytes): None se não estiver no cache (ou se expirou).
+        """
+        nome = self.caminho(url)
+        try:
+            if not ignorar_ttl and self._expirada(os.path.getmtime(nome)):
+                return None
+            with gzip.open(nome, 'rb') as arq:
+                return arq.read()
+        except (FileNotFoundError, EOFError, OSError):
+            return None
+
+
+    def abrir(self, url, ignorar_ttl=False):
+        """
+        Abre a resposta de url no cache para leitura aos poucos.
+        Args:
+            url (str)
+            ignorar_ttl (boolean): retorna a entrada mesmo se expirada.
+        Return:
+            arq (GzipFile): None se não estiver no cache (ou se expirou).
+        """
+        nome = self.caminho(url)
+        try:
+            if not ignorar_ttl and self._expirada(os.path.getmtime(nome)):
+                return None
+            return gzip.open(nome, 'rb')
+        except (FileNotFoundError, OSError):
+            return None
+
+
+    def gravador(self, url):
+        """
+        Retorna um GravadorResposta, que grava a resposta de url no cache aos
+        poucos.
+        Args:
+            url (str)
+        """
+        return GravadorResposta(self, url)
+
+
+    def _gravado(self, nome, antigo):
+        """
+        Atualiza o tamanho do cache depois que uma entrada foi gravada, e o
+        limpa se passou do tamanho máximo.
+        Args:
+            nome (str): caminho da entrada gravada.
+            antigo (int): tamanho da entrada que foi substituída.
+        """
+        novo = os.path.getsize(nome)
+        with self._trava:
+            if self._tamanho is None:
+                self._tamanho = self._calcular_tamanho()
+            else:
+                self._tamanho += novo - antigo
+            excedeu = (self.tamanho_maximo is not None and
+                       self._tamanho > self.tamanho_maximo)
+        if excedeu:
+            self.limpar()
+
+
+    def gravar(self, url, corpo):
+        """
+        Grava a resposta de url no cache.
+        Args:
+            url (str)
+            corpo (bytes)
+        """
+        nome = self.caminho(url)
+        os.makedirs(os.path.dirname(nome), exist_ok=True)
+        #grava num temporário e renomeia, para nunca deixar entrada pela metade
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(nome),
+                                         delete=False) as tmp:
+            tmp.write(gzip.compress(corpo))
+        antigo = os.path.getsize(nome) if os.path.isfile(nome) else 0
+        os.replace(tmp.name, nome)
+        self._gravado(nome, antigo)
+
+
+    def _entradas(self):
+        """
+        Lista as entradas do cache.
+        Return:
+            entradas (list): lista de (mtime, tamanho, caminho).
+        """
+        entradas = []
+        for raiz, _, arquivos in os.walk(self.pasta):
+            for arquivo in arquivos:
+                if not arquivo.endswith('.gz'):
+                    continue
+                nome = os.path.join(raiz, arquivo)
+                try:
+                    info = os.stat(nome)
+                except FileNotFoundError:
+                    continue
+                entradas.append((info.st_mtime, info.st_size, nome))
+        return entradas
+
+
+    def _calcular_tamanho(self):
+        """
+        Soma o tamanho de todas as entradas.
+        """
+        return sum(tamanho for _, tamanho, _ in self._entradas())
+
+
+    def limpar(self):
+        """
+        Remove as entradas expiradas e, se o cache continuar maior que o
+        tamanho máximo, remove as mais antigas até ficar em 90% do máximo.
+        """
+        agora = time.time()
+        entradas = sorted(self._entradas())
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        limite = None
+        if self.tamanho_maximo is not None:
+            limite = int(self.tamanho_maximo * 0.9)
+        for mtime, tamanho, nome in entradas:
+            if not self._expirada(mtime, agora) and \
+                    (limite is None or total <= limite):
+                break
+            try:
+                os.remove(nome)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+        with self._trava:
+            self._tamanho = total
+
+
+class GravadorResposta:
+    """
+    Grava no cache uma resposta que chega aos poucos. A entrada só aparece
+    no cache quando concluir é chamado.
+    """
+
+
+    def __init__(self, cache, url):
+        """
+        Método construtor.
+        Args:
+            cache (CacheRespostas)
+            url (str)
+        """
+        self._cache = cache
+        self._nome = cache.caminho(url)
+        os.makedirs(os.path.dirname(self._nome), exist_ok=True)
+        self._tmp = tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(self._nome), delete=False)
+        self._gzip = gzip.GzipFile(fileobj=self._tmp, mode='wb')
+
+
+    def write(self, dados):
+        """
+        Acrescenta dados à entrada.
+        Args:
+            dados (bytes)
+        """
+        self._gzip.write(dados)
+
+
+    def concluir(self):
+        """
+        Fecha a entrada e a coloca no cache.
+        """
+        self._gzip.close()
+        self._tmp.close()
+        antigo = os.path.getsize(self._nome) \
+                if os.path.isfile(self._nome) else 0
+        os.replace(self._tmp.name, self._nome)
+        self._cache._gravado(self._nome, antigo)
+
+
+    def descartar(self):
+        """
+        Descarta a entrada incompleta.
+        """
+        self._gzip.close()
+        self._tmp.close()
+        os.remove(self._tmp.name)
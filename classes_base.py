@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Base das classes de classes_deputados.py e classes_proposicoes.py.
+
+As classes usam __slots__ em vez de um __dict__ por instância, o que reduz
+bastante a memória quando milhões de objetos pequenos são carregados. Os
+arquivos pickle gravados antes disso guardam o estado como um dicionário;
+ObjetoCompacto.__setstate__ os carrega mesmo assim.
+
+Os objetos pequenos que se repetem em quase todas as proposições (tipo,
+órgão, regime, apreciação) e nos deputados (partido) são
+ObjetoCompartilhado: criados com compartilhado(), uma instância só é usada
+para os mesmos valores, e o pickle volta a compartilhá-las ao carregar.
+
+As datas ('dd/mm/aaaa', às vezes com a hora 00:00:00) são CampoData:
+convertidas uma vez só, ao serem atribuídas, num inteiro com o número do dia
+(date.toordinal). O atributo continua devolvendo o texto 'dd/mm/aaaa', e
+dia(objeto, campo) devolve o inteiro, para comparações e buscas por
+intervalo (ver consulta_datas.py).
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import datetime
+import inspect
+import threading
+
+
+class ObjetoCompacto:
+    """
+    Classe base com __slots__ e compatível com os pickles antigos.
+    """
+    __slots__ = ()
+
+
+    def __getstate__(self):
+        """
+        Estado para o pickle: os slots preenchidos, num dicionário.
+        """
+        estado = {}
+        for classe in type(self).__mro__:
+            for nome in getattr(classe, '__slots__', ()):
+                if hasattr(self, nome):
+                    estado[nome] = getattr(self, nome)
+        return estado
+
+
+    def __setstate__(self, estado):
+        """
+        Restaura o estado do pickle. Aceita o dicionário de __getstate__, o
+        __dict__ dos pickles antigos e o par (dict, slots) do pickle padrão.
+        """
+        if isinstance(estado, tuple):
+            dicionario, slots = estado
+            estado = dict(dicionario or {})
+            estado.update(slots or {})
+        for nome, valor in estado.items():
+            setattr(self, nome, valor)
+
+
+def dia_de(texto):
+    """
+    Converte uma data do xml no número do dia.
+    Args:
+        texto (str): 'dd/mm/aaaa', opcionalmente seguida de ' 00:00:00'.
+    Return:
+        dia (int): date.toordinal da data, ou None se texto não for uma data
+            nesse formato (ou tiver uma hora diferente de meia-noite).
+    """
+    if not texto:
+        return None
+    partes = texto.split()
+    if len(partes) > 2 or (len(partes) == 2 and
+                           partes[1].strip('0:') != ''):
+        return None
+    try:
+        dia, mes, ano = partes[0].split('/')
+        return datetime.date(int(ano), int(mes), int(dia)).toordinal()
+    except ValueError:
+        return None
+
+
+def texto_de(dia):
+    """
+    Converte o número do dia em 'dd/mm/aaaa'.
+    Args:
+        dia (int)
+    """
+    return datetime.date.fromordinal(dia).strftime('%d/%m/%Y')
+
+
+class CampoData:
+    """
+    Atributo de data de um ObjetoCompacto. O valor fica no slot com o mesmo
+    nome precedido de '_', como número do dia; textos que não são datas
+    (vazios, outros formatos) ficam como vieram.
+    """
+
+
+    def __set_name__(self, classe, nome):
+        self.slot = '_' + nome
+
+
+    def __get__(self, objeto, classe=None):
+        if objeto is None:
+            return self
+        valor = getattr(objeto, self.slot)
+        return texto_de(valor) if isinstance(valor, int) else valor
+
+
+    def __set__(self, objeto, valor):
+        if isinstance(valor, str):
+            valor = dia_de(valor) or valor
+        setattr(objeto, self.slot, valor)
+
+
+    def dia(self, objeto):
+        """
+        Número do dia do atributo em objeto, ou None.
+        """
+        valor = getattr(objeto, self.slot, None)
+        return valor if isinstance(valor, int) else None
+
+
+def dia(objeto, campo):
+    """
+    Número do dia de um atributo de data, sem converter texto.
+    Args:
+        objeto (ObjetoCompacto)
+        campo (str): ex.: 'data_apresentacao'.
+    Return:
+        dia (int): None se a data estiver vazia ou não for uma data.
+    """
+    return getattr(type(objeto), campo).dia(objeto)
+
+
+_COMPARTILHADOS = {}
+_TRAVA_COMPARTILHADOS = threading.Lock()
+_PARAMETROS = {}
+
+
+def _parametros(classe):
+    """
+    Argumentos do construtor de classe: os valores padrão, um por argumento
+    (inspect.Parameter.empty nos obrigatórios), e as posições dos que são
+    CampoData.
+    """
+    parametros = _PARAMETROS.get(classe)
+    if parametros is None:
+        lista = list(inspect.signature(classe.__init__).parameters.values())[1:]
+        padroes = tuple(parametro.default for parametro in lista)
+        datas = tuple(i for i, parametro in enumerate(lista)
+                      if isinstance(getattr(classe, parametro.name, None),
+                                    CampoData))
+        parametros = _PARAMETROS[classe] = (padroes, datas)
+    return parametros
+
+
+def compartilhado(classe, *campos):
+    """
+    Retorna a instância de classe com esses campos, criando-a na primeira
+    vez. Os objetos retornados são usados por várias proposições (ou
+    deputados), então não devem ser alterados.
+    Args:
+        classe (type): subclasse de ObjetoCompartilhado.
+        campos: argumentos do construtor de classe.
+    Return:
+        instancia (classe)
+    """
+    padroes, datas = _parametros(classe)
+    faltando = padroes[len(campos):]
+    if faltando and inspect.Parameter.empty not in faltando:
+        #a chave tem todos os argumentos: Partido(a, b, c) e
+        #Partido(a, b, c, None, None) são o mesmo objeto
+        campos += faltando
+    if datas:
+        #o pickle guarda as datas como número do dia, como no slot
+        campos = list(campos)
+        for i in datas:
+            if i < len(campos) and isinstance(campos[i], str):
+                campos[i] = dia_de(campos[i]) or campos[i]
+        campos = tuple(campos)
+    chave = (classe, campos)
+    instancia = _COMPARTILHADOS.get(chave)
+    if instancia is None:
+        with _TRAVA_COMPARTILHADOS:
+            instancia = _COMPARTILHADOS.get(chave)
+            if instancia is None:
+                instancia = _COMPARTILHADOS[chave] = classe(*campos)
+    return instancia
+
+
+class ObjetoCompartilhado(ObjetoCompacto):
+    """
+    Objeto imutável criado com compartilhado(). Os __slots__ das subclasses
+    devem estar na ordem dos argumentos do construtor.
+    """
+    __slots__ = ()
+
+
+    def __reduce__(self):
+        """
+        O pickle guarda os campos, e ao carregar a instância vem de
+        compartilhado(): os mesmos valores voltam a ser um objeto só, mesmo
+        vindo de pickles diferentes (ex.: os registros do diário).
+        """
+        return (compartilhado, (type(self),) +
+                tuple(getattr(self, nome) for nome in self.__slots__))
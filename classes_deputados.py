@@ -30,12 +30,20 @@ __maintainer__ = "Saullo Oliveira"
 __email__ = "shgo@dca.fee.unicamp.br"
 __status__ = "Development"
 
+from classes_base import CampoData
+from classes_base import ObjetoCompacto
+from classes_base import ObjetoCompartilhado
 
-class Bloco:
+
+class Bloco(ObjetoCompacto):
     """
     Bloco de partidos. No site da câmara essa classe é representada por
     ObterPartidosBlocoCD.
     """
+    __slots__ = ('id_bloco', 'nome_bloco', 'sigla_bloco',
+                 '_data_criacao_bloco', '_data_extincao_bloco', 'partidos')
+    data_criacao_bloco = CampoData()
+    data_extincao_bloco = CampoData()
     def __init__(self, id_bloco, nome_bloco, sigla_bloco, data_criacao_bloco,
                  data_extincao_bloco):
         """Método construtor do bloco.
@@ -79,13 +87,17 @@ class Bloco:
         self.partidos.append(partido_bloco)
 
 
-class PartidoBloco():
+class PartidoBloco(ObjetoCompacto):
     """
     Partido que participa de um bloco.
     
     No site da câmara é representado por listaPartido. Essa classe sempre será
     usada como atributo de Bloco.
     """
+    __slots__ = ('id_partido', 'sigla_partido', 'nome_partido',
+                 '_data_adesao_partido', '_data_desligamento_partido')
+    data_adesao_partido = CampoData()
+    data_desligamento_partido = CampoData()
 
 
     def __init__(self, id_partido, sigla_partido, nome_partido,
@@ -106,10 +118,14 @@ class PartidoBloco():
         self.data_desligamento_partido = data_desligamento_partido
 
 
-class Partido:
+class Partido(ObjetoCompartilhado):
     """
     Partido com representação na Câmara dos Deputados.
     """
+    __slots__ = ('id_partido', 'sigla_partido', 'nome_partido',
+                 '_data_criacao', '_data_extincao')
+    data_criacao = CampoData()
+    data_extincao = CampoData()
 
 
     def __init__(self, id_partido, sigla_partido, nome_partido,\
@@ -142,10 +158,11 @@ class Partido:
                     self.id_partido)
 
 
-class DeputadoLideranca:
+class DeputadoLideranca(ObjetoCompacto):
     """
     Classe que sempre será atributo da classe Bancada.
     """
+    __slots__ = ('nome', 'ide_cadastro', 'partido', 'uf')
 
     def __init__(self, nome, ide_cadastro, partido, uf):
         """
@@ -162,11 +179,12 @@ class DeputadoLideranca:
         self.uf = uf
 
 
-class Bancada:
+class Bancada(ObjetoCompacto):
     """
     No site da câmara essa classe é representada por ObterLideresBancadas.
     É a única classe que deixei diferente do que esta lá no xml.
     """
+    __slots__ = ('sigla', 'nome', 'lider', 'vice_lideres', 'representantes')
 
 
     def __init__(self, sigla, nome):
@@ -213,11 +231,15 @@ class Bancada:
         self.representantes.append(representante)
 
 
-class Comissao:
+class Comissao(ObjetoCompacto):
     """Comissão que um deputado participa.
     
     Sempre estará como objeto em DetalhesDeputado.
     """
+    __slots__ = ('id_orgao_legislativo_cd', 'sigla_comissao', 'nome_comissao',
+                 'condicao_membro', '_data_entrada', '_data_saida')
+    data_entrada = CampoData()
+    data_saida = CampoData()
     def __init__(self, id_orgao_legislativo_cd, sigla_comissao, nome_comissao,
                  condicao_membro, data_entrada, data_saida):
         """
@@ -237,12 +259,13 @@ class Comissao:
         self.data_saida = data_saida
 
 
-class Comissoes:
+class Comissoes(ObjetoCompacto):
     """Classe que armazena a lista de comissões que o deputado participa como
     titular e como suplente.
 
     Sempre será objeto da classe Deputado.
     """
+    __slots__ = ('titular', 'suplente')
     def __init__(self):
         """
         Construtor vazio.
@@ -273,13 +296,16 @@ class Comissoes:
         self.suplente.append(comissao)
 
 
-class Deputado():
+class Deputado(ObjetoCompacto):
     """Representa um deputado.
     
     A maior parte dos detalhes não está nessa classe, mas no atributo
     detalhes_deputado. Essa modelagem foi uma escolha para representar os dados
     da forma mais semelhante possível à estrutura dos Web Services.
     """
+    __slots__ = ('ide_cadastro', 'condicao', 'nome', 'nome_parlamentar',
+                 'url_foto', 'sexo', 'uf', 'partido', 'gabinete', 'anexo',
+                 'fone', 'email', 'comissoes', 'detalhes_deputado')
     def __init__(self, ide_cadastro, condicao, nome, nome_parlamentar,
                  url_foto, sexo, uf, partido, gabinete, anexo, fone, email):
         """
@@ -334,11 +360,16 @@ class Deputado():
         self.detalhes_deputado = detalhes_deputado
 
 
-class FiliacaoPartidaria:
+class FiliacaoPartidaria(ObjetoCompacto):
     """Classe que armazena uma troca de filiação partidária.
 
     Sempre será atributo de DetalhesDeputado.
     """
+    __slots__ = ('id_partido_anterior', 'sigla_partido_anterior',
+                 'nome_partido_anterior', 'id_partido_posterior',
+                 'sigla_partido_posterior', 'nome_partido_posterior',
+                 '_data_filiacao_partido_posterior')
+    data_filiacao_partido_posterior = CampoData()
     def __init__(self, id_partido_anterior, sigla_partido_anterior,
                  nome_partido_anterior, id_partido_posterior,
                  sigla_partido_posterior, nome_partido_posterior,
@@ -362,12 +393,13 @@ class FiliacaoPartidaria:
         self.data_filiacao_partido_posterior = data_filiacao_partido_posterior
 
 
-class Gabinete:
+class Gabinete(ObjetoCompacto):
     """
     Classe que representa um Gabinete Parlamentar.
 
     Ela sempre será atribute de um DetalhesDeputado.
     """
+    __slots__ = ('numero', 'anexo', 'telefone')
     def __init__(self, numero, anexo, telefone):
         """
         Método construtor.
@@ -381,10 +413,16 @@ class Gabinete:
         self.telefone = telefone
 
 
-class PeriodoExercicio:
+class PeriodoExercicio(ObjetoCompacto):
     """
     Classe que representa um período de exercício do Deputado.
     """
+    __slots__ = ('sigla_uf_representacao', 'situacao_exercicio',
+                 '_data_inicio', '_data_fim', 'id_causa_fim_exercicio',
+                 'descricao_causa_fim_exercicio',
+                 'id_cadastro_parlamentar_anterior')
+    data_inicio = CampoData()
+    data_fim = CampoData()
 
 
     def __init__(self, sigla_uf_representacao, situacao_exercicio, data_inicio,
@@ -409,8 +447,12 @@ class PeriodoExercicio:
         self.id_cadastro_parlamentar_anterior = id_cadastro_parlamentar_anterior
 
 
-class CargoComissoes:
+class CargoComissoes(ObjetoCompacto):
     """Classe que representa o cargo de um deputado numa comissão."""
+    __slots__ = ('id_orgao_legislativo_cd', 'sigla_comissao', 'nome_comissao',
+                 'id_cargo', 'nome_cargo', '_data_entrada', '_data_saida')
+    data_entrada = CampoData()
+    data_saida = CampoData()
 
 
     def __init__(self, id_orgao_legislativo_cd, sigla_comissao, nome_comissao,
@@ -434,11 +476,18 @@ class CargoComissoes:
         self.data_saida = data_saida
 
 
-class HistoricoLider:
+class HistoricoLider(ObjetoCompacto):
     """Armazena uma liderança que o deputado foi num mandato.
 
     Sempre será atributo na classe DetalhesDeputado.
     """
+    __slots__ = ('id_historico_lider', 'id_cargo_lideranca',
+                 'descricao_cargo_lideranca', 'num_ordem_cargo',
+                 '_data_designacao', '_data_termino',
+                 'codigo_unidade_lideranca', 'sigla_unidade_lideranca',
+                 'id_bloco_partidario')
+    data_designacao = CampoData()
+    data_termino = CampoData()
 
 
     def __init__(self,
@@ -474,12 +523,21 @@ class HistoricoLider:
         self.id_bloco_partidario = id_bloco_partidario
 
 
-class DetalhesDeputado:
+class DetalhesDeputado(ObjetoCompacto):
     """
     Classe que contém diversos detalhes dos deputados.
 
     Sempre será atributo de um Deputado.
     """
+    __slots__ = ('ide_cadastro', 'email', 'nome_profissao', '_data_nascimento',
+                 '_data_falecimento', 'uf_representacao_atual',
+                 'situacao_na_legislatura_atual', 'nome_parlamentar_atual',
+                 'nome_civil', 'sexo', 'partido_atual', 'gabinete',
+                 'comissoes', 'cargo_comissoes', 'periodos_exercicio',
+                 'historico_nome_parlamentar', 'filiacoes_partidarias',
+                 'historico_lider')
+    data_nascimento = CampoData()
+    data_falecimento = CampoData()
 
 
     def __init__(self, ide_cadastro, email, nome_profissao, data_nascimento,
@@ -607,12 +665,15 @@ class DetalhesDeputado:
         self.historico_lider.append(historico_lider)
 
 
-class HistoricoNome:
+class HistoricoNome(ObjetoCompacto):
     """
     Classe que armazena a troca de nome parlamentar.
 
     Sempre será parte de atributo em DetalhesDeputado.
     """
+    __slots__ = ('nome_parlamentar_anterior', 'nome_parlamentar_posterior',
+                 '_data_inicio_vigencia_nome_posterior')
+    data_inicio_vigencia_nome_posterior = CampoData()
 
 
     def __init__(self, nome_parlamentar_anterior, nome_parlamentar_posterior,
@@ -30,11 +30,16 @@ __maintainer__ = "Saullo Oliveira"
 __email__ = "shgo@dca.fee.unicamp.br"
 __status__ = "Development"
 
+from classes_base import CampoData
+from classes_base import ObjetoCompacto
+from classes_base import ObjetoCompartilhado
 
-class TipoAutor:
+
+class TipoAutor(ObjetoCompacto):
     """
     Classe dos tipos de autores de proposição.
     """
+    __slots__ = ('id_', 'descricao')
 
 
     def __init__(self, id_, descricao):
@@ -48,10 +53,11 @@ class TipoAutor:
         self.descricao = descricao
 
 
-class SiglaTipoProposicao:
+class SiglaTipoProposicao(ObjetoCompacto):
     """
     Classe das siglas dos tipos de proposição.
     """
+    __slots__ = ('sigla', 'descricao', 'ativa', 'genero')
 
 
     def __init__(self, sigla, descricao, ativa, genero):
@@ -69,11 +75,12 @@ class SiglaTipoProposicao:
         self.genero = genero
 
 
-class Orgao:
+class Orgao(ObjetoCompartilhado):
     """
     Classe que indica o órgão de uma situação.
     Sempre será atributo de Situação.
     """
+    __slots__ = ('id_', 'sigla')
 
 
     def __init__(self, id_, sigla):
@@ -87,11 +94,12 @@ class Orgao:
         self.sigla = sigla
 
 
-class SituacaoProposicao:
+class SituacaoProposicao(ObjetoCompacto):
     """
     Classe que representa a situação de uma proposição.
     Sempre será atributo de Proposicao.
     """
+    __slots__ = ('id_', 'descricao', 'orgao', 'prop_principal')
 
 
     def __init__(self, id_, descricao):
@@ -128,11 +136,12 @@ class SituacaoProposicao:
         self.prop_principal = principal
 
 
-class Autor:
+class Autor(ObjetoCompacto):
     """
     Classe que representa o autor de uma proposição.
     Sempre será atributo de Proposicao.
     """
+    __slots__ = ('nome', 'ide_cadastro', 'cod_partido', 'sigla_partido', 'uf_')
 
 
     def __init__(self, nome, ide_cadastro, cod_partido, sigla_partido, uf_):
@@ -152,11 +161,12 @@ class Autor:
         self.uf_ = uf_
 
 
-class OrgaoNumerador:
+class OrgaoNumerador(ObjetoCompartilhado):
     """
     Classe que indica o órgão numerador de uma proposição.
     Sempre será atributo de Proposicao.
     """
+    __slots__ = ('id_', 'sigla', 'nome')
 
 
     def __init__(self, id_, sigla, nome):
@@ -172,11 +182,13 @@ class OrgaoNumerador:
         self.nome = nome
 
 
-class UltimoDespacho:
+class UltimoDespacho(ObjetoCompacto):
     """
     Classe com dados do último despacho de uma proposição.
     Sempre será atributo de Proposicao.
     """
+    __slots__ = ('_data', 'texto')
+    data = CampoData()
 
 
     def __init__(self, data, texto):
@@ -190,11 +202,12 @@ class UltimoDespacho:
         self.texto = texto
 
 
-class Regime:
+class Regime(ObjetoCompartilhado):
     """
     Classe que indica o regime de transição da proposição.
     Sempre será atributo de Proposicao.
     """
+    __slots__ = ('id_', 'descricao')
 
 
     def __init__(self, id_, descricao):
@@ -208,11 +221,12 @@ class Regime:
         self.descricao = descricao
 
 
-class TipoProposicao:
+class TipoProposicao(ObjetoCompartilhado):
     """
     Classe que indica o tipo da proposição.
     Sempre será atributo de Proposicao.
     """
+    __slots__ = ('id_', 'sigla', 'nome')
 
 
     def __init__(self, id_, sigla, nome):
@@ -228,11 +242,12 @@ class TipoProposicao:
         self.nome = nome
 
 
-class Apreciacao:
+class Apreciacao(ObjetoCompartilhado):
     """
     Classe que representa a apreciação de uma proposição.
     Sempre será atributo de Proposicao.
     """
+    __slots__ = ('id_', 'descricao')
 
 
     def __init__(self, id_, descricao):
@@ -246,7 +261,7 @@ class Apreciacao:
         self.descricao = descricao
 
 
-class Proposicao:
+class Proposicao(ObjetoCompacto):
     """
     Classe que representa uma proposição de lei.
 
@@ -259,6 +274,13 @@ class Proposicao:
     Nesse caso, ao final da descrição de cada atributo essas siglas irão
     indicar qual dos WS é a fonte do valor.
     """
+    __slots__ = ('id_', 'nome', 'numero', 'ano', '_data_apresentacao',
+                 'ementa', 'exp_ementa', 'qtde_autores', 'ind_genero',
+                 'qtd_orgaos_com_estado', 'tipo_proposicao', 'orgao_numerador',
+                 'regime', 'apreciacao', 'autor1', 'ultimo_despacho',
+                 'situacao', 'indices', 'tema', 'link_inteiro_teor',
+                 'apensadas', 'inteiro_teor')
+    data_apresentacao = CampoData()
 
 
     def __init__(self, id_, nome, numero, ano, data_apresentacao, ementa,
@@ -0,0 +1,730 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Cliente HTTP compartilhado por todos os scripts que consomem os Web Services da
+Câmara.
+
+As conexões são mantidas abertas (keep-alive) e reaproveitadas entre as
+chamadas, com um pool separado para cada host. Assim, o handshake TCP (e TLS)
+é feito uma vez por conexão, e não uma vez por deputado ou proposição.
+
+As respostas são pedidas com compressão gzip, e descomprimidas aqui.
+
+Cada host tem o seu limitador de taxa adaptativo (ver limitador.py), e as
+requisições que falham com erro 5xx, 429 ou timeout são repetidas com espera
+exponencial.
+
+Opcionalmente as respostas são guardadas no cache do módulo cache_ws. No modo
+offline nenhuma requisição é feita: tudo vem do cache.
+
+Uso:
+    import cliente_http
+    data = cliente_http.obter_xml(url)
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import atexit
+import contextlib
+import gzip
+import http.client
+import os.path
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+import xml.etree.ElementTree as ET
+from cache_ws import CacheRespostas
+from limitador import LimitadorAdaptativo
+from limitador import espera_exponencial
+from metricas import METRICAS
+from metricas import nome_endpoint
+from perfilador import PERFIL
+
+
+class ErroHTTP(Exception):
+    """
+    Erro retornado pelo servidor (status >= 400).
+    """
+
+
+    def __init__(self, url, status, motivo):
+        """
+        Método construtor.
+        Args:
+            url (str): url requisitada.
+            status (int): status HTTP da resposta.
+            motivo (str): texto do status HTTP.
+        """
+        super().__init__('{} {} - {}'.format(status, motivo, url))
+        self.url = url
+        self.status = status
+        self.motivo = motivo
+
+
+class RespostaAusente(Exception):
+    """
+    No modo offline, a resposta pedida não está no cache.
+    """
+
+
+class RespostaContinua:
+    """
+    Corpo de uma resposta HTTP lido aos poucos, já descomprimido.
+
+    Quando o corpo termina de ser lido, a conexão volta para o pool. Se a
+    leitura for interrompida, a conexão é fechada.
+    """
+
+
+    def __init__(self, cliente, host, conexao, res):
+        """
+        Método construtor.
+        Args:
+            cliente (ClienteHTTP): dono do pool da conexão.
+            host (scheme, netloc)
+            conexao (HTTPConnection)
+            res (HTTPResponse): resposta com os cabeçalhos já lidos.
+        """
+        self._cliente = cliente
+        self._host = host
+        self._conexao = conexao
+        self._res = res
+        self._descompressor = None
+        if res.getheader('Content-Encoding', '').lower() == 'gzip':
+            self._descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._buffer = b''
+        self._fim = False
+        self._fechada = False
+        #se não for None, recebe uma cópia de tudo que for lido (cache)
+        self.gravador = None
+        #se não for None, recebe o número de bytes de cada leitura
+        self.contador = None
+
+
+    def read(self, tamanho=-1):
+        """
+        Lê até tamanho bytes do corpo descomprimido.
+        Args:
+            tamanho (int): -1 para ler tudo.
+        Return:
+            dados (bytes): b'' no fim do corpo.
+        """
+        while not self._fim and (tamanho < 0 or len(self._buffer) < tamanho):
+            with PERFIL.etapa('rede'):
+                dados = self._res.read(tamanho if tamanho > 0 else 64 * 1024)
+            if not dados:
+                if self._descompressor is not None:
+                    self._buffer += self._descompressor.flush()
+                self._fim = True
+                self._cliente._liberar_conexao(self._host, self._conexao,
+                                               self._res)
+                break
+            if self._descompressor is not None:
+                dados = self._descompressor.decompress(dados)
+            self._buffer += dados
+        if tamanho < 0:
+            dados, self._buffer = self._buffer, b''
+        else:
+            dados, self._buffer = self._buffer[:tamanho], self._buffer[tamanho:]
+        if self.contador is not None:
+            self.contador(len(dados))
+        if self.gravador is not None:
+            self.gravador.write(dados)
+            if self._fim and not self._buffer:
+                self.gravador.concluir()
+                self.gravador = None
+        return dados
+
+
+    def close(self):
+        """
+        Encerra a leitura. Se o corpo não foi lido até o fim, a conexão é
+        fechada e a cópia para o cache é descartada.
+        """
+        if self._fechada:
+            return
+        self._fechada = True
+        if not self._fim:
+            self._conexao.close()
+        if self.gravador is not None:
+            self.gravador.descartar()
+            self.gravador = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP com conexões persistentes e um pool de conexões por host.
+
+    Pode ser usado por várias threads ao mesmo tempo: cada requisição pega uma
+    conexão livre do pool do host (ou abre uma nova) e a devolve ao terminar.
+    """
+
+    #erros que indicam que o servidor fechou uma conexão ociosa
+    ERROS_CONEXAO = (http.client.RemoteDisconnected,
+                     http.client.BadStatusLine,
+                     ConnectionResetError,
+                     BrokenPipeError)
+
+
+    #erros que justificam repetir a requisição
+    ERROS_TEMPORARIOS = (TimeoutError, ConnectionError,
+                         http.client.HTTPException)
+
+
+    def __init__(self, conexoes_por_host=8, timeout=60, max_redirecionamentos=5,
+                 tentativas=5, taxa_max=100.0, taxa_inicial=10.0):
+        """
+        Método construtor.
+        Args:
+            conexoes_por_host (int): número máximo de conexões ociosas
+                mantidas em cada pool.
+            timeout (int): timeout em segundos de cada conexão.
+            max_redirecionamentos (int): número máximo de redirecionamentos
+                seguidos numa requisição.
+            tentativas (int): número máximo de tentativas de cada requisição.
+            taxa_max (float): taxa máxima de requisições por segundo em cada
+                host.
+            taxa_inicial (float): taxa de requisições por segundo com que
+                cada host começa, antes de se adaptar.
+        """
+        self.conexoes_por_host = conexoes_por_host
+        self.timeout = timeout
+        self.max_redirecionamentos = max_redirecionamentos
+        self.tentativas = tentativas
+        self.taxa_max = taxa_max
+        self.taxa_inicial = taxa_inicial
+        self._limitadores = {}
+        self._pools = {}
+        self._trava = threading.Lock()
+        self.cache = None
+        self.offline = False
+        self.url_base = None
+        self._local = threading.local()
+
+
+    def _pool(self, host):
+        """
+        Retorna o pool de conexões ociosas de host, criando se necessário.
+        Args:
+            host (scheme, netloc)
+        """
+        with self._trava:
+            if host not in self._pools:
+                self._pools[host] = queue.LifoQueue(self.conexoes_por_host)
+            return self._pools[host]
+
+
+    def _limitador(self, host):
+        """
+        Retorna o limitador de taxa de host, criando se necessário.
+        Args:
+            host (scheme, netloc)
+        """
+        with self._trava:
+            if host not in self._limitadores:
+                self._limitadores[host] = LimitadorAdaptativo(
+                    taxa=min(self.taxa_inicial, self.taxa_max),
+                    taxa_max=self.taxa_max)
+            return self._limitadores[host]
+
+
+    def _nova_conexao(self, host):
+        """
+        Abre uma nova conexão para host.
+        Args:
+            host (scheme, netloc)
+        """
+        scheme, netloc = host
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+
+    def _pegar_conexao(self, host):
+        """
+        Retorna uma conexão ociosa do pool de host, ou uma nova conexão.
+        Args:
+            host (scheme, netloc)
+        Return:
+            (conexao, reaproveitada)
+        """
+        try:
+            return self._pool(host).get_nowait(), True
+        except queue.Empty:
+            return self._nova_conexao(host), False
+
+
+    def _devolver_conexao(self, host, conexao):
+        """
+        Devolve a conexão ao pool de host. Se o pool estiver cheio, a conexão é
+        fechada.
+        Args:
+            host (scheme, netloc)
+            conexao (HTTPConnection)
+        """
+        try:
+            self._pool(host).put_nowait(conexao)
+        except queue.Full:
+            conexao.close()
+
+
+    def _enviar(self, url):
+        """
+        Envia um GET para url e lê os cabeçalhos da resposta, sem ler o
+        corpo.
+        Args:
+            url (str)
+        Return:
+            (host, conexao, res)
+        """
+        partes = urllib.parse.urlsplit(url)
+        if self.url_base:
+            #troca o host, mantendo o caminho e a consulta
+            base = urllib.parse.urlsplit(self.url_base)
+            partes = partes._replace(scheme=base.scheme, netloc=base.netloc)
+        host = (partes.scheme, partes.netloc)
+        caminho = urllib.parse.urlunsplit(('', '', partes.path or '/',
+                                           partes.query, ''))
+        cabecalhos = {'Accept-Encoding': 'gzip',
+                      'Connection': 'keep-alive'}
+        while True:
+            conexao, reaproveitada = self._pegar_conexao(host)
+            try:
+                conexao.request('GET', caminho, headers=cabecalhos)
+                return host, conexao, conexao.getresponse()
+            except self.ERROS_CONEXAO:
+                conexao.close()
+                #conexão ociosa fechada pelo servidor, tenta com outra
+                if reaproveitada:
+                    continue
+                raise
+            except Exception:
+                conexao.close()
+                raise
+
+
+    def _liberar_conexao(self, host, conexao, res):
+        """
+        Depois que o corpo de res foi todo lido, devolve a conexão ao pool, ou
+        a fecha se o servidor pediu.
+        Args:
+            host (scheme, netloc)
+            conexao (HTTPConnection)
+            res (HTTPResponse)
+        """
+        if res.will_close:
+            conexao.close()
+        else:
+            self._devolver_conexao(host, conexao)
+
+
+    def _requisitar(self, url):
+        """
+        Faz um GET em url, sem seguir redirecionamentos.
+        Args:
+            url (str)
+        Return:
+            (status, motivo, cabecalhos, corpo)
+        """
+        host, conexao, res = self._enviar(url)
+        try:
+            corpo = res.read()
+        except Exception:
+            conexao.close()
+            raise
+        self._liberar_conexao(host, conexao, res)
+        if res.getheader('Content-Encoding', '').lower() == 'gzip':
+            corpo = gzip.decompress(corpo)
+        return res.status, res.reason, res.headers, corpo
+
+
+    def _requisitar_continuo(self, url):
+        """
+        Como _requisitar, mas numa resposta 2xx o corpo não é lido: é
+        retornado um RespostaContinua para ser lido aos poucos.
+        Args:
+            url (str)
+        Return:
+            (status, motivo, cabecalhos, corpo)
+        """
+        host, conexao, res = self._enviar(url)
+        if 200 <= res.status < 300:
+            return res.status, res.reason, res.headers, \
+                    RespostaContinua(self, host, conexao, res)
+        try:
+            corpo = res.read()
+        except Exception:
+            conexao.close()
+            raise
+        self._liberar_conexao(host, conexao, res)
+        return res.status, res.reason, res.headers, corpo
+
+
+    def _ler_cache(self):
+        """
+        Indica se as respostas devem ser procuradas no cache, na thread
+        atual (ver renovando_cache).
+        """
+        return self.cache is not None and \
+            not getattr(self._local, 'renovar', False)
+
+
+    @contextlib.contextmanager
+    def renovando_cache(self):
+        """
+        Dentro do with, as requisições da thread atual não são lidas do
+        cache, somente gravadas nele, então as respostas vêm sempre do
+        servidor (ex.: sincronização).
+        """
+        anterior = getattr(self._local, 'renovar', False)
+        self._local.renovar = True
+        try:
+            yield
+        finally:
+            self._local.renovar = anterior
+
+
+    def obter(self, url):
+        """
+        Faz um GET em url seguindo redirecionamentos. Se houver cache, a
+        resposta é procurada nele antes, e gravada nele depois.
+        Args:
+            url (str)
+        Return:
+            corpo (bytes): conteúdo da resposta, já descomprimido.
+        """
+        if self._ler_cache():
+            corpo = self.cache.ler(url, ignorar_ttl=self.offline)
+            if corpo is not None:
+                METRICAS.registrar_acerto_cache(nome_endpoint(url))
+                return corpo
+        if self.offline:
+            raise RespostaAusente(url)
+        corpo = self._obter_rede(url)
+        if self.cache is not None:
+            self.cache.gravar(url, corpo)
+        return corpo
+
+
+    def abrir(self, url):
+        """
+        Faz um GET em url e retorna a resposta sem lê-la, para ser consumida
+        aos poucos (ex.: com ET.iterparse). Assim a resposta inteira nunca fica
+        na memória. Se houver cache, a resposta vem dele, ou é copiada para ele
+        enquanto é lida.
+        Args:
+            url (str)
+        Return:
+            resposta: objeto com os métodos read e close. Pode ser usado com
+                with.
+        """
+        if self._ler_cache():
+            resposta = self.cache.abrir(url, ignorar_ttl=self.offline)
+            if resposta is not None:
+                METRICAS.registrar_acerto_cache(nome_endpoint(url))
+                return resposta
+        if self.offline:
+            raise RespostaAusente(url)
+        resposta = self._obter_rede(url, self._requisitar_continuo)
+        if self.cache is not None:
+            resposta.gravador = self.cache.gravador(url)
+        return resposta
+
+
+    def _obter_rede(self, url, requisitar=None):
+        """
+        Faz um GET em url seguindo redirecionamentos, sem consultar o cache.
+        Args:
+            url (str)
+            requisitar (function): _requisitar (padrão) ou
+                _requisitar_continuo.
+        Return:
+            corpo (bytes): ou um RespostaContinua, com _requisitar_continuo.
+        """
+        for _ in range(self.max_redirecionamentos + 1):
+            with PERFIL.etapa('rede'):
+                status, motivo, cabecalhos, corpo = \
+                        self._requisitar_com_limite(url, requisitar)
+            if status in (301, 302, 303, 307, 308):
+                url = urllib.parse.urljoin(url, cabecalhos['Location'])
+                continue
+            if status >= 400:
+                raise ErroHTTP(url, status, motivo)
+            return corpo
+        raise ErroHTTP(url, status, 'redirecionamentos demais')
+
+
+    def _requisitar_com_limite(self, url, requisitar=None):
+        """
+        Faz um GET em url respeitando o limitador do host, e repete a
+        requisição com espera exponencial em caso de erro 5xx, 429 ou timeout.
+        Args:
+            url (str)
+            requisitar (function): _requisitar (padrão) ou
+                _requisitar_continuo.
+        Return:
+            (status, motivo, cabecalhos, corpo)
+        """
+        requisitar = requisitar or self._requisitar
+        partes = urllib.parse.urlsplit(url)
+        limitador = self._limitador((partes.scheme, partes.netloc))
+        endpoint = nome_endpoint(url)
+        for tentativa in range(self.tentativas):
+            limitador.aguardar()
+            inicio = time.monotonic()
+            try:
+                resposta = requisitar(url)
+            except self.ERROS_TEMPORARIOS as erro:
+                falha = erro
+                METRICAS.registrar_erro(endpoint, type(erro).__name__)
+            else:
+                status = resposta[0]
+                latencia = time.monotonic() - inicio
+                METRICAS.registrar_requisicao(endpoint, latencia, status)
+                if status < 500 and status != 429:
+                    limitador.registrar_sucesso(latencia)
+                    corpo = resposta[3]
+                    if isinstance(corpo, bytes):
+                        METRICAS.registrar_bytes(endpoint, len(corpo))
+                    else:
+                        corpo.contador = lambda tamanho: \
+                                METRICAS.registrar_bytes(endpoint, tamanho)
+                    return resposta
+                falha = ErroHTTP(url, status, resposta[1])
+                METRICAS.registrar_erro(endpoint, 'HTTP {}'.format(status))
+            limitador.registrar_erro()
+            if tentativa + 1 < self.tentativas:
+                METRICAS.registrar_repeticao(endpoint)
+                time.sleep(espera_exponencial(tentativa))
+        raise falha
+
+
+    def obter_xml(self, url):
+        """
+        Faz um GET em url e interpreta a resposta como xml.
+        Args:
+            url (str)
+        Return:
+            data (Element): raiz do xml da resposta.
+        """
+        corpo = self.obter(url)
+        inicio = time.monotonic()
+        with PERFIL.etapa('xml'):
+            data = ET.fromstring(corpo)
+        METRICAS.registrar_interpretacao(nome_endpoint(url),
+                                         time.monotonic() - inicio)
+        return data
+
+
+    def baixar_arquivo(self, url):
+        """
+        Baixa o conteúdo de url para um arquivo temporário.
+        Args:
+            url (str)
+        Return:
+            nome (str): caminho do arquivo temporário. Quem chama deve
+                apagá-lo.
+        """
+        #o corpo vai para o disco aos poucos, sem ficar todo na memória
+        with self.abrir(url) as resposta, \
+                tempfile.NamedTemporaryFile(delete=False) as arq:
+            try:
+                shutil.copyfileobj(resposta, arq, 64 * 1024)
+            except BaseException:
+                arq.close()
+                os.remove(arq.name)
+                raise
+            return arq.name
+
+
+    def fechar(self):
+        """
+        Fecha todas as conexões ociosas.
+        """
+        with self._trava:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
+#cliente usado pelos scripts
+CLIENTE = ClienteHTTP()
+
+
+def configurar_cache(pasta='down_files/cache', ttl_dias=30, tamanho_max_gb=10,
+                     offline=False):
+    """
+    Liga o cache de respostas no cliente compartilhado.
+    Args:
+        pasta (str): pasta do cache.
+        ttl_dias (float): validade das entradas em dias.
+        tamanho_max_gb (float): tamanho máximo do cache em GB.
+        offline (boolean): não faz requisições, somente lê o cache.
+    """
+    CLIENTE.cache = CacheRespostas(pasta, int(ttl_dias * 24 * 3600),
+                                   int(tamanho_max_gb * 1024 ** 3))
+    CLIENTE.offline = offline
+    if not offline:
+        CLIENTE.cache.limpar()
+
+
+def renovando_cache():
+    """
+    Ver ClienteHTTP.renovando_cache.
+    """
+    return CLIENTE.renovando_cache()
+
+
+def precisa_gerar(arquivo):
+    """
+    Indica se um arquivo pickle deve ser gerado: quando não existe ou quando
+    está no modo offline, que refaz todos os arquivos a partir do cache.
+    Args:
+        arquivo (str)
+    """
+    return CLIENTE.offline or not os.path.isfile(arquivo)
+
+
+def obter(url):
+    """
+    Faz um GET em url usando o cliente compartilhado.
+    Args:
+        url (str)
+    Return:
+        corpo (bytes)
+    """
+    return CLIENTE.obter(url)
+
+
+def obter_xml(url):
+    """
+    Faz um GET em url usando o cliente compartilhado e interpreta como xml.
+    Args:
+        url (str)
+    Return:
+        data (Element)
+    """
+    return CLIENTE.obter_xml(url)
+
+
+def abrir(url):
+    """
+    Abre url para leitura aos poucos usando o cliente compartilhado.
+    Args:
+        url (str)
+    Return:
+        resposta: objeto com read e close.
+    """
+    return CLIENTE.abrir(url)
+
+
+def baixar_arquivo(url):
+    """
+    Baixa url para um arquivo temporário usando o cliente compartilhado.
+    Args:
+        url (str)
+    Return:
+        nome (str): caminho do arquivo temporário.
+    """
+    return CLIENTE.baixar_arquivo(url)
+
+
+def adicionar_argumentos(parser):
+    """
+    Adiciona ao parser de um script os argumentos que configuram o cliente
+    compartilhado.
+    Args:
+        parser (ArgumentParser)
+    """
+    parser.add_argument('-tentativas', type=int, default=5,
+                        help="""número máximo de tentativas de cada requisição
+                             que falhar com erro 5xx ou timeout. Padrão 5.""")
+    parser.add_argument('-taxa_max', type=float, default=100,
+                        help="""taxa máxima de requisições por segundo em cada
+                             host. A taxa real se adapta às respostas do
+                             servidor. Padrão 100.""")
+    parser.add_argument('-cache', action='store_true',
+                        help="""guarda as respostas cruas dos Web Services em
+                             down_files/cache, e as reaproveita enquanto não
+                             expirarem.""")
+    parser.add_argument('-cache_ttl', type=float, default=30,
+                        help="""validade das respostas no cache, em dias.
+                             Padrão 30.""")
+    parser.add_argument('-cache_max_gb', type=float, default=10,
+                        help="""tamanho máximo do cache em GB. Padrão 10.""")
+    parser.add_argument('-offline', '--offline', action='store_true',
+                        help="""não acessa a rede: refaz todos os arquivos a
+                             partir das respostas guardadas no cache.""")
+    parser.add_argument('-metricas', type=str, default=None,
+                        help="""grava, no fim da execução, as métricas de
+                             cada endpoint em METRICAS.prom (formato do
+                             Prometheus) e METRICAS.json. Ex.: -metricas
+                             logs/metricas.""")
+    parser.add_argument('-url_base', type=str, default=None,
+                        help="""troca o host de todas as requisições (ex.:
+                             http://localhost:8080, o servidor_local.py).""")
+    parser.add_argument('-profile', '--profile', type=str, nargs='?',
+                        const='logs/perfil', default=None,
+                        help="""mede o tempo de cada etapa (rede, xml,
+                             objetos, pdf, tokens, pickle) e roda o cProfile;
+                             no fim grava PROFILE.etapas.txt,
+                             PROFILE.etapas.json e callgrind.out.* (para o
+                             KCachegrind). Padrão logs/perfil.""")
+
+
+def aplicar_argumentos(args):
+    """
+    Configura o cliente compartilhado a partir dos argumentos de
+    adicionar_argumentos.
+    Args:
+        args (dict): vars(parser.parse_args())
+    """
+    CLIENTE.tentativas = max(1, args['tentativas'])
+    CLIENTE.taxa_max = args['taxa_max']
+    CLIENTE.url_base = args['url_base']
+    if args['metricas']:
+        atexit.register(METRICAS.gravar, args['metricas'])
+    if args['profile']:
+        PERFIL.iniciar()
+        atexit.register(PERFIL.gravar, args['profile'])
+    if args['cache'] or args['offline']:
+        configurar_cache(ttl_dias=args['cache_ttl'],
+                         tamanho_max_gb=args['cache_max_gb'],
+                         offline=args['offline'])
@@ -0,0 +1,383 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Exportação e importação das proposições em formato colunar (Parquet ou Arrow
+IPC), para análise.
+
+Cada Proposicao vira uma linha, com tipo_proposicao, orgao_numerador, regime,
+apreciacao, autor1, ultimo_despacho e situacao achatados em colunas (ex.:
+autor1_sigla_partido). As colunas com poucos valores distintos (siglas,
+partido, UF, situação, ...) são codificadas em dicionário. Ler só algumas
+colunas de vários anos é rápido:
+    tabela = ler_anos('PL', range(2007, 2017), True,
+                      colunas=['id', 'ano', 'autor1_sigla_partido'])
+
+Precisa do pyarrow (pip install pyarrow), que é opcional: sem ele, o resto
+do baixa_camara funciona normalmente.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import argparse
+import json
+import os
+import pickle as pkl
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+from classes_base import compartilhado
+from classes_proposicoes import Apreciacao
+from classes_proposicoes import Autor
+from classes_proposicoes import Orgao
+from classes_proposicoes import OrgaoNumerador
+from classes_proposicoes import Proposicao
+from classes_proposicoes import Regime
+from classes_proposicoes import SituacaoProposicao
+from classes_proposicoes import TipoProposicao
+from classes_proposicoes import UltimoDespacho
+from obter_proposicoes import arquivo_proposicoes
+
+
+FORMATOS = ['parquet', 'arrow']
+
+#tipos das colunas: inteiro, texto, dicionario (texto codificado em
+#dicionário), lista (lista de textos) e apensadas (lista de (nome, cod))
+#
+#(coluna, tipo, atributos do valor na Proposicao)
+COLUNAS = [
+    ('id', 'inteiro', ('id_',)),
+    ('nome', 'texto', ('nome',)),
+    ('numero', 'inteiro', ('numero',)),
+    ('ano', 'inteiro', ('ano',)),
+    ('data_apresentacao', 'texto', ('data_apresentacao',)),
+    ('ementa', 'texto', ('ementa',)),
+    ('exp_ementa', 'texto', ('exp_ementa',)),
+    ('qtde_autores', 'texto', ('qtde_autores',)),
+    ('ind_genero', 'dicionario', ('ind_genero',)),
+    ('qtd_orgaos_com_estado', 'texto', ('qtd_orgaos_com_estado',)),
+    ('tema', 'dicionario', ('tema',)),
+    ('link_inteiro_teor', 'texto', ('link_inteiro_teor',)),
+    ('indices', 'lista', ('indices',)),
+    ('apensadas', 'apensadas', ('apensadas',)),
+    ('tipo_id', 'dicionario', ('tipo_proposicao', 'id_')),
+    ('tipo_sigla', 'dicionario', ('tipo_proposicao', 'sigla')),
+    ('tipo_nome', 'dicionario', ('tipo_proposicao', 'nome')),
+    ('orgao_numerador_id', 'dicionario', ('orgao_numerador', 'id_')),
+    ('orgao_numerador_sigla', 'dicionario', ('orgao_numerador', 'sigla')),
+    ('orgao_numerador_nome', 'dicionario', ('orgao_numerador', 'nome')),
+    ('regime_id', 'dicionario', ('regime', 'id_')),
+    ('regime_descricao', 'dicionario', ('regime', 'descricao')),
+    ('apreciacao_id', 'dicionario', ('apreciacao', 'id_')),
+    ('apreciacao_descricao', 'dicionario', ('apreciacao', 'descricao')),
+    ('autor1_nome', 'texto', ('autor1', 'nome')),
+    ('autor1_ide_cadastro', 'texto', ('autor1', 'ide_cadastro')),
+    ('autor1_cod_partido', 'dicionario', ('autor1', 'cod_partido')),
+    ('autor1_sigla_partido', 'dicionario', ('autor1', 'sigla_partido')),
+    ('autor1_uf', 'dicionario', ('autor1', 'uf_')),
+    ('ultimo_despacho_data', 'texto', ('ultimo_despacho', 'data')),
+    ('ultimo_despacho_texto', 'texto', ('ultimo_despacho', 'texto')),
+    ('situacao_id', 'dicionario', ('situacao', 'id_')),
+    ('situacao_descricao', 'dicionario', ('situacao', 'descricao')),
+    ('situacao_orgao_id', 'dicionario', ('situacao', 'orgao', 'id_')),
+    ('situacao_orgao_sigla', 'dicionario', ('situacao', 'orgao', 'sigla')),
+    ('situacao_cod_prop_principal', 'texto',
+     ('situacao', 'prop_principal', 'cod_prop_principal')),
+    ('situacao_prop_principal', 'texto',
+     ('situacao', 'prop_principal', 'prop_principal')),
+    ('inteiro_teor', 'lista', ('inteiro_teor',))]
+
+COLUNAS_DICIONARIO = [nome for nome, tipo, _ in COLUNAS
+                      if tipo == 'dicionario']
+
+
+def _verificar_pyarrow():
+    if pa is None:
+        raise ImportError('o formato colunar precisa do pyarrow '
+                          '(pip install pyarrow)')
+
+
+def _tipo_arrow(tipo):
+    """
+    Tipo do pyarrow de um tipo de coluna de COLUNAS.
+    """
+    if tipo == 'inteiro':
+        return pa.int64()
+    if tipo == 'lista':
+        return pa.list_(pa.string())
+    if tipo == 'apensadas':
+        return pa.list_(pa.struct([('nome', pa.string()),
+                                   ('cod', pa.string())]))
+    return pa.string()
+
+
+def _valor(prop, atributos):
+    """
+    Segue atributos a partir de prop (ex.: ('autor1', 'uf_')). Retorna None se
+    algum deles não existir. prop_principal é um dicionário.
+    """
+    valor = prop
+    for atributo in atributos:
+        if valor is None:
+            return None
+        if isinstance(valor, dict):
+            valor = valor.get(atributo)
+        else:
+            valor = getattr(valor, atributo, None)
+    return valor
+
+
+def _inteiro(valor):
+    """
+    Converte os números do xml (que vêm como texto) para int.
+    """
+    if valor is None or valor == '':
+        return None
+    return int(valor)
+
+
+def tabela_proposicoes(props, numeros=None):
+    """
+    Monta a tabela do pyarrow com uma linha por proposição.
+    Args:
+        props (list): lista de Proposicao.
+        numeros (list): números da listagem, guardados nos metadados.
+    Return:
+        tabela (Table)
+    """
+    _verificar_pyarrow()
+    colunas = []
+    for nome, tipo, atributos in COLUNAS:
+        valores = [_valor(prop, atributos) for prop in props]
+        if tipo == 'inteiro':
+            valores = [_inteiro(valor) for valor in valores]
+        elif tipo == 'apensadas':
+            valores = [[{'nome': nome_apens, 'cod': cod}
+                        for nome_apens, cod in valor] if valor else []
+                       for valor in valores]
+        coluna = pa.array(valores, type=_tipo_arrow(tipo))
+        if tipo == 'dicionario':
+            coluna = coluna.dictionary_encode()
+        colunas.append(coluna)
+    metadados = {'numeros': json.dumps(numeros if numeros is not None else [])}
+    return pa.Table.from_arrays(colunas, names=[nome for nome, _, _ in COLUNAS],
+                                metadata=metadados)
+
+
+def exportar(props, numeros, caminho, formato='parquet'):
+    """
+    Grava as proposições em caminho, no formato colunar.
+    Args:
+        props (list): lista de Proposicao.
+        numeros (list): números da listagem (como no arquivo pickle).
+        caminho (str)
+        formato (str): 'parquet' ou 'arrow' (Arrow IPC, lido com mmap).
+    """
+    tabela = tabela_proposicoes(props, numeros)
+    tmp = caminho + '.tmp'
+    if formato == 'parquet':
+        pq.write_table(tabela, tmp, compression='zstd',
+                       use_dictionary=COLUNAS_DICIONARIO)
+    elif formato == 'arrow':
+        with pa.OSFile(tmp, 'wb') as arq, \
+                pa.ipc.new_file(arq, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    else:
+        raise ValueError('formato desconhecido: {}'.format(formato))
+    os.replace(tmp, caminho)
+
+
+def ler_tabela(caminho, colunas=None):
+    """
+    Lê um arquivo colunar. Somente as colunas pedidas são lidas do disco.
+    Args:
+        caminho (str): arquivo .parquet ou .arrow.
+        colunas (list): nomes das colunas; None para todas.
+    Return:
+        tabela (Table)
+    """
+    _verificar_pyarrow()
+    if caminho.endswith('.parquet'):
+        pedidas = colunas or [nome for nome, _, _ in COLUNAS]
+        return pq.read_table(caminho, columns=colunas,
+                             read_dictionary=[nome for nome in pedidas
+                                              if nome in COLUNAS_DICIONARIO])
+    #o Arrow IPC é mapeado na memória: as colunas não usadas nem são lidas
+    tabela = pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+    if colunas is not None:
+        tabela = tabela.select(colunas)
+    return tabela
+
+
+def arquivo_colunar(sigla, ano, apensadas, formato='parquet'):
+    """
+    Caminho do arquivo colunar de um ano, ao lado do arquivo pickle.
+    Ex.: down_files/prop_props_PL_2011_apens_True.parquet
+    """
+    base = os.path.splitext(arquivo_proposicoes(sigla, ano, apensadas))[0]
+    return '{}.{}'.format(base, formato)
+
+
+def ler_anos(sigla, anos, apensadas=False, colunas=None, formato='parquet'):
+    """
+    Lê as colunas pedidas de vários anos numa tabela só. Os anos sem arquivo
+    colunar são ignorados.
+    Args:
+        sigla (str)
+        anos (list)
+        apensadas (boolean)
+        colunas (list): None para todas.
+        formato (str)
+    Return:
+        tabela (Table)
+    """
+    tabelas = [ler_tabela(arquivo_colunar(sigla, ano, apensadas, formato),
+                          colunas)
+               for ano in anos
+               if os.path.isfile(arquivo_colunar(sigla, ano, apensadas,
+                                                 formato))]
+    if not tabelas:
+        return None
+    return pa.concat_tables(tabelas, promote_options='permissive')
+
+
+def _texto(valor):
+    """
+    Volta os números para texto, como no xml.
+    """
+    return None if valor is None else str(valor)
+
+
+def _preenchido(linha, prefixo):
+    return any(valor is not None for nome, valor in linha.items()
+               if nome.startswith(prefixo))
+
+
+def monta_proposicao_linha(linha):
+    """
+    Remonta uma Proposicao a partir de uma linha da tabela.
+    Args:
+        linha (dict): coluna -> valor.
+    Return:
+        prop (Proposicao)
+    """
+    prop = Proposicao(_texto(linha['id']), linha['nome'],
+                      _texto(linha['numero']), _texto(linha['ano']),
+                      linha['data_apresentacao'], linha['ementa'],
+                      linha['exp_ementa'], linha['qtde_autores'],
+                      linha['ind_genero'], linha['qtd_orgaos_com_estado'])
+    prop.set_tema(linha['tema'])
+    prop.set_link_inteiro_teor(linha['link_inteiro_teor'])
+    prop.set_indexacao(linha['indices'])
+    for apensada in linha['apensadas'] or []:
+        prop.add_apensada((apensada['nome'], apensada['cod']))
+    if _preenchido(linha, 'tipo_'):
+        prop.set_tipo_proposicao(compartilhado(
+            TipoProposicao, linha['tipo_id'], linha['tipo_sigla'],
+            linha['tipo_nome']))
+    if _preenchido(linha, 'orgao_numerador_'):
+        prop.set_orgao_numerador(compartilhado(
+            OrgaoNumerador, linha['orgao_numerador_id'],
+            linha['orgao_numerador_sigla'], linha['orgao_numerador_nome']))
+    if _preenchido(linha, 'regime_'):
+        prop.set_regime(compartilhado(Regime, linha['regime_id'],
+                                      linha['regime_descricao']))
+    if _preenchido(linha, 'apreciacao_'):
+        prop.set_apreciacao(compartilhado(Apreciacao, linha['apreciacao_id'],
+                                          linha['apreciacao_descricao']))
+    if _preenchido(linha, 'autor1_'):
+        prop.set_autor1(Autor(
+            linha['autor1_nome'], linha['autor1_ide_cadastro'],
+            linha['autor1_cod_partido'], linha['autor1_sigla_partido'],
+            linha['autor1_uf']))
+    if _preenchido(linha, 'ultimo_despacho_'):
+        prop.set_ultimo_despacho(UltimoDespacho(
+            linha['ultimo_despacho_data'], linha['ultimo_despacho_texto']))
+    if _preenchido(linha, 'situacao_'):
+        situacao = SituacaoProposicao(linha['situacao_id'],
+                                      linha['situacao_descricao'])
+        if _preenchido(linha, 'situacao_orgao_'):
+            situacao.set_orgao(compartilhado(Orgao,
+                                             linha['situacao_orgao_id'],
+                                             linha['situacao_orgao_sigla']))
+        if _preenchido(linha, 'situacao_cod_prop_principal') or \
+                _preenchido(linha, 'situacao_prop_principal'):
+            situacao.set_prop_principal({
+                'cod_prop_principal': linha['situacao_cod_prop_principal'],
+                'prop_principal': linha['situacao_prop_principal']})
+        prop.set_situacao(situacao)
+    if linha['inteiro_teor'] is not None:
+        prop.inteiro_teor = linha['inteiro_teor']
+    return prop
+
+
+def importar(caminho):
+    """
+    Lê um arquivo colunar inteiro de volta para objetos.
+    Args:
+        caminho (str)
+    Return:
+        (props, numeros): como no arquivo pickle.
+    """
+    tabela = ler_tabela(caminho)
+    metadados = tabela.schema.metadata or {}
+    numeros = json.loads(metadados.get(b'numeros', b'[]'))
+    return [monta_proposicao_linha(linha) for linha in tabela.to_pylist()], \
+            numeros
+
+
+def main():
+    #tratando os argumentos da linha de comando
+    parser = argparse.ArgumentParser(
+            description="""Exporta os arquivos pickle de proposições já
+                        baixadas para o formato colunar (Parquet ou Arrow
+                        IPC), ao lado do pickle. Precisa do pyarrow.""",
+            epilog="""Ex. de uso: ./colunas_proposicoes.py -anos 2011 2012
+                   -tipos PL -apensadas -formato parquet""")
+    parser.add_argument('-anos', type=int, nargs='*', required=True,
+                        help="""anos das proposições já baixadas.""")
+    parser.add_argument('-tipos', type=str, nargs='*', required=True,
+                        help="""tipos de proposição já baixadas.""")
+    parser.add_argument('-apensadas', action='store_true',
+                        help="""indica se o arquivo das proposições já baixadas
+                             contém apensadas ou não.""")
+    parser.add_argument('-formato', type=str, default='parquet',
+                        choices=FORMATOS,
+                        help="""formato da exportação. Padrão parquet.""")
+    args = vars(parser.parse_args())
+    for tp in args['tipos']:
+        for ano in args['anos']:
+            arquivo = arquivo_proposicoes(tp, ano, args['apensadas'])
+            if not os.path.isfile(arquivo):
+                print('\tarquivo {} não encontrado.'.format(arquivo))
+                continue
+            with open(arquivo, 'rb') as arq:
+                props, numeros = pkl.load(arq)
+            destino = arquivo_colunar(tp, ano, args['apensadas'],
+                                      args['formato'])
+            exportar(props, numeros, destino, args['formato'])
+            print('{} proposições gravadas em {}'.format(len(props), destino))
+
+if __name__ == '__main__':
+    main()
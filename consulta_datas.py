@@ -0,0 +1,275 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Buscas por intervalo de datas nas proposições e nos períodos de exercício
+dos deputados.
+
+As datas já ficam nos objetos como número do dia (ver CampoData em
+classes_base.py). Os índices daqui ordenam esses números uma vez, num
+array, e cada busca é uma busca binária (bisect), sem converter texto:
+    datas = datas_proposicoes(props)
+    datas.entre('01/03/2011', '31/03/2011')
+    periodos = periodos_deputados(deputados)
+    periodos.sobrepostos('01/01/2016', '31/12/2016')  #[(deputado, periodo)]
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import argparse
+import array
+from bisect import bisect_left
+from bisect import bisect_right
+import datetime
+import os
+import pickle as pkl
+from classes_base import dia
+from classes_base import dia_de
+from indice_proposicoes import carrega_proposicoes
+from obter_proposicoes import arquivo_proposicoes
+
+
+ARQ_DEPUTADOS = 'down_files/deputados.pkl'
+
+#fim dos períodos sem data de fim (ainda em exercício)
+SEM_FIM = datetime.date.max.toordinal()
+
+
+def como_dia(data):
+    """
+    Converte um limite de busca no número do dia.
+    Args:
+        data: int (número do dia), date, 'dd/mm/aaaa' ou 'aaaa-mm-dd'.
+    Return:
+        dia (int): None se data for None.
+    """
+    if data is None or isinstance(data, int):
+        return data
+    if isinstance(data, datetime.date):
+        return data.toordinal()
+    if '-' in data:
+        return datetime.date(*map(int, data.split('-'))).toordinal()
+    convertido = dia_de(data)
+    if convertido is None:
+        raise ValueError('data inválida: {}'.format(data))
+    return convertido
+
+
+class IndiceDatas:
+    """
+    Registros ordenados por uma data, para buscas por intervalo.
+    """
+
+
+    def __init__(self, registros, chave):
+        """
+        Método construtor. Registros sem data ficam de fora.
+        Args:
+            registros (iterable)
+            chave (function): recebe um registro e retorna o número do dia
+                dele, ou None.
+        """
+        pares = [(chave(registro), posicao, registro)
+                 for posicao, registro in enumerate(registros)]
+        pares = sorted((par for par in pares if par[0] is not None),
+                       key=lambda par: par[:2])
+        self.dias = array.array('l', [par[0] for par in pares])
+        self.registros = [par[2] for par in pares]
+
+
+    def __len__(self):
+        return len(self.registros)
+
+
+    def _limites(self, inicio, fim):
+        inicio = como_dia(inicio)
+        fim = como_dia(fim)
+        primeiro = 0 if inicio is None else bisect_left(self.dias, inicio)
+        ultimo = len(self.dias) if fim is None else \
+            bisect_right(self.dias, fim)
+        return primeiro, max(primeiro, ultimo)
+
+
+    def entre(self, inicio=None, fim=None):
+        """
+        Registros com a data entre inicio e fim, inclusive, em ordem de data.
+        Args:
+            inicio: ver como_dia. Se None, sem limite.
+            fim: ver como_dia. Se None, sem limite.
+        Return:
+            registros (list)
+        """
+        primeiro, ultimo = self._limites(inicio, fim)
+        return self.registros[primeiro:ultimo]
+
+
+    def contar(self, inicio=None, fim=None):
+        """
+        Número de registros com a data entre inicio e fim, inclusive.
+        """
+        primeiro, ultimo = self._limites(inicio, fim)
+        return ultimo - primeiro
+
+
+class IndicePeriodos:
+    """
+    Períodos (início, fim) ordenados, para buscar os que se sobrepõem a um
+    intervalo.
+    """
+
+
+    def __init__(self, registros, chave_inicio, chave_fim):
+        """
+        Método construtor. Registros sem início ficam de fora; sem fim, vão
+        até SEM_FIM.
+        Args:
+            registros (iterable)
+            chave_inicio (function): número do dia do início, ou None.
+            chave_fim (function): número do dia do fim, ou None.
+        """
+        trios = []
+        for registro in registros:
+            inicio = chave_inicio(registro)
+            if inicio is not None:
+                fim = chave_fim(registro)
+                trios.append((inicio, SEM_FIM if fim is None else fim,
+                              registro))
+        trios.sort(key=lambda trio: trio[:2])
+        self.inicios = array.array('l', [trio[0] for trio in trios])
+        self.fins = array.array('l', [trio[1] for trio in trios])
+        self.registros = [trio[2] for trio in trios]
+        #maior fim até cada posição: não diminui, então também aceita bisect
+        self._fins_maximos = array.array('l')
+        maximo = 0
+        for fim in self.fins:
+            maximo = max(maximo, fim)
+            self._fins_maximos.append(maximo)
+
+
+    def __len__(self):
+        return len(self.registros)
+
+
+    def sobrepostos(self, inicio=None, fim=None):
+        """
+        Registros cujo período tem algum dia entre inicio e fim, inclusive.
+        Args:
+            inicio: ver como_dia. Se None, sem limite.
+            fim: ver como_dia. Se None, sem limite.
+        Return:
+            registros (list): em ordem de início.
+        """
+        inicio = como_dia(inicio)
+        fim = como_dia(fim)
+        #antes de primeiro, todos os períodos terminaram antes de inicio;
+        #a partir de ultimo, todos começam depois de fim
+        primeiro = 0 if inicio is None else \
+            bisect_left(self._fins_maximos, inicio)
+        ultimo = len(self.inicios) if fim is None else \
+            bisect_right(self.inicios, fim)
+        return [self.registros[posicao] for posicao in range(primeiro, ultimo)
+                if inicio is None or self.fins[posicao] >= inicio]
+
+
+    def em(self, data):
+        """
+        Registros cujo período contém data.
+        """
+        return self.sobrepostos(data, data)
+
+
+def datas_proposicoes(props, despacho=False):
+    """
+    Índice das proposições pela data de apresentação.
+    Args:
+        props (list)
+        despacho (boolean): usa a data do último despacho em vez da data de
+            apresentação.
+    Return:
+        indice (IndiceDatas)
+    """
+    if despacho:
+        return IndiceDatas(props, lambda prop: dia(prop.ultimo_despacho,
+                                                   'data')
+                           if getattr(prop, 'ultimo_despacho', None)
+                           else None)
+    return IndiceDatas(props, lambda prop: dia(prop, 'data_apresentacao'))
+
+
+def periodos_deputados(deputados):
+    """
+    Índice dos períodos de exercício dos deputados.
+    Args:
+        deputados (list): deputados com os detalhes.
+    Return:
+        indice (IndicePeriodos): os registros são pares (deputado, periodo).
+    """
+    pares = [(deputado, periodo) for deputado in deputados
+             if getattr(deputado, 'detalhes_deputado', None)
+             for periodo in deputado.detalhes_deputado.periodos_exercicio]
+    return IndicePeriodos(pares, lambda par: dia(par[1], 'data_inicio'),
+                          lambda par: dia(par[1], 'data_fim'))
+
+
+def main():
+    #tratando os argumentos da linha de comando
+    parser = argparse.ArgumentParser(
+            description="""Lista as proposições apresentadas, ou os deputados
+                        em exercício, num intervalo de datas.""",
+            epilog="""Ex. de uso: ./consulta_datas.py -anos 2011 -tipos PL
+                   -apensadas -inicio 01/03/2011 -fim 31/03/2011""")
+    parser.add_argument('-deputados', action='store_true',
+                        help="""busca os períodos de exercício em
+                             down_files/deputados.pkl.""")
+    parser.add_argument('-anos', type=int, nargs='*', default=[],
+                        help="""anos das proposições já baixadas.""")
+    parser.add_argument('-tipos', type=str, nargs='*', default=[],
+                        help="""tipos de proposição já baixadas.""")
+    parser.add_argument('-apensadas', action='store_true',
+                        help="""indica se o arquivo das proposições já baixadas
+                             contém apensadas ou não.""")
+    parser.add_argument('-inicio', type=str, default=None,
+                        help="""primeiro dia (dd/mm/aaaa).""")
+    parser.add_argument('-fim', type=str, default=None,
+                        help="""último dia (dd/mm/aaaa).""")
+    args = vars(parser.parse_args())
+    if args['deputados']:
+        with open(ARQ_DEPUTADOS, 'rb') as arq:
+            periodos = periodos_deputados(pkl.load(arq))
+        for deputado, periodo in periodos.sobrepostos(args['inicio'],
+                                                      args['fim']):
+            print('{} - {} a {}'.format(deputado.nome, periodo.data_inicio,
+                                        periodo.data_fim or '...'))
+    for tp in args['tipos']:
+        for ano in args['anos']:
+            arquivo = arquivo_proposicoes(tp, ano, args['apensadas'])
+            if not os.path.isfile(arquivo):
+                print('\tarquivo {} não encontrado.'.format(arquivo))
+                continue
+            props = carrega_proposicoes(arquivo)
+            for prop in datas_proposicoes(props).entre(args['inicio'],
+                                                       args['fim']):
+                print('{} - {} (id: {})'.format(prop.data_apresentacao,
+                                                prop.nome, prop.id_))
+
+if __name__ == '__main__':
+    main()
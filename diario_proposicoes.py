@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Diário (journal) das proposições já baixadas de um (sigla, ano).
+
+Cada proposição terminada é acrescentada ao fim do arquivo do diário, junto
+com as suas apensadas, como um registro pickle. Se o download for
+interrompido, a próxima execução lê o diário e não baixa de novo as
+proposições que já estão nele. No fim, o diário é compactado no arquivo pickle
+final e apagado.
+
+Com a saída NDJSON ligada (opção -ndjson, ver saida_ndjson.py), cada registro
+também é escrito no .ndjson do ano assim que entra no diário, e os registros
+não ficam na memória: só a posição de cada um no diário e os ids das suas
+apensadas. Eles são lidos do diário quando pedidos e, no fim, para gravar o
+arquivo final.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import os
+import pickle as pkl
+from perfilador import PERFIL
+from saida_ndjson import SAIDA
+
+
+class DiarioProposicoes:
+    """
+    Diário somente de acréscimo das proposições terminadas.
+    """
+
+
+    def __init__(self, arquivo, descartar=False):
+        """
+        Método construtor. Lê os registros que já estiverem no diário.
+        Args:
+            arquivo (str): caminho do arquivo pickle final. O diário fica ao
+                lado dele, com a extensão .diario.
+            descartar (boolean): ignora e apaga um diário existente.
+        """
+        self.arquivo = arquivo
+        self.caminho = os.path.splitext(arquivo)[0] + '.diario'
+        #id -> (prop, apens), ou (posição no diário, ids das apensadas) com
+        #a saída NDJSON ligada
+        self.registros = {}
+        self.leve = SAIDA.ativa
+        self._arq = None
+        if descartar and os.path.isfile(self.caminho):
+            os.remove(self.caminho)
+        self._ler()
+        self._ndjson = SAIDA.abrir(arquivo)
+        if self._ndjson is not None:
+            #o que veio de uma execução interrompida também vai para o ndjson
+            for prop, apens in self.itera():
+                self._escrever_ndjson(prop, apens)
+
+
+    def _ler(self):
+        """
+        Carrega os registros do diário. Um último registro incompleto (o
+        processo morreu no meio da escrita) é descartado.
+        """
+        if not os.path.isfile(self.caminho):
+            return
+        valido = 0
+        with open(self.caminho, 'rb') as arq:
+            while True:
+                try:
+                    id_, prop, apens = pkl.load(arq)
+                except Exception:
+                    break
+                self._guardar(prop, apens, valido)
+                valido = arq.tell()
+        if valido < os.path.getsize(self.caminho):
+            with open(self.caminho, 'r+b') as arq:
+                arq.truncate(valido)
+
+
+    def __contains__(self, id_):
+        return id_ in self.registros
+
+
+    def __len__(self):
+        return len(self.registros)
+
+
+    def _guardar(self, prop, apens, posicao):
+        """
+        Guarda o registro de prop, que está em posicao no diário.
+        """
+        if self.leve:
+            self.registros[prop.id_] = (posicao,
+                                        tuple(apen.id_ for apen in apens))
+        else:
+            self.registros[prop.id_] = (prop, apens)
+
+
+    def _carregar(self, posicao):
+        """
+        Lê do diário o registro em posicao.
+        Return:
+            (prop, apens)
+        """
+        with open(self.caminho, 'rb') as arq:
+            arq.seek(posicao)
+            _, prop, apens = pkl.load(arq)
+        return prop, apens
+
+
+    def obter(self, id_):
+        """
+        Retorna o registro de uma proposição.
+        Args:
+            id_ (str)
+        Return:
+            (prop, apens): a proposição e a lista das suas apensadas.
+        """
+        if self.leve:
+            return self._carregar(self.registros[id_][0])
+        return self.registros[id_]
+
+
+    def itera(self):
+        """
+        Percorre os registros do diário.
+        Return:
+            iterador de (prop, apens).
+        """
+        if not self.leve:
+            yield from self.registros.values()
+            return
+        if not os.path.isfile(self.caminho):
+            return
+        with open(self.caminho, 'rb') as arq:
+            while True:
+                posicao = arq.tell()
+                try:
+                    id_, prop, apens = pkl.load(arq)
+                except EOFError:
+                    break
+                #um id registrado duas vezes vale pelo último registro
+                if self.registros.get(id_, (None,))[0] == posicao:
+                    yield prop, apens
+
+
+    def registrar(self, prop, apens):
+        """
+        Acrescenta uma proposição terminada ao diário.
+        Args:
+            prop (Proposicao)
+            apens (list): apensadas de prop baixadas junto com ela.
+        """
+        if self._arq is None:
+            self._arq = open(self.caminho, 'ab')
+        posicao = self._arq.tell()
+        with PERFIL.etapa('pickle'):
+            pkl.dump((prop.id_, prop, apens), self._arq)
+        self._arq.flush()
+        self._guardar(prop, apens, posicao)
+        self._escrever_ndjson(prop, apens)
+
+
+    def manter(self, prop, apens):
+        """
+        Inclui no arquivo final uma proposição que não mudou desde o último
+        download, sem gravá-la no diário. Com a saída NDJSON ligada ela é
+        gravada, já que o arquivo final é montado a partir do diário.
+        Args:
+            prop (Proposicao)
+            apens (list)
+        """
+        if self.leve:
+            self.registrar(prop, apens)
+            return
+        self.registros[prop.id_] = (prop, apens)
+        self._escrever_ndjson(prop, apens)
+
+
+    def _escrever_ndjson(self, prop, apens):
+        if self._ndjson is not None:
+            for baixada in [prop] + apens:
+                self._ndjson.escrever(baixada)
+
+
+    def compactar(self, ids, numeros):
+        """
+        Grava o arquivo pickle final, na ordem da listagem, e apaga o diário.
+        Cada id é gravado uma vez só: uma proposição da listagem que já veio
+        como apensada de outra fica onde apareceu primeiro.
+        Args:
+            ids (list): ids das proposições na ordem da listagem.
+            numeros (list): números das proposições na ordem da listagem.
+        Return:
+            props (list): proposições gravadas, com as apensadas logo após a
+                proposição que as cita.
+        """
+        if self._arq is not None:
+            self._arq.flush()
+        #com a saída NDJSON ligada, os registros só são carregados agora
+        registros = {prop.id_: (prop, apens) for prop, apens in self.itera()}
+        props = []
+        vistos = set()
+        como_apensada = set(apen.id_ for _, apens in registros.values()
+                            for apen in apens)
+        for id_ in ids:
+            if id_ in vistos or (id_ not in registros and
+                                 id_ in como_apensada):
+                continue
+            prop, apens = registros[id_]
+            for baixada in [prop] + apens:
+                if baixada.id_ not in vistos:
+                    vistos.add(baixada.id_)
+                    props.append(baixada)
+        with PERFIL.etapa('pickle'), open(self.arquivo, 'wb') as arq:
+            pkl.dump((props, numeros), arq)
+        self.fechar()
+        if os.path.isfile(self.caminho):
+            os.remove(self.caminho)
+        return props
+
+
+    def fechar(self):
+        """
+        Fecha o arquivo do diário e o ndjson.
+        """
+        if self._arq is not None:
+            self._arq.close()
+            self._arq = None
+        if self._ndjson is not None:
+            self._ndjson.fechar()
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Índice de todas as proposições já baixadas, em todos os arquivos de
+down_files.
+
+Cada proposição é indexada por (sigla, numero, ano) e pelo seu id. O índice é
+salvo em down_files/indice_proposicoes.pkl e, quando carregado, só relê os
+arquivos de proposições que apareceram ou mudaram desde a última vez.
+
+É usado para não baixar de novo uma apensada que já está em qualquer arquivo.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import glob
+import os
+import pickle as pkl
+import tempfile
+import threading
+from perfilador import PERFIL
+
+
+def chave_proposicao(prop):
+    """
+    Chave (sigla, numero, ano) de uma proposição.
+    Args:
+        prop (Proposicao)
+    """
+    if prop.tipo_proposicao is not None:
+        sigla = prop.tipo_proposicao.sigla
+    else:
+        sigla = prop.nome.split()[0]
+    return normaliza_chave(sigla, prop.numero, prop.ano)
+
+
+def normaliza_chave(sigla, numero, ano):
+    """
+    Normaliza os campos da chave, que podem vir como int ou str.
+    Args:
+        sigla (str)
+        numero (str)
+        ano (str)
+    """
+    return (str(sigla).strip().upper(), str(numero).strip(),
+            str(ano).strip())
+
+
+def carrega_proposicoes(arquivo, com_numeros=False):
+    """
+    Lê a lista de proposições de um arquivo prop_props_*.pkl.
+    Args:
+        arquivo (str)
+        com_numeros (boolean): retorna também os números da listagem.
+    Return:
+        props (list): ou (props, numeros) com com_numeros; numeros é None
+            nos arquivos antigos.
+    """
+    with open(arquivo, 'rb') as arq:
+        dados = pkl.load(arq)
+    #o formato é (props, numeros), mas arquivos antigos têm só a lista
+    props, numeros = dados if isinstance(dados, tuple) else (dados, None)
+    if com_numeros:
+        return props, numeros
+    return props
+
+
+class IndiceProposicoes:
+    """
+    Índice persistente das proposições baixadas. Pode ser usado por várias
+    threads.
+    """
+
+
+    def __init__(self, caminho='down_files/indice_proposicoes.pkl',
+                 padrao='down_files/prop_props_*.pkl'):
+        """
+        Método construtor. Carrega o índice salvo e indexa os arquivos novos
+        ou modificados.
+        Args:
+            caminho (str): arquivo onde o índice é salvo.
+            padrao (str): padrão (glob) dos arquivos de proposições.
+        """
+        self.caminho = caminho
+        self.padrao = padrao
+        self._trava = threading.Lock()
+        self.por_chave = {}
+        self.por_id = {}
+        #arquivo -> (mtime, [(chave, id_), ...])
+        self._arquivos = {}
+        if os.path.isfile(caminho):
+            with open(caminho, 'rb') as arq:
+                self.por_chave, self.por_id, self._arquivos = pkl.load(arq)
+        self.atualizar()
+
+
+    def atualizar(self):
+        """
+        Indexa os arquivos de proposições novos ou modificados, e esquece os
+        que foram apagados.
+        """
+        encontrados = set(glob.glob(self.padrao))
+        for arquivo in list(self._arquivos):
+            if arquivo not in encontrados:
+                self.remover_arquivo(arquivo)
+        for arquivo in sorted(encontrados):
+            mtime = os.path.getmtime(arquivo)
+            if arquivo in self._arquivos and \
+                    self._arquivos[arquivo][0] == mtime:
+                continue
+            self.remover_arquivo(arquivo)
+            try:
+                props = carrega_proposicoes(arquivo)
+            except Exception:
+                continue
+            for prop in props:
+                self.adicionar(prop, arquivo)
+            with self._trava:
+                self._arquivos[arquivo] = (mtime,
+                                           self._arquivos[arquivo][1]
+                                           if arquivo in self._arquivos
+                                           else [])
+
+
+    def adicionar(self, prop, arquivo):
+        """
+        Indexa uma proposição como pertencente a arquivo.
+        Args:
+            prop (Proposicao)
+            arquivo (str)
+        """
+        chave = chave_proposicao(prop)
+        id_ = str(prop.id_)
+        with self._trava:
+            self.por_chave[chave] = arquivo
+            self.por_id[id_] = arquivo
+            _, entradas = self._arquivos.setdefault(arquivo, (None, []))
+            entradas.append((chave, id_))
+
+
+    def remover_arquivo(self, arquivo):
+        """
+        Esquece todas as proposições de arquivo. Usado quando o arquivo vai
+        ser gerado de novo.
+        Args:
+            arquivo (str)
+        """
+        with self._trava:
+            _, entradas = self._arquivos.pop(arquivo, (None, []))
+            for chave, id_ in entradas:
+                if self.por_chave.get(chave) == arquivo:
+                    del self.por_chave[chave]
+                if self.por_id.get(id_) == arquivo:
+                    del self.por_id[id_]
+
+
+    def contem(self, sigla, numero, ano):
+        """
+        Indica se a proposição (sigla, numero, ano) já foi baixada.
+        Args:
+            sigla (str)
+            numero (str)
+            ano (str)
+        """
+        return normaliza_chave(sigla, numero, ano) in self.por_chave
+
+
+    def contem_id(self, id_):
+        """
+        Indica se a proposição com esse id já foi baixada.
+        Args:
+            id_ (str)
+        """
+        return str(id_) in self.por_id
+
+
+    def arquivo_de(self, id_):
+        """
+        Retorna o arquivo onde está a proposição com esse id, ou None.
+        Args:
+            id_ (str)
+        """
+        return self.por_id.get(str(id_))
+
+
+    def salvar(self, arquivo=None):
+        """
+        Salva o índice. Se arquivo for informado, registra o mtime atual dele,
+        para que não seja relido no próximo carregamento.
+        Args:
+            arquivo (str): arquivo de proposições que acabou de ser gravado.
+        """
+        with self._trava:
+            if arquivo is not None and os.path.isfile(arquivo):
+                _, entradas = self._arquivos.get(arquivo, (None, []))
+                self._arquivos[arquivo] = (os.path.getmtime(arquivo),
+                                           entradas)
+            pasta = os.path.dirname(self.caminho) or '.'
+            with PERFIL.etapa('pickle'), \
+                    tempfile.NamedTemporaryFile(dir=pasta, delete=False) as tmp:
+                pkl.dump((self.por_chave, self.por_id, self._arquivos), tmp)
+            os.replace(tmp.name, self.caminho)
@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Controle de taxa das requisições aos Web Services da Câmara.
+
+Os servidores da Câmara limitam e deixam de responder quando recebem muitas
+requisições. O LimitadorAdaptativo é um balde de fichas (token bucket) cuja
+taxa se ajusta sozinha: cresce aos poucos enquanto as respostas chegam rápido,
+e cai pela metade quando há erros, ou um pouco quando a latência sobe. Assim
+os scripts rodam na maior taxa que o servidor aguenta.
+
+A função espera_exponencial dá o tempo de espera entre as tentativas de uma
+requisição que falhou (backoff exponencial com jitter).
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import random
+import threading
+import time
+
+
+def espera_exponencial(tentativa, base=0.5, maximo=30.0):
+    """
+    Tempo de espera antes de repetir uma requisição, com jitter total: um
+    valor aleatório entre 0 e base * 2 ** tentativa, limitado a maximo.
+    Args:
+        tentativa (int): número da tentativa que falhou, começando em 0.
+        base (float): espera base em segundos.
+        maximo (float): espera máxima em segundos.
+    """
+    return random.uniform(0, min(maximo, base * 2 ** tentativa))
+
+
+class LimitadorAdaptativo:
+    """
+    Balde de fichas com taxa adaptativa. Pode ser usado por várias threads.
+    """
+
+
+    def __init__(self, taxa=10.0, taxa_min=0.5, taxa_max=100.0,
+                 latencia_alvo=None):
+        """
+        Método construtor.
+        Args:
+            taxa (float): taxa inicial, em requisições por segundo.
+            taxa_min (float): a taxa nunca fica abaixo desse valor.
+            taxa_max (float): a taxa nunca passa desse valor.
+            latencia_alvo (float): latência (s) acima da qual a taxa é
+                reduzida. Se None, usa o dobro da menor latência média já
+                observada.
+        """
+        self.taxa = taxa
+        self.taxa_min = taxa_min
+        self.taxa_max = taxa_max
+        self.latencia_alvo = latencia_alvo
+        self.latencia_media = None
+        self._latencia_base = None
+        self._fichas = 1.0
+        self._ultimo = time.monotonic()
+        self._ultima_reducao = 0.0
+        self._trava = threading.Lock()
+
+
+    def _repor(self):
+        """
+        Repõe as fichas acumuladas desde a última chamada. O balde comporta
+        um segundo de requisições.
+        """
+        agora = time.monotonic()
+        capacidade = max(1.0, self.taxa)
+        self._fichas = min(capacidade,
+                           self._fichas + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+
+    def aguardar(self):
+        """
+        Bloqueia até haver uma ficha disponível, e a consome.
+        """
+        while True:
+            with self._trava:
+                self._repor()
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+
+    def _reduzir(self, fator):
+        """
+        Multiplica a taxa por fator, no máximo uma vez por segundo, para que
+        uma rajada de erros não derrube a taxa de uma vez.
+        Args:
+            fator (float)
+        """
+        agora = time.monotonic()
+        if agora - self._ultima_reducao < 1.0:
+            return
+        self._ultima_reducao = agora
+        self.taxa = max(self.taxa_min, self.taxa * fator)
+
+
+    def registrar_sucesso(self, latencia):
+        """
+        Registra uma resposta bem sucedida e ajusta a taxa.
+        Args:
+            latencia (float): duração da requisição em segundos.
+        """
+        with self._trava:
+            if self.latencia_media is None:
+                self.latencia_media = latencia
+            else:
+                self.latencia_media = 0.8 * self.latencia_media + 0.2 * latencia
+            if self._latencia_base is None or \
+                    self.latencia_media < self._latencia_base:
+                self._latencia_base = self.latencia_media
+            alvo = self.latencia_alvo or 2 * self._latencia_base
+            if self.latencia_media > alvo:
+                self._reduzir(0.9)
+            else:
+                #aumento aditivo: cerca de +1 req/s a cada segundo
+                self.taxa = min(self.taxa_max,
+                                self.taxa + 1.0 / max(1.0, self.taxa))
+
+
+    def registrar_erro(self):
+        """
+        Registra um erro (5xx, 429 ou timeout) e reduz a taxa pela metade.
+        """
+        with self._trava:
+            self._reduzir(0.5)
@@ -0,0 +1,349 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Métricas das requisições, separadas por endpoint.
+
+Para cada endpoint (ObterDetalhesDeputado, ObterProposicaoPorID, ..., ou o
+host dos documentos de inteiro teor) são registrados: histograma de latência
+das requisições, bytes das respostas, histograma do tempo de interpretação do
+xml, respostas por status, tentativas repetidas, erros por tipo e acertos do
+cache.
+
+O cliente_http registra tudo em METRICAS. Com a opção -metricas, no fim da
+execução as métricas são gravadas num arquivo texto no formato do Prometheus
+(.prom, para o node_exporter) e num resumo em json.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import bisect
+import json
+import os
+import threading
+import urllib.parse
+
+
+#limites superiores (s) das faixas dos histogramas
+FAIXAS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+          5.0, 10.0, 30.0, 60.0)
+#interpretar o xml é bem mais rápido que a requisição
+FAIXAS_INTERPRETACAO = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                        0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+PREFIXO = 'baixa_camara'
+
+
+def nome_endpoint(url):
+    """
+    Nome do endpoint de url: o método do Web Service (último trecho do
+    caminho), ou o host para o que não é Web Service (documentos).
+    Args:
+        url (str)
+    """
+    partes = urllib.parse.urlsplit(url)
+    if '.asmx/' in partes.path:
+        return partes.path.rstrip('/').rsplit('/', 1)[-1]
+    return partes.netloc or 'desconhecido'
+
+
+class Histograma:
+    """
+    Histograma com faixas fixas, no estilo do Prometheus.
+    """
+
+
+    def __init__(self, faixas=FAIXAS):
+        """
+        Método construtor.
+        Args:
+            faixas (tuple): limites superiores das faixas, em ordem.
+        """
+        self.faixas = faixas
+        self.contagens = [0] * (len(faixas) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+
+    def registrar(self, valor):
+        """
+        Acrescenta uma observação.
+        Args:
+            valor (float)
+        """
+        self.contagens[bisect.bisect_left(self.faixas, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+    def acumulado(self):
+        """
+        Contagens acumuladas de cada faixa, como no formato do Prometheus.
+        Return:
+            lista de (limite, contagem). O último limite é '+Inf'.
+        """
+        total = 0
+        resultado = []
+        for limite, contagem in zip(list(self.faixas) + ['+Inf'],
+                                    self.contagens):
+            total += contagem
+            resultado.append((limite, total))
+        return resultado
+
+
+    def percentil(self, fracao):
+        """
+        Estima um percentil interpolando dentro da faixa em que ele cai.
+        Args:
+            fracao (float): ex.: 0.99.
+        """
+        if self.total == 0:
+            return None
+        alvo = fracao * self.total
+        anterior = 0
+        inferior = 0.0
+        for limite, acumulado in self.acumulado():
+            if acumulado >= alvo:
+                if limite == '+Inf':
+                    return inferior
+                dentro = acumulado - anterior
+                return inferior + (limite - inferior) * \
+                        (alvo - anterior) / dentro
+            anterior = acumulado
+            inferior = limite
+        return inferior
+
+
+    def resumo(self):
+        """
+        Resumo em dicionário, para o json.
+        """
+        return {'total': self.total,
+                'soma_s': self.soma,
+                'media_s': self.soma / self.total if self.total else None,
+                'p50_s': self.percentil(0.5),
+                'p90_s': self.percentil(0.9),
+                'p99_s': self.percentil(0.99)}
+
+
+class MetricasEndpoint:
+    """
+    Métricas de um endpoint.
+    """
+
+
+    def __init__(self):
+        self.latencia = Histograma()
+        self.interpretacao = Histograma(FAIXAS_INTERPRETACAO)
+        self.bytes = 0
+        self.status = {}
+        self.repeticoes = 0
+        self.erros = {}
+        self.acertos_cache = 0
+
+
+class Metricas:
+    """
+    Registro das métricas de todos os endpoints. Pode ser usado por várias
+    threads.
+    """
+
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.endpoints = {}
+
+
+    def _endpoint(self, endpoint):
+        """
+        Retorna as métricas de endpoint, criando se necessário. Deve ser
+        chamado com a trava.
+        """
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = MetricasEndpoint()
+        return self.endpoints[endpoint]
+
+
+    def registrar_requisicao(self, endpoint, latencia, status):
+        """
+        Registra uma requisição que recebeu resposta.
+        Args:
+            endpoint (str)
+            latencia (float): segundos até a resposta.
+            status (int): status HTTP.
+        """
+        with self._trava:
+            metricas = self._endpoint(endpoint)
+            metricas.latencia.registrar(latencia)
+            metricas.status[status] = metricas.status.get(status, 0) + 1
+
+
+    def registrar_bytes(self, endpoint, tamanho):
+        """
+        Soma bytes (descomprimidos) recebidos de endpoint.
+        Args:
+            endpoint (str)
+            tamanho (int)
+        """
+        with self._trava:
+            self._endpoint(endpoint).bytes += tamanho
+
+
+    def registrar_interpretacao(self, endpoint, duracao):
+        """
+        Registra o tempo de interpretação do xml de uma resposta.
+        Args:
+            endpoint (str)
+            duracao (float): segundos.
+        """
+        with self._trava:
+            self._endpoint(endpoint).interpretacao.registrar(duracao)
+
+
+    def registrar_repeticao(self, endpoint):
+        """
+        Registra que uma requisição de endpoint vai ser repetida.
+        Args:
+            endpoint (str)
+        """
+        with self._trava:
+            self._endpoint(endpoint).repeticoes += 1
+
+
+    def registrar_erro(self, endpoint, tipo):
+        """
+        Registra um erro numa requisição (timeout, conexão, 5xx, ...).
+        Args:
+            endpoint (str)
+            tipo (str): ex.: 'TimeoutError' ou 'HTTP 503'.
+        """
+        with self._trava:
+            erros = self._endpoint(endpoint).erros
+            erros[tipo] = erros.get(tipo, 0) + 1
+
+
+    def registrar_acerto_cache(self, endpoint):
+        """
+        Registra uma resposta que veio do cache.
+        Args:
+            endpoint (str)
+        """
+        with self._trava:
+            self._endpoint(endpoint).acertos_cache += 1
+
+
+    def resumo(self):
+        """
+        Resumo de todas as métricas em dicionário.
+        """
+        with self._trava:
+            return {endpoint: {
+                'latencia': metricas.latencia.resumo(),
+                'interpretacao': metricas.interpretacao.resumo(),
+                'bytes': metricas.bytes,
+                'status': {str(status): total for status, total
+                           in metricas.status.items()},
+                'repeticoes': metricas.repeticoes,
+                'erros': dict(metricas.erros),
+                'acertos_cache': metricas.acertos_cache}
+                    for endpoint, metricas in sorted(self.endpoints.items())}
+
+
+    def _linhas_histograma(self, nome, descricao, histogramas):
+        """
+        Linhas do formato texto do Prometheus para um histograma.
+        Args:
+            nome (str)
+            descricao (str)
+            histogramas (list): lista de (endpoint, Histograma).
+        """
+        linhas = ['# HELP {} {}'.format(nome, descricao),
+                  '# TYPE {} histogram'.format(nome)]
+        for endpoint, histograma in histogramas:
+            for limite, total in histograma.acumulado():
+                linhas.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(
+                    nome, endpoint, limite, total))
+            linhas.append('{}_sum{{endpoint="{}"}} {}'.format(
+                nome, endpoint, histograma.soma))
+            linhas.append('{}_count{{endpoint="{}"}} {}'.format(
+                nome, endpoint, histograma.total))
+        return linhas
+
+
+    def texto_prometheus(self):
+        """
+        Todas as métricas no formato texto do Prometheus.
+        """
+        with self._trava:
+            itens = sorted(self.endpoints.items())
+            linhas = self._linhas_histograma(
+                PREFIXO + '_requisicao_segundos',
+                'Latencia das requisicoes por endpoint.',
+                [(endpoint, m.latencia) for endpoint, m in itens])
+            linhas += self._linhas_histograma(
+                PREFIXO + '_interpretacao_segundos',
+                'Tempo de interpretacao do xml por endpoint.',
+                [(endpoint, m.interpretacao) for endpoint, m in itens])
+            contadores = [
+                ('resposta_bytes_total', 'Bytes recebidos por endpoint.',
+                 lambda m: [('', m.bytes)]),
+                ('respostas_total', 'Respostas por endpoint e status.',
+                 lambda m: [(',status="{}"'.format(status), total)
+                            for status, total in sorted(m.status.items())]),
+                ('repeticoes_total', 'Tentativas repetidas por endpoint.',
+                 lambda m: [('', m.repeticoes)]),
+                ('erros_total', 'Erros por endpoint e tipo.',
+                 lambda m: [(',tipo="{}"'.format(tipo), total)
+                            for tipo, total in sorted(m.erros.items())]),
+                ('cache_acertos_total', 'Respostas obtidas do cache.',
+                 lambda m: [('', m.acertos_cache)])]
+            for nome, descricao, valores in contadores:
+                nome = '{}_{}'.format(PREFIXO, nome)
+                linhas += ['# HELP {} {}'.format(nome, descricao),
+                           '# TYPE {} counter'.format(nome)]
+                for endpoint, metricas in itens:
+                    for rotulos, valor in valores(metricas):
+                        linhas.append('{}{{endpoint="{}"{}}} {}'.format(
+                            nome, endpoint, rotulos, valor))
+        return '\n'.join(linhas) + '\n'
+
+
+    def gravar(self, prefixo):
+        """
+        Grava prefixo.prom (formato do Prometheus) e prefixo.json (resumo).
+        Args:
+            prefixo (str): caminho dos arquivos sem a extensão.
+        """
+        pasta = os.path.dirname(prefixo)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        #o node_exporter pode ler o arquivo a qualquer momento: grava num
+        #temporário e renomeia
+        with open(prefixo + '.prom.tmp', 'w', encoding='utf-8') as arq:
+            arq.write(self.texto_prometheus())
+        os.replace(prefixo + '.prom.tmp', prefixo + '.prom')
+        with open(prefixo + '.json', 'w', encoding='utf-8') as arq:
+            json.dump(self.resumo(), arq, indent=2, sort_keys=True)
+
+
+#métricas do processo, preenchidas pelo cliente_http
+METRICAS = Metricas()
@@ -31,11 +31,15 @@ __status__ = "Development"
 
 
 import argparse
-import os.path
-import xml.etree.ElementTree as ET
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
 import urllib.parse
 import pickle as pkl
+import cliente_http
+import saida_ndjson
+from perfilador import PERFIL
+from classes_base import compartilhado
 from classes_deputados import Bloco
 from classes_deputados import Partido
 from classes_deputados import PartidoBloco
@@ -59,17 +63,17 @@ def obter_partidos():
     #1 - obter lista de partidos
     partido_url = ("http://www.camara.gov.br/SitCamaraWS/Deputados.asmx/"
                    "ObterPartidosCD")
-    if not os.path.isfile('down_files/partidos.pkl'):
+    if cliente_http.precisa_gerar('down_files/partidos.pkl'):
         partidos = []
-        with urllib.request.urlopen(partido_url) as res:
-            data = ET.fromstring(res.read())
-            for item in data:
-                partido = Partido(item.find('idPartido').text,
-                                  item.find('siglaPartido').text,
-                                  item.find('nomePartido').text,
-                                  item.find('dataCriacao').text,
-                                  item.find('dataExtincao').text)
-                partidos.append(partido)
+        data = cliente_http.obter_xml(partido_url)
+        for item in data:
+            partido = compartilhado(Partido,
+                                    item.find('idPartido').text,
+                                    item.find('siglaPartido').text,
+                                    item.find('nomePartido').text,
+                                    item.find('dataCriacao').text,
+                                    item.find('dataExtincao').text)
+            partidos.append(partido)
         with open('down_files/partidos.pkl', 'wb') as arq:
             pkl.dump(partidos, arq)
 
@@ -87,26 +91,25 @@ def obter_partidos_blocos(num_legislatura=55):
     params = urllib.parse.urlencode({
         'idBloco': '',
         'numLegislatura': num_legislatura})
-    if not os.path.isfile('down_files/blocosPartido.pkl'):
+    if cliente_http.precisa_gerar('down_files/blocosPartido.pkl'):
         blocos = []
-        with urllib.request.urlopen(partidos_bloco_url % params) as res:
-            data = ET.fromstring(res.read())
-            for item in data:
-                bloco = Bloco(
-                    item.find('idBloco').text,
-                    item.find('nomeBloco').text,
-                    item.find('siglaBloco').text,
-                    item.find('dataCriacaoBloco').text,
-                    item.find('dataExtincaoBloco').text)
-                for ptd in item.find('Partidos'):
-                    partido_bloco = PartidoBloco(
-                        ptd.find('idPartido').text,
-                        ptd.find('siglaPartido').text,
-                        ptd.find('nomePartido').text,
-                        ptd.find('dataAdesaoPartido').text,
-                        ptd.find('dataDesligamentoPartido').text)
-                    bloco.add_partido(partido_bloco)
-                blocos.append(bloco)
+        data = cliente_http.obter_xml(partidos_bloco_url % params)
+        for item in data:
+            bloco = Bloco(
+                item.find('idBloco').text,
+                item.find('nomeBloco').text,
+                item.find('siglaBloco').text,
+                item.find('dataCriacaoBloco').text,
+                item.find('dataExtincaoBloco').text)
+            for ptd in item.find('Partidos'):
+                partido_bloco = PartidoBloco(
+                    ptd.find('idPartido').text,
+                    ptd.find('siglaPartido').text,
+                    ptd.find('nomePartido').text,
+                    ptd.find('dataAdesaoPartido').text,
+                    ptd.find('dataDesligamentoPartido').text)
+                bloco.add_partido(partido_bloco)
+            blocos.append(bloco)
         with open('down_files/blocos.pkl', 'wb') as arq:
             pkl.dump(blocos, arq)
 
@@ -119,54 +122,60 @@ def obter_bancadas():
     """
     bancadas_url = ("http://www.camara.gov.br/SitCamaraWS/Deputados.asmx/"
                     "ObterLideresBancadas")
-    if not os.path.isfile('down_files/bancadas.pkl'):
+    if cliente_http.precisa_gerar('down_files/bancadas.pkl'):
         bancadas = []
-        with urllib.request.urlopen(bancadas_url) as res:
-            data = ET.fromstring(res.read())
-            for item in data:
-                bancada = Bancada(item.get('sigla'), item.get('nome'))
-                for child in item:
-                    if child.tag == 'lider':
-                        ldr = item.find('lider')
-                        lider = DeputadoLideranca(ldr.find('nome').text,
-                                                  ldr.find('ideCadastro').text,
-                                                  ldr.find('partido').text,
-                                                  ldr.find('uf').text)
-                        bancada.set_lider(lider)
-                    elif child.tag == 'vice_lider':
-                        vice_lider = DeputadoLideranca(
-                            child.find('nome').text,
-                            child.find('ideCadastro').text,
-                            child.find('partido').text,
-                            child.find('uf').text)
-                        bancada.add_vice_lider(vice_lider)
-                    elif child.tag == 'representante':
-                        repres = DeputadoLideranca(
-                            child.find('nome').text,
-                            child.find('ideCadastro').text,
-                            child.find('partido').text,
-                            child.find('uf').text)
-                        bancada.add_representante(repres)
-                    else:
-                        print('erro de tag', child.tag, bancada.nome)
-                        input()
-                bancadas.append(bancada)
+        data = cliente_http.obter_xml(bancadas_url)
+        for item in data:
+            bancada = Bancada(item.get('sigla'), item.get('nome'))
+            for child in item:
+                if child.tag == 'lider':
+                    ldr = item.find('lider')
+                    lider = DeputadoLideranca(ldr.find('nome').text,
+                                              ldr.find('ideCadastro').text,
+                                              ldr.find('partido').text,
+                                              ldr.find('uf').text)
+                    bancada.set_lider(lider)
+                elif child.tag == 'vice_lider':
+                    vice_lider = DeputadoLideranca(
+                        child.find('nome').text,
+                        child.find('ideCadastro').text,
+                        child.find('partido').text,
+                        child.find('uf').text)
+                    bancada.add_vice_lider(vice_lider)
+                elif child.tag == 'representante':
+                    repres = DeputadoLideranca(
+                        child.find('nome').text,
+                        child.find('ideCadastro').text,
+                        child.find('partido').text,
+                        child.find('uf').text)
+                    bancada.add_representante(repres)
+                else:
+                    print('erro de tag', child.tag, bancada.nome)
+                    input()
+            bancadas.append(bancada)
         with open('down_files/bancadas.pkl', 'wb') as arq:
             pkl.dump(bancadas, arq)
 
-def obter_deputados(num_legislatura=55):
+def obter_deputados(num_legislatura=55, trabalhadores=1):
     """
     Obtém a lista de deputados com os detalhes a partir do webservice da camara.
     O resultado é salvo no arquivo deputados.pkl
+    Com a saída NDJSON ligada, cada deputado também é escrito em
+    deputados.ndjson assim que os seus detalhes chegam.
+    Os detalhes de cada deputado são obtidos em paralelo por até trabalhadores
+    requisições simultâneas. A ordem dos deputados é a mesma da execução
+    sequencial.
     Args:
         num_legislatura (int)
+        trabalhadores (int): número máximo de requisições de detalhes
+            simultâneas. Padrão 1 (sequencial).
     """
     deputado_url = ("http://www.camara.gov.br/SitCamaraWS/Deputados.asmx/"
                     "ObterDeputados")
     deputados = []
-    if not os.path.isfile('down_files/deputados.pkl'):
-        with urllib.request.urlopen(deputado_url) as res:
-            data = ET.fromstring(res.read())
+    if cliente_http.precisa_gerar('down_files/deputados.pkl'):
+        data = cliente_http.obter_xml(deputado_url)
+        with PERFIL.etapa('objetos'):
             for item in data:
                 deputado = Deputado(
                     item.find('ideCadastro').text,
@@ -181,12 +190,38 @@ def obter_deputados(num_legislatura=55):
                     item.find('anexo').text,
                     item.find('fone').text,
                     item.find('email').text)
-                ## comissoes está sempre vazio, portanto não será usado aqui.
-                detalhes = obter_detalhes_deputado(deputado, num_legislatura)
-                deputado.set_detalhes_deputado(detalhes)
                 deputados.append(deputado)
+        ## comissoes está sempre vazio, portanto não será usado aqui.
+        ndjson = saida_ndjson.SAIDA.abrir('down_files/deputados.pkl')
+        #com o ndjson, os detalhes não ficam na memória: cada deputado
+        #completo vai para um arquivo temporário, lido de volta no fim
+        temporario = None
+        if ndjson is not None:
+            temporario = open('down_files/deputados.registros', 'w+b')
+        #executor.map devolve os resultados na ordem dos deputados
+        with ThreadPoolExecutor(max_workers=max(1, trabalhadores)) as executor:
+            todos_detalhes = executor.map(
+                partial(obter_detalhes_deputado,
+                        num_legislatura=num_legislatura),
+                deputados)
+            for i, detalhes in enumerate(todos_detalhes):
+                deputado = deputados[i]
+                deputado.set_detalhes_deputado(detalhes)
+                if ndjson is not None:
+                    ndjson.escrever(deputado)
+                    with PERFIL.etapa('pickle'):
+                        pkl.dump(deputado, temporario)
+                    deputados[i] = None
                 print('Deputado {} adicionado!'.format(deputado.nome))
-        with open('down_files/deputados.pkl', 'wb') as arq:
+        if ndjson is not None:
+            ndjson.fechar()
+            temporario.seek(0)
+            with PERFIL.etapa('pickle'):
+                deputados = [pkl.load(temporario) for _ in deputados]
+            temporario.close()
+            os.remove('down_files/deputados.registros')
+        with PERFIL.etapa('pickle'), \
+                open('down_files/deputados.pkl', 'wb') as arq:
             pkl.dump(deputados, arq)
 
 def obter_detalhes_deputado(deputado, num_legislatura):
@@ -206,105 +241,116 @@ def obter_detalhes_deputado(deputado, num_legislatura):
     params = urllib.parse.urlencode({
         'ideCadastro': deputado.ide_cadastro,
         'numLegislatura': num_legislatura})
-    with urllib.request.urlopen(detalhes_url % params) as res:
-        data = ET.fromstring(res.read())
-        dep = data.find('Deputado')
-        detalhes = DetalhesDeputado(
-            dep.find('ideCadastro').text,
-            dep.find('email').text,
-            dep.find('nomeProfissao').text,
-            dep.find('dataNascimento').text,
-            dep.find('dataFalecimento').text,
-            dep.find('ufRepresentacaoAtual').text,
-            dep.find('situacaoNaLegislaturaAtual').text,
-            dep.find('nomeParlamentarAtual').text,
-            dep.find('nomeCivil').text,
-            dep.find('sexo').text)
-        #montando o partidoAtual
-        pta = dep.find('partidoAtual')
-        partido_atual = Partido(
-            pta.find('idPartido').text,
-            pta.find('sigla').text,
-            pta.find('nome').text)
-        detalhes.set_partido_atual(partido_atual)
-        #montando os gabinetes
-        for gbn in dep.findall('gabinete'):
-            gabinete = Gabinete(
-                gbn.find('numero').text,
-                gbn.find('anexo').text,
-                gbn.find('telefone').text)
-            detalhes.add_gabinete(gabinete)
-        #montando as comissoes que o deputado participa
-        for comissao in dep.find('comissoes'):
-            com = Comissao(
-                comissao.find('idOrgaoLegislativoCD').text,
-                comissao.find('siglaComissao').text,
-                comissao.find('nomeComissao').text,
-                comissao.find('condicaoMembro').text,
-                comissao.find('dataEntrada').text,
-                comissao.find('dataSaida').text)
-            detalhes.add_comissao(com)
-        #montando cargoComissoes
-        cargos_comissoes = dep.find('cargosComissoes')
-        for cargo in cargos_comissoes:
-            cg_com = CargoComissoes(
-                cargo.find('idOrgaoLegislativoCD').text,
-                cargo.find('siglaComissao').text,
-                cargo.find('nomeComissao').text,
-                cargo.find('idCargo').text,
-                cargo.find('nomeCargo').text,
-                cargo.find('dataEntrada').text,
-                cargo.find('dataSaida').text)
-            detalhes.add_cargo_comissoes(cg_com)
-        #montando periodosExercicio
-        periodos_exercicio = dep.find('periodosExercicio')
-        for periodo in periodos_exercicio:
-            per = PeriodoExercicio(
-                periodo.find('siglaUFRepresentacao').text,
-                periodo.find('situacaoExercicio').text,
-                periodo.find('dataInicio').text,
-                periodo.find('dataFim').text,
-                periodo.find('idCausaFimExercicio').text,
-                periodo.find('descricaoCausaFimExercicio').text,
-                periodo.find('idCadastroParlamentarAnterior').text)
-            detalhes.add_periodo_exercicio(per)
-        #montando historicoNomeParlamentar
-        historico_nome = dep.find('historicoNomeParlamentar')
-        for nome in historico_nome:
-            print('Temos um historico nome parlamentar para o deputado {}'\
-                    .format(deputado.ide_cadastro))
-            hnome = HistoricoNome(
-                nome.find('nomeParlamentarAnterior').text,
-                nome.find('nomeParlamentaPosterior').text,
-                nome.find('dataInicioVigenciaNomePosterior').text)
-            detalhes.add_historico_nome_parlamentar(hnome)
-        #montando filiacoesPartidarias
-        filiacoes = dep.find('filiacoesPartidarias')
-        for filiacao in filiacoes:
-            fil = FiliacaoPartidaria(
-                filiacao.find('idPartidoAnterior').text,
-                filiacao.find('siglaPartidoAnterior').text,
-                filiacao.find('nomePartidoAnterior').text,
-                filiacao.find('idPartidoPosterior').text,
-                filiacao.find('siglaPartidoPosterior').text,
-                filiacao.find('nomePartidoPosterior').text,
-                filiacao.find('dataFiliacaoPartidoPosterior').text)
-            detalhes.add_filiacoes_partidarias(fil)
-        #montando historicoLideranca
-        historico_lider = dep.find('historicoLider')
-        for lider in historico_lider:
-            lid = HistoricoLider(
-                lider.find('idHistoricoLider').text,
-                lider.find('idCargoLideranca').text,
-                lider.find('descricaoCargoLideranca').text,
-                lider.find('numOrdemCargo').text,
-                lider.find('dataDesignacao').text,
-                lider.find('dataTermino').text,
-                lider.find('codigoUnidadeLideranca').text,
-                lider.find('siglaUnidadeLideranca').text,
-                lider.find('idBlocoPartido').text)
-            detalhes.add_historico_lider(lid)
-        return detalhes
+    data = cliente_http.obter_xml(detalhes_url % params)
+    with PERFIL.etapa('objetos'):
+        return monta_detalhes_deputado(deputado, data.find('Deputado'))
+
+def monta_detalhes_deputado(deputado, dep):
+    """
+    Monta os detalhes de um deputado a partir do xml do ObterDetalhesDeputado.
+    Args:
+        deputado (Deputado): deputado dono dos detalhes.
+        dep (ElementTree): elemento Deputado do xml da camara.
+    Return:
+        detalhes (DetalhesDeputado)
+    """
+    detalhes = DetalhesDeputado(
+        dep.find('ideCadastro').text,
+        dep.find('email').text,
+        dep.find('nomeProfissao').text,
+        dep.find('dataNascimento').text,
+        dep.find('dataFalecimento').text,
+        dep.find('ufRepresentacaoAtual').text,
+        dep.find('situacaoNaLegislaturaAtual').text,
+        dep.find('nomeParlamentarAtual').text,
+        dep.find('nomeCivil').text,
+        dep.find('sexo').text)
+    #montando o partidoAtual
+    pta = dep.find('partidoAtual')
+    partido_atual = compartilhado(
+        Partido,
+        pta.find('idPartido').text,
+        pta.find('sigla').text,
+        pta.find('nome').text)
+    detalhes.set_partido_atual(partido_atual)
+    #montando os gabinetes
+    for gbn in dep.findall('gabinete'):
+        gabinete = Gabinete(
+            gbn.find('numero').text,
+            gbn.find('anexo').text,
+            gbn.find('telefone').text)
+        detalhes.add_gabinete(gabinete)
+    #montando as comissoes que o deputado participa
+    for comissao in dep.find('comissoes'):
+        com = Comissao(
+            comissao.find('idOrgaoLegislativoCD').text,
+            comissao.find('siglaComissao').text,
+            comissao.find('nomeComissao').text,
+            comissao.find('condicaoMembro').text,
+            comissao.find('dataEntrada').text,
+            comissao.find('dataSaida').text)
+        detalhes.add_comissao(com)
+    #montando cargoComissoes
+    cargos_comissoes = dep.find('cargosComissoes')
+    for cargo in cargos_comissoes:
+        cg_com = CargoComissoes(
+            cargo.find('idOrgaoLegislativoCD').text,
+            cargo.find('siglaComissao').text,
+            cargo.find('nomeComissao').text,
+            cargo.find('idCargo').text,
+            cargo.find('nomeCargo').text,
+            cargo.find('dataEntrada').text,
+            cargo.find('dataSaida').text)
+        detalhes.add_cargo_comissoes(cg_com)
+    #montando periodosExercicio
+    periodos_exercicio = dep.find('periodosExercicio')
+    for periodo in periodos_exercicio:
+        per = PeriodoExercicio(
+            periodo.find('siglaUFRepresentacao').text,
+            periodo.find('situacaoExercicio').text,
+            periodo.find('dataInicio').text,
+            periodo.find('dataFim').text,
+            periodo.find('idCausaFimExercicio').text,
+            periodo.find('descricaoCausaFimExercicio').text,
+            periodo.find('idCadastroParlamentarAnterior').text)
+        detalhes.add_periodo_exercicio(per)
+    #montando historicoNomeParlamentar
+    historico_nome = dep.find('historicoNomeParlamentar')
+    for nome in historico_nome:
+        print('Temos um historico nome parlamentar para o deputado {}'\
+                .format(deputado.ide_cadastro))
+        hnome = HistoricoNome(
+            nome.find('nomeParlamentarAnterior').text,
+            nome.find('nomeParlamentaPosterior').text,
+            nome.find('dataInicioVigenciaNomePosterior').text)
+        detalhes.add_historico_nome_parlamentar(hnome)
+    #montando filiacoesPartidarias
+    filiacoes = dep.find('filiacoesPartidarias')
+    for filiacao in filiacoes:
+        fil = FiliacaoPartidaria(
+            filiacao.find('idPartidoAnterior').text,
+            filiacao.find('siglaPartidoAnterior').text,
+            filiacao.find('nomePartidoAnterior').text,
+            filiacao.find('idPartidoPosterior').text,
+            filiacao.find('siglaPartidoPosterior').text,
+            filiacao.find('nomePartidoPosterior').text,
+            filiacao.find('dataFiliacaoPartidoPosterior').text)
+        detalhes.add_filiacoes_partidarias(fil)
+    #montando historicoLideranca
+    historico_lider = dep.find('historicoLider')
+    for lider in historico_lider:
+        lid = HistoricoLider(
+            lider.find('idHistoricoLider').text,
+            lider.find('idCargoLideranca').text,
+            lider.find('descricaoCargoLideranca').text,
+            lider.find('numOrdemCargo').text,
+            lider.find('dataDesignacao').text,
+            lider.find('dataTermino').text,
+            lider.find('codigoUnidadeLideranca').text,
+            lider.find('siglaUnidadeLideranca').text,
+            lider.find('idBlocoPartido').text)
+        detalhes.add_historico_lider(lid)
+    return detalhes
 
 def main():
     #tratando os argumentos da linha de comando
@@ -325,7 +371,14 @@ def main():
     parser.add_argument('-n', type=int, nargs='*',
                         help=""" indica a legislatura que os dados de deputados
                              devem ser baixados.""")
+    parser.add_argument('-trabalhadores', type=int, default=1,
+                        help="""número de detalhes de deputados baixados
+                             simultaneamente. Padrão 1.""")
+    cliente_http.adicionar_argumentos(parser)
+    saida_ndjson.adicionar_argumentos(parser)
     args = vars(parser.parse_args())
+    cliente_http.aplicar_argumentos(args)
+    saida_ndjson.aplicar_argumentos(args)
     licensa = ("baixa_camara  Copyright (C) 2016  Saullo Oliveira\n"
                "This program comes with ABSOLUTELY NO WARRANTY;\n"
                "This is free software, and you are welcome to redistribute it\n"
@@ -348,7 +401,7 @@ def main():
             if not args['n']:
                 print('Legislatura não informada. Use o parametro -n.')
             print('obtendo deputados')
-            obter_deputados(args['n'])
+            obter_deputados(args['n'], args['trabalhadores'])
 
 if __name__ == '__main__':
     main()
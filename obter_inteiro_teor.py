@@ -17,6 +17,10 @@
 """
 Percorre as proposições já armazenadas, obter o inteiro teor de cada uma e
 processa o texto.
+
+O download dos arquivos e a extração do texto são etapas separadas. Com a
+opção -processos, a extração roda num pool de processos, alimentado pelos
+downloads feitos em threads.
 """
 __author__ = "Saullo Oliveira"
 __copyright__ = "Copyright 2016"
@@ -28,85 +32,291 @@ __email__ = "shgo@dca.fee.unicamp.br"
 __status__ = "Development"
 
 from io import StringIO
-import os.path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import wait, FIRST_COMPLETED
+import os
+import shutil
 import argparse
 import pickle as pkl
-import urllib.request
-import urllib.parse
 import logging
 import re
+import zipfile
 import magic
 from pdfminer.pdfparser import PDFParser, PDFDocument
 from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
 from pdfminer.converter import TextConverter
 from pdfminer.layout import LAParams
 from docx import Document
+import cliente_http
+from obter_proposicoes import arquivo_proposicoes
+from perfilador import PERFIL
+from perfilador import desligar_cprofile
+from perfilador import executar_medindo
+from tokens_inteiro_teor import EscritorTokens
+from tokens_inteiro_teor import TokensDocumento
+from tokens_inteiro_teor import Vocabulario
+from tokens_inteiro_teor import arquivo_tokens
+from tokens_inteiro_teor import tokenizar
+
 
+#caso não tenha link do inteiro teor
+REGEX_LINK = re.compile(
+    r'^(?:http|ftp)s?://' # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|' #domain...
+    r'localhost|' #localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})' # ...or ip
+    r'(?::\d+)?' # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
 
-def get_inteiro_teor(prop):
+
+def get_inteiro_teor(prop, escritor=None):
     """
     Obtém o conteúdo do inteiro teor de prop, e já tokeniza.
     Args:
         prop (Proposicao)
+        escritor (EscritorTokens): se informado, os tokens são gravados nele
+            (ver guardar_tokens).
+    """
+    try:
+        arquivo = baixar_inteiro_teor(prop)
+    except Exception as erro:
+        #como no pool de downloads: a falha fica no log e o ano continua
+        logging.warning('ERRO - %s falha ao baixar: %s\n', prop.id_, erro)
+        return prop
+    if arquivo is None:
+        return prop
+    try:
+        guardar_tokens(prop, extrair_tokens(arquivo), escritor)
+    except:
+        registrar_corrupto(prop, arquivo)
+    os.remove(arquivo)
+    return prop
+
+def guardar_tokens(prop, tokens, escritor=None):
+    """
+    Guarda os tokens do inteiro teor de prop. Sem escritor, eles ficam em
+    prop.inteiro_teor, como lista de str. Com escritor, vão para o vetor de
+    tokens do arquivo, com as contagens dos termos (ver
+    tokens_inteiro_teor.py), e prop.inteiro_teor fica None, só para indicar
+    que o inteiro teor já foi coletado.
+    Args:
+        prop (Proposicao)
+        tokens (TokensDocumento ou list)
+        escritor (EscritorTokens)
+    """
+    if escritor is None:
+        if isinstance(tokens, TokensDocumento):
+            tokens = tokens.tokens()
+        prop.inteiro_teor = tokens
+    else:
+        escritor.adicionar(prop.id_, tokens)
+        prop.inteiro_teor = None
+
+def baixar_inteiro_teor(prop):
+    """
+    Baixa o arquivo com o inteiro teor de prop para um arquivo temporário.
+    Args:
+        prop (Proposicao)
+    Return:
+        arquivo (str): caminho do arquivo baixado, ou None se o inteiro teor
+            já foi coletado ou se a proposição não tem link.
     """
     print('{}\tObtendo inteiro teor da proposição {}'.format(
         prop.ano, prop.id_))
     print(prop.link_inteiro_teor)
     #se o inteiro teor já foi coletado, não faz nada
     if hasattr(prop, 'inteiro_teor'):
-        return prop
-
-    #caso não tenha link do inteiro teor
-    regex = re.compile(
-        r'^(?:http|ftp)s?://' # http:// or https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|' #domain...
-        r'localhost|' #localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})' # ...or ip
-        r'(?::\d+)?' # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+        return None
 
-    if not regex.match(prop.link_inteiro_teor):
+    if not prop.link_inteiro_teor or \
+            not REGEX_LINK.match(prop.link_inteiro_teor):
         logging.warning('MISSING - %s não tem link para inteiro teor.\n',
                         prop.id_)
-        return prop
+        return None
 
-    arquivo = urllib.request.urlretrieve(prop.link_inteiro_teor)
-    with open(arquivo[0], 'rb') as arq:
-        cabecalho = magic.from_file(arquivo[0])
-        texto = ''
-        try:
-            if cabecalho.startswith(b'PDF'):
-                parser = PDFParser(arq)
-                doc = PDFDocument()
-                parser.set_document(doc)
-                doc.set_parser(parser)
-                doc.initialize()
-                rsrcmgr = PDFResourceManager()
-                output = StringIO()
-                converter = TextConverter(rsrcmgr, output, laparams=LAParams())
-                interpreter = PDFPageInterpreter(rsrcmgr, converter)
-                print('\t\tprocessando páginas')
-                for page in doc.get_pages():
-                    interpreter.process_page(page)
-                texto = output.getvalue()
-            elif cabecalho.startswith(b'Com'):
-                document = Document(arq)
-                print('\t\tprocessando paragrafos')
-                for paragraph in document:
-                    texto += paragraph.text
-            else:
-                raise Exception('Formato desconhecido')
-            print('\t\ttokenizando')
-            prop.inteiro_teor = re.split(r'\W+', texto)
-        except:
-            logging.warning('CORRUPT: %s arquivo corrupto! Oferecer dinheiro!',
-                            prop.id_)
-            logging.warning(prop.link_inteiro_teor)
-            nome = 'inteiro_teor/inteiro_teor_{}.doc'.format(prop.id_)
-            with open(nome, 'wb') as salvar:
-                salvar.write(arq.read())
-            logging.warning('arquivo salvo em %s\n', nome)
-    return prop
+    return cliente_http.baixar_arquivo(prop.link_inteiro_teor)
+
+def tipo_documento(arquivo):
+    """
+    Identifica o formato de um arquivo de inteiro teor pelo tipo mime.
+    Args:
+        arquivo (str): caminho do arquivo.
+    Return:
+        tipo (str): 'pdf', 'docx' ou None se for outro formato.
+    """
+    tipo = magic.from_file(arquivo, mime=True)
+    if isinstance(tipo, bytes):
+        #versões antigas do python-magic retornam bytes
+        tipo = tipo.decode('utf-8', 'replace')
+    if tipo == 'application/pdf':
+        return 'pdf'
+    if tipo.endswith('wordprocessingml.document'):
+        return 'docx'
+    #docx mínimos às vezes são reconhecidos só como zip
+    if tipo in ('application/zip', 'application/octet-stream') and \
+            zipfile.is_zipfile(arquivo):
+        with zipfile.ZipFile(arquivo) as arq:
+            if 'word/document.xml' in arq.namelist():
+                return 'docx'
+    return None
+
+def itera_paginas(arquivo):
+    """
+    Extrai o texto de um arquivo .pdf ou .doc(x) de inteiro teor aos
+    pedaços: uma página do pdf, ou um parágrafo do docx, de cada vez.
+    Args:
+        arquivo (str): caminho do arquivo.
+    Return:
+        gerador de str.
+    """
+    tipo = tipo_documento(arquivo)
+    with PERFIL.etapa('pdf') as etapa_pdf, open(arquivo, 'rb') as arq:
+        if tipo == 'pdf':
+            parser = PDFParser(arq)
+            doc = PDFDocument()
+            parser.set_document(doc)
+            doc.set_parser(parser)
+            doc.initialize()
+            rsrcmgr = PDFResourceManager()
+            output = StringIO()
+            converter = TextConverter(rsrcmgr, output, laparams=LAParams())
+            interpreter = PDFPageInterpreter(rsrcmgr, converter)
+            print('\t\tprocessando páginas')
+            for page in doc.get_pages():
+                interpreter.process_page(page)
+                pagina = output.getvalue()
+                #o StringIO só guarda a página atual
+                output.seek(0)
+                output.truncate()
+                with etapa_pdf.pausa():
+                    yield pagina
+        elif tipo == 'docx':
+            document = Document(arq)
+            print('\t\tprocessando paragrafos')
+            for paragraph in document.paragraphs:
+                #a quebra separa a última palavra de um parágrafo da
+                #primeira do seguinte (o pdf já termina cada página com \x0c)
+                with etapa_pdf.pausa():
+                    yield paragraph.text + '\n'
+        else:
+            raise Exception('Formato desconhecido')
+
+def extrair_texto(arquivo):
+    """
+    Extrai o texto de um arquivo .pdf ou .doc(x) de inteiro teor.
+    Args:
+        arquivo (str): caminho do arquivo.
+    Return:
+        texto (str)
+    """
+    return ''.join(itera_paginas(arquivo))
+
+def extrair_tokens(arquivo):
+    """
+    Extrai o texto de arquivo e tokeniza, página a página. Essa é a função
+    executada nos processos do pool de extração.
+    Args:
+        arquivo (str): caminho do arquivo.
+    Return:
+        tokens (TokensDocumento): termos distintos, ids locais e contagens.
+    """
+    print('\t\ttokenizando')
+    with PERFIL.etapa('tokens'):
+        return TokensDocumento(tokenizar(itera_paginas(arquivo)))
+
+def registrar_corrupto(prop, arquivo):
+    """
+    Registra no log que o arquivo de inteiro teor de prop não pôde ser
+    processado, e guarda uma cópia dele na pasta inteiro_teor.
+    Args:
+        prop (Proposicao)
+        arquivo (str): caminho do arquivo baixado.
+    """
+    logging.warning('CORRUPT: %s arquivo corrupto! Oferecer dinheiro!',
+                    prop.id_)
+    logging.warning(prop.link_inteiro_teor)
+    os.makedirs('inteiro_teor', exist_ok=True)
+    nome = 'inteiro_teor/inteiro_teor_{}.doc'.format(prop.id_)
+    shutil.copyfile(arquivo, nome)
+    logging.warning('arquivo salvo em %s\n', nome)
+
+def obter_inteiro_teor(props, processos=1, downloads=4, escritor=None):
+    """
+    Obtém o inteiro teor de todas as proposições de props.
+
+    Com processos > 1, os arquivos são baixados por um pool de threads e a
+    extração do texto, que ocupa a CPU, é feita num pool de processos. Cada
+    arquivo é entregue à extração assim que termina de ser baixado.
+    Args:
+        props (list): lista de Proposicao.
+        processos (int): número de processos de extração.
+        downloads (int): número de downloads simultâneos.
+        escritor (EscritorTokens): se informado, os tokens são gravados nele
+            assim que cada arquivo é processado.
+    Return:
+        props (list): a mesma lista, com o inteiro teor preenchido.
+    """
+    if escritor is not None:
+        #proposições que já estão no vetor (ex.: de uma execução interrompida
+        #antes de salvar o pickle) não são baixadas de novo
+        for prop in props:
+            if prop.id_ in escritor.posicoes and \
+                    not hasattr(prop, 'inteiro_teor'):
+                prop.inteiro_teor = None
+    if processos <= 1:
+        return [get_inteiro_teor(prop, escritor) for prop in props]
+    #limita os arquivos baixados e ainda não processados
+    max_pendentes = downloads + 2 * processos
+    proximas = iter(props)
+    with ThreadPoolExecutor(max_workers=downloads) as baixador, \
+            ProcessPoolExecutor(max_workers=processos,
+                                initializer=desligar_cprofile) as extrator:
+        baixando = {}
+        extraindo = {}
+
+        def agendar_downloads():
+            while len(baixando) + len(extraindo) < max_pendentes:
+                prop = next(proximas, None)
+                if prop is None:
+                    return
+                baixando[baixador.submit(baixar_inteiro_teor, prop)] = prop
+
+        agendar_downloads()
+        while baixando or extraindo:
+            prontos, _ = wait(list(baixando) + list(extraindo),
+                              return_when=FIRST_COMPLETED)
+            for fut in prontos:
+                if fut in baixando:
+                    prop = baixando.pop(fut)
+                    try:
+                        arquivo = fut.result()
+                    except Exception as erro:
+                        logging.warning('ERRO - %s falha ao baixar: %s\n',
+                                        prop.id_, erro)
+                        continue
+                    if arquivo is None:
+                        continue
+                    if PERFIL.ativo:
+                        #as etapas medidas no processo voltam com o resultado
+                        fut = extrator.submit(executar_medindo,
+                                              extrair_tokens, arquivo)
+                    else:
+                        fut = extrator.submit(extrair_tokens, arquivo)
+                    extraindo[fut] = (prop, arquivo)
+                else:
+                    prop, arquivo = extraindo.pop(fut)
+                    try:
+                        if PERFIL.ativo:
+                            tokens, medidas = fut.result()
+                            PERFIL.incorporar(medidas)
+                        else:
+                            tokens = fut.result()
+                        guardar_tokens(prop, tokens, escritor)
+                    except Exception:
+                        registrar_corrupto(prop, arquivo)
+                    os.remove(arquivo)
+            agendar_downloads()
+    return props
 
 def main():
     #tratando os argumentos da linha de comando
@@ -129,7 +339,21 @@ def main():
                         help="""indica se o arquivo das proposições já baixadas
                              contém apensadas ou não. Útil para encontrar o
                              arquivo correto.""")
+    parser.add_argument('-processos', type=int, default=1,
+                        help="""número de processos que extraem o texto dos
+                             arquivos. Padrão 1 (tudo no processo principal).
+                             """)
+    parser.add_argument('-downloads', type=int, default=4,
+                        help="""número de arquivos baixados simultaneamente
+                             quando -processos > 1. Padrão 4.""")
+    parser.add_argument('-vetor_tokens', action='store_true',
+                        help="""grava os tokens num vetor de ids (mmap) com
+                             vocabulário compartilhado, em vez de guardá-los
+                             em cada proposição do pickle. Ver
+                             tokens_inteiro_teor.py.""")
+    cliente_http.adicionar_argumentos(parser)
     args = vars(parser.parse_args())
+    cliente_http.aplicar_argumentos(args)
     licensa = ("baixa_camara  Copyright (C) 2016  Saullo Oliveira\n"
                "This program comes with ABSOLUTELY NO WARRANTY;\n"
                "This is free software, and you are welcome to redistribute it\n"
@@ -139,25 +363,40 @@ def main():
     print(licensa)
     input()
     apens = args['apensadas']
+    vocabulario = Vocabulario()
     for tp in args['tipos']:
         for ano in args['anos'][0]:
             print('Tipo {} ano {}.'.format(tp, ano))
             logging.basicConfig(filename="logs/warnings_{}_{}.log".format(tp,
                                                                           ano),
                                 level=logging.WARNING)
-            if os.path.isfile('down_files/prop_props_{}_{}_apens{}.pkl'\
-                    .format(tp, ano, apens)):
-                with open('down_files/prop_props_{}_{}_apens_{}.pkl'\
-                         .format(tp, ano, apens), 'rb')\
-                        as arq_prop:
+            arquivo = arquivo_proposicoes(tp, ano, apens)
+            if os.path.isfile(arquivo):
+                with open(arquivo, 'rb') as arq_prop:
                     print('Processando {}-{}'.format(tp, ano))
-                    props = pkl.load(arq_prop)
-                    props = [get_inteiro_teor(prop) for prop in props]
-                with open('down_files/prop_props_{}_{}_apens_{}.pkl'\
-                        .format(tp, ano, apens), 'wb')\
-                        as arq_prop:
+                    props, numeros = pkl.load(arq_prop)
+                escritor = None
+                if args['vetor_tokens']:
+                    escritor = EscritorTokens(arquivo_tokens(tp, ano, apens),
+                                              vocabulario)
+                    #tokens de execuções anteriores também vão para o vetor,
+                    #se ainda não estiverem nele
+                    for prop in props:
+                        if not getattr(prop, 'inteiro_teor', None):
+                            continue
+                        if prop.id_ in escritor.posicoes:
+                            prop.inteiro_teor = None
+                        else:
+                            guardar_tokens(prop, prop.inteiro_teor, escritor)
+                try:
+                    props = obter_inteiro_teor(props, args['processos'],
+                                               args['downloads'], escritor)
+                finally:
+                    if escritor is not None:
+                        escritor.fechar()
+                with PERFIL.etapa('pickle'), open(arquivo, 'wb') as arq_prop:
                     print('Salvando {}-{}'.format(tp, ano))
-                    pkl.dump(props, arq_prop)
+                    pkl.dump((props, numeros), arq_prop)
             else:
                 print(("\tarquivo não encontrado. Você já rodou o script "
                        "obter_proposicoes.py?"))
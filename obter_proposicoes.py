@@ -27,9 +27,9 @@ faz esse serviço, processando os documentos em formato .pdf e .doc.
 A pasta doc também contém um diagrama de classes explicando os dados e relacio-
 namentos.
 
-Possíveis melhorias:
-    * tratar erros de HTTP e fazer o script continuar a aquisição a partir do
-      erro.
+As proposições de cada ano são registradas num diário à medida que são
+baixadas. Se a aquisição for interrompida (erro de HTTP, queda do processo),
+basta executar o script novamente para continuar a partir do erro.
 """
 __author__ = "Saullo Oliveira"
 __copyright__ = "Copyright 2016"
@@ -42,11 +42,27 @@ __status__ = "Development"
 
 
 import argparse
-import os.path
-import xml.etree.ElementTree as ET
-import urllib.request
+import datetime
+import json
+import logging
+import os
+import threading
+import time
 import urllib.parse
+import xml.etree.ElementTree as ET
 import pickle as pkl
+import cliente_http
+import saida_ndjson
+from agendador_proposicoes import AgendadorTarefas
+from agendador_proposicoes import expandir_tarefas
+from diario_proposicoes import DiarioProposicoes
+from indice_proposicoes import IndiceProposicoes
+from metricas import METRICAS
+from metricas import nome_endpoint
+from perfilador import PERFIL
+from classes_base import compartilhado
+from classes_base import dia
+from classes_base import texto_de
 from classes_proposicoes import SiglaTipoProposicao
 from classes_proposicoes import SituacaoProposicao
 from classes_proposicoes import TipoAutor
@@ -60,23 +76,49 @@ from classes_proposicoes import UltimoDespacho
 from classes_proposicoes import Orgao
 
 
+PROP_DET_URL = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
+                "ObterProposicaoPorID?%s")
+PROP_LISTA_URL = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
+                  "ListarProposicoes?numero=&datApresentacaoIni=&"
+                  "datApresentacaoFim=&idTipoAutor=&parteNomeAutor=&"
+                  "siglaPartidoAutor=&siglaUFAutor=&generoAutor=&"
+                  "codEstado=&codOrgaoEstado=&emTramitacao=&%s")
+PROP_APENS_URL = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
+                  "ListarProposicoes?datApresentacaoIni=&"
+                  "datApresentacaoFim=&idTipoAutor=&parteNomeAutor=&"
+                  "siglaPartidoAutor=&siglaUFAutor=&generoAutor=&"
+                  "codEstado=&codOrgaoEstado=&emTramitacao=&%s")
+ARQ_SINCRONIZACAO = 'down_files/sincronizacao_proposicoes.json'
+_TRAVA_SINCRONIZACAO = threading.Lock()
+
+
+def arquivo_proposicoes(sigla, ano, apensadas):
+    """
+    Caminho do arquivo pickle com as proposições de sigla no ano.
+    Args:
+        sigla (str)
+        ano (int)
+        apensadas (boolean)
+    """
+    return 'down_files/prop_props_{}_{}_apens_{}.pkl'.format(sigla, ano,
+                                                            apensadas)
+
 def obter_siglas_tipo():
     """
     Obtém as siglas dos tipos de proposição.
     """
     siglas_url = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
                   "ListarSiglasTipoProposicao")
-    if not os.path.isfile('down_files/prop_siglas.pkl'):
+    if cliente_http.precisa_gerar('down_files/prop_siglas.pkl'):
         siglas = []
-        with urllib.request.urlopen(siglas_url) as res:
-            data = ET.fromstring(res.read())
-            for item in data:
-                sigla = SiglaTipoProposicao(
-                    item.get('tipoSigla'),
-                    item.get('descricao'),
-                    item.get('ativa'),
-                    item.get('genero'))
-                siglas.append(sigla)
+        data = cliente_http.obter_xml(siglas_url)
+        for item in data:
+            sigla = SiglaTipoProposicao(
+                item.get('tipoSigla'),
+                item.get('descricao'),
+                item.get('ativa'),
+                item.get('genero'))
+            siglas.append(sigla)
         with open('down_files/prop_siglas.pkl', 'wb') as arq:
             pkl.dump(siglas, arq)
         return siglas
@@ -88,16 +130,15 @@ def obter_situacoes():
     """Obtém a lista de situações para proposições."""
     situacoes_url = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
                      "ListarSituacoesProposicao")
-    if not os.path.isfile('down_files/prop_situacoes.pkl'):
+    if cliente_http.precisa_gerar('down_files/prop_situacoes.pkl'):
         situacoes = []
-        with urllib.request.urlopen(situacoes_url) as res:
-            data = ET.fromstring(res.read())
-            for item in data:
-                situacao = SituacaoProposicao(
-                    item.get('id'),
-                    item.get('descricao'),
-                    item.get('ativa'))
-                situacoes.append(situacao)
+        data = cliente_http.obter_xml(situacoes_url)
+        for item in data:
+            situacao = SituacaoProposicao(
+                item.get('id'),
+                item.get('descricao'),
+                item.get('ativa'))
+            situacoes.append(situacao)
         with open('down_files/prop_situacoes.pkl', 'wb') as arq:
             pkl.dump(situacoes, arq)
         return situacoes
@@ -109,15 +150,14 @@ def obter_tipos_autores():
     """Obtém a lista de tipos de autores das proposições."""
     tipos_url = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
                  "ListarTiposAutores")
-    if not os.path.isfile('down_files/prop_tipos_autores.pkl'):
+    if cliente_http.precisa_gerar('down_files/prop_tipos_autores.pkl'):
         tipos = []
-        with urllib.request.urlopen(tipos_url) as res:
-            data = ET.fromstring(res.read())
-            for item in data:
-                tipo = TipoAutor(
-                    item.get('id'),
-                    item.get('descricao'))
-                tipos.append(tipo)
+        data = cliente_http.obter_xml(tipos_url)
+        for item in data:
+            tipo = TipoAutor(
+                item.get('id'),
+                item.get('descricao'))
+            tipos.append(tipo)
         with open('down_files/prop_tipos_autores.pkl', 'wb') as arq:
             pkl.dump(tipos, arq)
         return tipos
@@ -127,14 +167,75 @@ def obter_tipos_autores():
 
 def monta_proposicao(item):
     """
-    Monta as proposições recuperadas em data.
+    Monta as proposições recuperadas em data, já com os detalhes obtidos no WS
+    ObterProposicaoPorID.
+    Args:
+        item (ElementTree): ElementTree de uma proposição do xml da camara.
+    Return:
+        prop (Proposicao): proposição.
+    """
+    with PERFIL.etapa('objetos'):
+        prop = monta_proposicao_lista(item)
+    return detalha_proposicao(prop)
+
+def detalha_proposicao(prop):
+    """
+    Obtém os detalhes de prop no WS ObterProposicaoPorID.
+    Args:
+        prop (Proposicao): proposição montada por monta_proposicao_lista.
+    Return:
+        prop (Proposicao): a mesma proposição, preenchida.
+    """
+    params_det = urllib.parse.urlencode({'IdProp': prop.id_})
+    detalhes = cliente_http.obter_xml(PROP_DET_URL % params_det)
+    with PERFIL.etapa('objetos'):
+        return preenche_detalhes(prop, detalhes)
+
+def itera_proposicoes(url):
+    """
+    Lê a resposta do WS ListarProposicoes aos poucos (iterparse), e entrega
+    cada proposição assim que o seu elemento termina. O elemento é descartado
+    logo depois, então a memória usada não depende do tamanho da resposta.
+    Args:
+        url (str): url do ListarProposicoes.
+    Return:
+        gerador de Proposicao, montadas por monta_proposicao_lista.
+    """
+    #tempo de interpretação, sem contar o tempo de quem consome o gerador
+    #(inclui a espera pela leitura da rede, que é feita durante o iterparse)
+    duracao = 0.0
+    with PERFIL.etapa('xml') as etapa_xml, cliente_http.abrir(url) as res:
+        raiz = None
+        profundidade = 0
+        inicio = time.monotonic()
+        for evento, elem in ET.iterparse(res, events=('start', 'end')):
+            if evento == 'start':
+                if raiz is None:
+                    raiz = elem
+                profundidade += 1
+                continue
+            profundidade -= 1
+            #somente os filhos diretos da raiz são proposições da listagem
+            if profundidade == 1 and elem.tag == 'proposicao':
+                with PERFIL.etapa('objetos'):
+                    prop = monta_proposicao_lista(elem)
+                raiz.clear()
+                duracao += time.monotonic() - inicio
+                with etapa_xml.pausa():
+                    yield prop
+                inicio = time.monotonic()
+        duracao += time.monotonic() - inicio
+    METRICAS.registrar_interpretacao(nome_endpoint(url), duracao)
+
+def monta_proposicao_lista(item):
+    """
+    Monta a proposição somente com os dados do WS ListarProposicoes, sem
+    requisitar os detalhes.
     Args:
         item (ElementTree): ElementTree de uma proposição do xml da camara.
     Return:
         prop (Proposicao): proposição.
     """
-    prop_det_url = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
-                    "ObterProposicaoPorID?%s")
     prop = Proposicao(
         item.find('id').text,
         item.find('nome').text,
@@ -149,27 +250,31 @@ def monta_proposicao(item):
 
     #setando o tipo de proposicao
     tipo_prop = item.find('tipoProposicao')
-    prop.set_tipo_proposicao(TipoProposicao(
+    prop.set_tipo_proposicao(compartilhado(
+        TipoProposicao,
         tipo_prop.find('id').text,
         tipo_prop.find('sigla').text,
         tipo_prop.find('nome').text))
 
     #setando o orgao numerador
     orgao_num = item.find('orgaoNumerador')
-    prop.set_orgao_numerador(OrgaoNumerador(
+    prop.set_orgao_numerador(compartilhado(
+        OrgaoNumerador,
         orgao_num.find('id').text,
         orgao_num.find('sigla').text,
         orgao_num.find('nome').text))
 
     #setando o regime
     regime = item.find('regime')
-    prop.set_regime(Regime(
+    prop.set_regime(compartilhado(
+        Regime,
         regime.find('codRegime').text,
         regime.find('txtRegime').text))
 
     #setando a apreciacao
     apre = item.find('apreciacao')
-    prop.set_apreciacao(Apreciacao(
+    prop.set_apreciacao(compartilhado(
+        Apreciacao,
         apre.find('id').text,
         apre.find('txtApreciacao').text))
 
@@ -193,8 +298,8 @@ def monta_proposicao(item):
     sit_prop = SituacaoProposicao(sit.find('id').text,
                                   sit.find('descricao').text)
     org = sit.find('orgao')
-    orgao = Orgao(org.find('codOrgaoEstado').text,
-                  org.find('siglaOrgaoEstado').text)
+    orgao = compartilhado(Orgao, org.find('codOrgaoEstado').text,
+                          org.find('siglaOrgaoEstado').text)
     sit_prop.set_orgao(orgao)
 
     principal = sit.find('principal')
@@ -205,103 +310,307 @@ def monta_proposicao(item):
             principal.find('proposicaoPrincipal').text}
     sit_prop.set_prop_principal(princ)
     prop.set_situacao(sit_prop)
+    return prop
 
-    params_det = urllib.parse.urlencode({'IdProp': prop.id_})
-    with urllib.request.urlopen(prop_det_url % params_det) as res_d:
-        detalhes = ET.fromstring(res_d.read())
-        prop.set_tema(detalhes.find('tema').text)
-        prop.set_indexacao(
-            detalhes.find('Indexacao').text.split(','))
-        prop.set_link_inteiro_teor(
-            detalhes.find('LinkInteiroTeor').text)
-        apensadas = detalhes.find('apensadas')
-        for apensada in apensadas:
-            apens = (apensada.find('nomeProposicao').text,\
-                 apensada.find('codProposicao').text)
-            prop.add_apensada(apens)
+def preenche_detalhes(prop, detalhes):
+    """
+    Preenche prop com os dados do WS ObterProposicaoPorID.
+    Args:
+        prop (Proposicao)
+        detalhes (ElementTree): xml retornado pelo ObterProposicaoPorID.
+    Return:
+        prop (Proposicao): a mesma proposição, preenchida.
+    """
+    prop.set_tema(detalhes.find('tema').text)
+    prop.set_indexacao(
+        detalhes.find('Indexacao').text.split(','))
+    prop.set_link_inteiro_teor(
+        detalhes.find('LinkInteiroTeor').text)
+    apensadas = detalhes.find('apensadas')
+    for apensada in apensadas:
+        apens = (apensada.find('nomeProposicao').text,\
+             apensada.find('codProposicao').text)
+        prop.add_apensada(apens)
 
     return prop
 
-def obter_proposicoes(sigla, anos, apensadas=False):
+def obter_proposicoes(sigla, anos, apensadas=False, indice=None):
     """Obtém a lista de proposições que satisfaçam os argumentos.
+    Cada proposição terminada é registrada no diário do ano (ver
+    diario_proposicoes.py). Se a execução for interrompida, a próxima continua
+    de onde parou.
     Args:
         sigla (str) - Padrão 'PL'
         anos (list) - Lista dos anos. Padrão [2011].
         apensadas (boolean) - Se deve ou não buscar as proposições apensadas.
-        siglas (list) - lista dos tipos para buscas as proposições apensadas.
+        indice (IndiceProposicoes) - índice das proposições já baixadas. Se
+            None, é carregado do disco.
     """
-    prop_url = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
-                "ListarProposicoes?numero=&datApresentacaoIni=&"
-                "datApresentacaoFim=&idTipoAutor=&parteNomeAutor=&"
-                "siglaPartidoAutor=&siglaUFAutor=&generoAutor=&"
-                "codEstado=&codOrgaoEstado=&emTramitacao=&%s")
+    if indice is None:
+        indice = IndiceProposicoes()
     for ano in anos:
-        if not os.path.isfile('down_files/prop_props_{}_{}.pkl'.format(sigla,
-                                                                       ano)):
-            props = []
+        arquivo = arquivo_proposicoes(sigla, ano, apensadas)
+        if cliente_http.precisa_gerar(arquivo):
+            diario = DiarioProposicoes(arquivo,
+                                       descartar=cliente_http.CLIENTE.offline)
+            #o arquivo vai ser gerado de novo, então o que estava nele não conta
+            indice.remover_arquivo(arquivo)
+            #apensadas já baixadas neste ano: se aparecerem depois na
+            #listagem, não são baixadas nem gravadas de novo
+            ids_apensadas = set()
+            for prop, apens in diario.itera():
+                for baixada in [prop] + apens:
+                    indice.adicionar(baixada, arquivo)
+                ids_apensadas.update(apen.id_ for apen in apens)
+            ids = []
             numeros = []
             print('Obtendo proposições do tipo {} no ano {}'.format(sigla, ano))
+            if len(diario) > 0:
+                print('\t{} proposições já baixadas no diário'.format(
+                    len(diario)))
             params = urllib.parse.urlencode({'sigla': sigla, 'ano': ano})
-            with urllib.request.urlopen(prop_url % params) as res:
-                data = ET.fromstring(res.read())
-                for item in data:
-                    prop = monta_proposicao(item)
-                    props.append(prop)
-                    numeros.append(prop.numero)
-                    print('{} - {} {} (id: {})'.format(len(props),
-                                                       prop.nome,
-                                                       prop.ano,
-                                                       prop.id_))
-                    if apensadas and len(prop.apensadas) > 0:
-                        apens = obter_apensadas(prop.apensadas, numeros)
-                        for apen in apens:
-                            props.append(apen)
+            for prop in itera_proposicoes(PROP_LISTA_URL % params):
+                ids.append(prop.id_)
+                numeros.append(prop.numero)
+                indice.adicionar(prop, arquivo)
+                if prop.id_ in diario or prop.id_ in ids_apensadas:
+                    continue
+                detalha_proposicao(prop)
+                print('{} - {} {} (id: {})'.format(len(ids),
+                                                   prop.nome,
+                                                   prop.ano,
+                                                   prop.id_))
+                apens = []
+                if apensadas and len(prop.apensadas) > 0:
+                    apens = obter_apensadas(prop.apensadas, indice, arquivo)
+                    ids_apensadas.update(apen.id_ for apen in apens)
+                diario.registrar(prop, apens)
+            diario.compactar(ids, numeros)
+            indice.salvar(arquivo)
+
+def sincronizar_proposicoes(sigla, anos, apensadas=False, indice=None):
+    """Atualiza os arquivos de proposições já baixados, sem baixar de novo as
+    proposições que não mudaram.
+    A listagem do ano é comparada com o arquivo: os detalhes só são pedidos
+    para as proposições novas ou cujo último despacho ou situação mudou. O
+    arquivo é reescrito no mesmo lugar, e a data da sincronização e a maior
+    data de apresentação vista (a marca d'água) ficam registradas em
+    down_files/sincronizacao_proposicoes.json. Anos que ainda não foram
+    baixados são baixados por obter_proposicoes.
+    Com o cache ligado (-cache), as respostas não são lidas dele, somente
+    gravadas: a sincronização sempre consulta o servidor.
+    Args:
+        sigla (str)
+        anos (list)
+        apensadas (boolean)
+        indice (IndiceProposicoes) - índice das proposições já baixadas.
+    """
+    if indice is None:
+        indice = IndiceProposicoes()
+    with cliente_http.renovando_cache():
+        for ano in anos:
+            sincroniza_ano(sigla, ano, apensadas, indice)
+
+def sincroniza_ano(sigla, ano, apensadas, indice):
+    """Sincroniza o arquivo de proposições de um ano (ver
+    sincronizar_proposicoes).
+    Args:
+        sigla (str)
+        ano (int)
+        apensadas (boolean)
+        indice (IndiceProposicoes)
+    """
+    arquivo = arquivo_proposicoes(sigla, ano, apensadas)
+    if not os.path.isfile(arquivo):
+        obter_proposicoes(sigla, [ano], apensadas, indice)
+        registra_sincronizacao(sigla, ano, arquivo)
+        return
+    marca = marcas_sincronizacao().get('{}_{}'.format(sigla, ano), {})
+    print('Sincronizando proposições do tipo {} no ano {} (última '
+          'sincronização: {})'.format(sigla, ano,
+                                      marca.get('data', 'nunca')))
+    with open(arquivo, 'rb') as arq:
+        props, _ = pkl.load(arq)
+    params = urllib.parse.urlencode({'sigla': sigla, 'ano': ano})
+    listagem = list(itera_proposicoes(PROP_LISTA_URL % params))
+    antigos = agrupa_registros(props, set(p.id_ for p in listagem))
+    diario = DiarioProposicoes(arquivo,
+                               descartar=cliente_http.CLIENTE.offline)
+    indice.remover_arquivo(arquivo)
+    ids = []
+    numeros = []
+    novas = alteradas = 0
+    #a listagem inteira entra no índice antes, para que uma proposição
+    #do ano não seja baixada como apensada de outra
+    for prop in listagem:
+        indice.adicionar(prop, arquivo)
+    for prop in listagem:
+        ids.append(prop.id_)
+        numeros.append(prop.numero)
+        if prop.id_ in diario:
+            registro = diario.obter(prop.id_)
+        elif prop.id_ in antigos and \
+                not proposicao_alterada(antigos[prop.id_][0], prop):
+            registro = antigos[prop.id_]
+            #o que não mudou não precisa ir para o diário
+            diario.manter(*registro)
+        else:
+            if prop.id_ in antigos:
+                alteradas += 1
+            else:
+                novas += 1
+            detalha_proposicao(prop)
+            if prop.id_ in antigos:
+                antiga = antigos[prop.id_][0]
+                #o inteiro teor antigo só vale se o link não mudou
+                if hasattr(antiga, 'inteiro_teor') and \
+                        antiga.link_inteiro_teor == prop.link_inteiro_teor:
+                    prop.inteiro_teor = antiga.inteiro_teor
+            print('{} - {} {} (id: {})'.format(len(ids),
+                                               prop.nome,
+                                               prop.ano,
+                                               prop.id_))
+            apens = []
+            if apensadas and len(prop.apensadas) > 0:
+                apens = obter_apensadas(prop.apensadas, indice, arquivo)
+            diario.registrar(prop, apens)
+            registro = (prop, apens)
+        for apen in registro[1]:
+            indice.adicionar(apen, arquivo)
+    diario.compactar(ids, numeros)
+    indice.salvar(arquivo)
+    registra_sincronizacao(sigla, ano, arquivo)
+    print('\t{} novas, {} alteradas, {} sem mudança'.format(
+        novas, alteradas, len(ids) - novas - alteradas))
+
+def agrupa_registros(props, listados):
+    """
+    Separa as proposições de um arquivo em registros (prop, apensadas). Cada
+    proposição da listagem é seguida no arquivo pelas suas apensadas.
+    Args:
+        props (list): proposições do arquivo, na ordem em que foram salvas.
+        listados (set): ids das proposições da listagem do ano.
+    Return:
+        registros (dict): id -> (prop, apens).
+    """
+    registros = {}
+    apens = None
+    for prop in props:
+        if prop.id_ in listados and prop.id_ not in registros:
+            apens = []
+            registros[prop.id_] = (prop, apens)
+        elif apens is not None:
+            apens.append(prop)
+    return registros
 
-            with open('down_files/prop_props_{}_{}_apens_{}.pkl'\
-                    .format(sigla, ano, apensadas),
-                      'wb') as arq:
-                pkl.dump((props, numeros), arq)
+def proposicao_alterada(antiga, nova):
+    """
+    Indica se o último despacho ou a situação de uma proposição mudou.
+    Args:
+        antiga (Proposicao): proposição salva no arquivo.
+        nova (Proposicao): a mesma proposição, montada da listagem atual.
+    """
+    def despacho(prop):
+        if prop.ultimo_despacho is None:
+            return None
+        return (prop.ultimo_despacho.data, prop.ultimo_despacho.texto)
+
+    def situacao(prop):
+        if prop.situacao is None:
+            return None
+        orgao = prop.situacao.orgao
+        return (prop.situacao.id_, prop.situacao.descricao,
+                orgao.id_ if orgao is not None else None)
+
+    return despacho(antiga) != despacho(nova) or \
+        situacao(antiga) != situacao(nova)
+
+def marcas_sincronizacao():
+    """
+    Lê as marcas d'água de cada (sigla, ano) já sincronizado.
+    Return:
+        marcas (dict): 'PL_2011' -> {'data': ..., 'apresentacao': ...}.
+    """
+    if not os.path.isfile(ARQ_SINCRONIZACAO):
+        return {}
+    with open(ARQ_SINCRONIZACAO, encoding='utf-8') as arq:
+        return json.load(arq)
 
-def obter_apensadas(apensadas, numeros):
+def registra_sincronizacao(sigla, ano, arquivo):
+    """
+    Registra a data da sincronização de (sigla, ano) e a maior data de
+    apresentação das proposições do arquivo.
+    Args:
+        sigla (str)
+        ano (int)
+        arquivo (str): arquivo de proposições recém gravado.
+    """
+    with open(arquivo, 'rb') as arq:
+        props, _ = pkl.load(arq)
+    datas = [dia(p, 'data_apresentacao') for p in props]
+    datas = [data for data in datas if data is not None]
+    with _TRAVA_SINCRONIZACAO:
+        marcas = marcas_sincronizacao()
+        marcas['{}_{}'.format(sigla, ano)] = {
+            'data': datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+            'apresentacao': texto_de(max(datas)) if datas else None,
+            'proposicoes': len(props)}
+        with open(ARQ_SINCRONIZACAO, 'w', encoding='utf-8') as arq:
+            json.dump(marcas, arq, indent=2, sort_keys=True)
+
+def obter_apensadas(apensadas, indice, arquivo):
     """
     Método que obtem as proposições apensadas de prop.
     Args:
         apensadas (list): lista de apensadas para baixar.
-        numeros (list): número das proposições que já foram baixadas.
+        indice (IndiceProposicoes): proposições que já foram baixadas, em
+            qualquer arquivo.
+        arquivo (str): arquivo onde as apensadas serão gravadas.
     Return:
         props (list): lista das proposicoes apensadas de prop.
     """
-    prop_url = ("http://www.camara.gov.br/SitCamaraWS/Proposicoes.asmx/"
-                "ListarProposicoes?datApresentacaoIni=&"
-                "datApresentacaoFim=&idTipoAutor=&parteNomeAutor=&"
-                "siglaPartidoAutor=&siglaUFAutor=&generoAutor=&"
-                "codEstado=&codOrgaoEstado=&emTramitacao=&%s")
     props = []
-    for nome, _ in apensadas:
-        #recupera a sigla para a busca
-        sigla = nome.split() #a sigla mesmo é o elemento 0
-        numero = sigla[1][:sigla[1].find('/')] #tudo antes da /
-        ano = sigla[1][-4:] #4 últimos dígitos
+    for nome, cod in apensadas:
+        sigla, numero, ano = identifica_apensada(nome)
 
         #se a proposição já foi baixada, não baixar novamente
-        if numero in numeros:
+        if indice.contem(sigla, numero, ano) or indice.contem_id(cod):
             continue
-        params = urllib.parse.urlencode({'sigla': sigla[0],
+        params = urllib.parse.urlencode({'sigla': sigla,
                                          'numero': numero,
                                          'ano': ano})
-        with urllib.request.urlopen(prop_url % params) as res:
-            data = ET.fromstring(res.read())
-            #se não retornou nada, continua
-            if data.tag == 'erro':
-                continue
-            prop = monta_proposicao(data.find('proposicao'))
-            props.append(prop)
-            print('\tAPENSADA: {} - {} {} (id: {})'.format(len(props),
-                                                           prop.nome,
-                                                           prop.ano,
-                                                           prop.id_))
+        try:
+            data = cliente_http.obter_xml(PROP_APENS_URL % params)
+        except cliente_http.RespostaAusente as erro:
+            #no modo offline, uma apensada fora do cache não impede o ano
+            logging.warning('OFFLINE - apensada %s fora do cache: %s',
+                            nome, erro)
+            continue
+        #se não retornou nada, continua
+        if data.tag == 'erro':
+            continue
+        prop = monta_proposicao(data.find('proposicao'))
+        indice.adicionar(prop, arquivo)
+        props.append(prop)
+        print('\tAPENSADA: {} - {} {} (id: {})'.format(len(props),
+                                                       prop.nome,
+                                                       prop.ano,
+                                                       prop.id_))
     return props
 
+def identifica_apensada(nome):
+    """
+    Recupera sigla, número e ano do nome de uma apensada. Ex.: 'PL 100/2011'.
+    Args:
+        nome (str): nome da proposição apensada.
+    Return:
+        (sigla, numero, ano)
+    """
+    sigla = nome.split() #a sigla mesmo é o elemento 0
+    numero = sigla[1][:sigla[1].find('/')] #tudo antes da /
+    ano = sigla[1][-4:] #4 últimos dígitos
+    return sigla[0], numero, ano
+
 def main():
     #tratando os argumentos da linha de comando
     parser = argparse.ArgumentParser(
@@ -329,7 +638,34 @@ def main():
     parser.add_argument('-apensadas', action='store_true',
                         help="""indica se deve baixar as proposições apensadas
                              no mesmo arquivo do ano.""")
+    parser.add_argument('-assincrono', action='store_true',
+                        help="""baixa listagens, detalhes e apensadas com
+                             requisições sobrepostas (asyncio).""")
+    parser.add_argument('-max_requisicoes', type=int, default=8,
+                        help="""número máximo de requisições em andamento no
+                             modo -assincrono, somando todos os -trabalhadores.
+                             Padrão 8.""")
+    parser.add_argument('-sincronizar', action='store_true',
+                        help="""atualiza os anos já baixados, pedindo os
+                             detalhes somente das proposições novas ou cujo
+                             último despacho ou situação mudou. As respostas
+                             não são lidas do cache (-cache), só gravadas
+                             nele.""")
+    parser.add_argument('-trabalhadores', type=int, default=1,
+                        help="""número de pares (tipo, ano) baixados ao mesmo
+                             tempo. Padrão 1.""")
+    parser.add_argument('-refazer_falhas', action='store_true',
+                        help="""executa de novo somente os pares (tipo, ano)
+                             que falharam na última execução, registrados em
+                             down_files/tarefas_proposicoes.json.""")
+    cliente_http.adicionar_argumentos(parser)
+    saida_ndjson.adicionar_argumentos(parser)
     args = vars(parser.parse_args())
+    if args['sincronizar'] and args['offline']:
+        parser.error('-sincronizar consulta o servidor, e não pode ser usado '
+                     'com -offline.')
+    cliente_http.aplicar_argumentos(args)
+    saida_ndjson.aplicar_argumentos(args)
     licensa = ("baixa_camara  Copyright (C) 2016  Saullo Oliveira\n"
                "This program comes with ABSOLUTELY NO WARRANTY;\n"
                "This is free software, and you are welcome to redistribute it\n"
@@ -352,10 +688,39 @@ def main():
                 print('{} - {}'.format(obj.id_, obj.descricao))
     #se não é pra listar, é pra baixar!
     else:
-        for tp in args['tipos']:
-            #verificando se a sigla é válida
-            obter_proposicoes(sigla=tp, anos=args['anos'][0],
-                              apensadas=args['apensadas'])
-                              
+        indice = IndiceProposicoes()
+        #os pares executados ao mesmo tempo no modo -assincrono dividem o
+        #mesmo limite de requisições em andamento
+        limite = threading.BoundedSemaphore(max(1, args['max_requisicoes']))
+
+        def executar(tp, ano):
+            if args['sincronizar']:
+                sincronizar_proposicoes(sigla=tp, anos=[ano],
+                                        apensadas=args['apensadas'],
+                                        indice=indice)
+            elif args['assincrono']:
+                from pipeline_proposicoes import obter_proposicoes_assincrono
+                obter_proposicoes_assincrono(
+                    sigla=tp, anos=[ano],
+                    apensadas=args['apensadas'],
+                    max_requisicoes=args['max_requisicoes'],
+                    indice=indice, limite=limite)
+            else:
+                obter_proposicoes(sigla=tp, anos=[ano],
+                                  apensadas=args['apensadas'],
+                                  indice=indice)
+
+        agendador = AgendadorTarefas(executar)
+        if args['refazer_falhas']:
+            tarefas = agendador.falhas()
+        else:
+            tarefas = expandir_tarefas(args['tipos'], args['anos'][0])
+        falhas = agendador.executar_tarefas(tarefas, args['trabalhadores'])
+        if len(falhas) > 0:
+            print('{} tarefas falharam: {}. Use -refazer_falhas para '
+                  'executá-las de novo.'.format(
+                      len(falhas), ', '.join('{} {}'.format(*tarefa)
+                                             for tarefa in falhas)))
+
 if __name__ == '__main__':
     main()
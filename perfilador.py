@@ -0,0 +1,408 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Perfil de desempenho por etapa, usado pela opção --profile dos scripts.
+
+O código marca as etapas com PERFIL.etapa(nome):
+    with PERFIL.etapa('xml'):
+        data = ET.fromstring(corpo)
+e o tempo de cada etapa é somado, em todas as threads. As etapas podem ser
+aninhadas; o tempo de uma etapa interna não é contado na externa. Com o
+perfil desligado (padrão), etapa não faz nada.
+
+Etapas usadas: rede (espera pela rede), xml (interpretação), objetos
+(montagem das classes), pdf (extração do texto do inteiro teor), tokens
+(tokenização) e pickle (gravação dos arquivos).
+
+Com o perfil ligado, o cProfile também roda em todas as threads, e no fim são
+gravados o resumo das etapas e um arquivo no formato do callgrind, que pode
+ser aberto no KCachegrind ou no QCachegrind. Até o Python 3.11 cada thread tem
+o seu cProfile; a partir do 3.12 o cProfile usa sys.monitoring, que só aceita
+um perfil ativo, e esse perfil já vê todas as threads.
+
+Os processos de um pool criados com fork herdam o cProfile ligado: use
+desligar_cprofile como initializer do pool.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+#a partir do 3.12, um cProfile só (sys.monitoring) mede todas as threads
+CPROFILE_GLOBAL = sys.version_info >= (3, 12)
+
+
+class _EtapaNula:
+    """
+    Etapa usada com o perfil desligado: não mede nada.
+    """
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        return False
+
+
+    def pausa(self):
+        return self
+
+
+_NULA = _EtapaNula()
+
+
+class _Etapa:
+    """
+    Trecho de código medido como parte de uma etapa.
+    """
+
+
+    def __init__(self, perfil, nome):
+        self._perfil = perfil
+        self.nome = nome
+        self.inicio = None
+
+
+    def __enter__(self):
+        self._perfil._empilhar(self)
+        return self
+
+
+    def __exit__(self, *args):
+        self._perfil._desempilhar(self, contar=True)
+        return False
+
+
+    def pausa(self):
+        """
+        Suspende a etapa dentro do with, por exemplo durante um yield, para
+        que o tempo do código de fora não seja contado nela.
+        """
+        return _Pausa(self)
+
+
+class _Pausa:
+    """
+    Suspende uma _Etapa enquanto estiver ativa.
+    """
+
+
+    def __init__(self, etapa):
+        self._etapa = etapa
+
+
+    def __enter__(self):
+        self._etapa._perfil._desempilhar(self._etapa, contar=False)
+        return self
+
+
+    def __exit__(self, *args):
+        self._etapa._perfil._empilhar(self._etapa)
+        return False
+
+
+class PerfiladorEtapas:
+    """
+    Soma o tempo de cada etapa e, opcionalmente, roda o cProfile em todas as
+    threads.
+    """
+
+
+    def __init__(self):
+        self.ativo = False
+        self.tempos = {}
+        self.contagens = {}
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._perfis = []
+        self._inicio = None
+
+
+    def etapa(self, nome):
+        """
+        Retorna o gerenciador de contexto (with) que mede a etapa nome.
+        Args:
+            nome (str)
+        """
+        if not self.ativo:
+            return _NULA
+        return _Etapa(self, nome)
+
+
+    def _pilha(self):
+        """
+        Pilha das etapas em andamento na thread atual.
+        """
+        pilha = getattr(self._local, 'pilha', None)
+        if pilha is None:
+            pilha = self._local.pilha = []
+        return pilha
+
+
+    def _somar(self, nome, duracao, contar):
+        with self._trava:
+            self.tempos[nome] = self.tempos.get(nome, 0.0) + duracao
+            if contar:
+                self.contagens[nome] = self.contagens.get(nome, 0) + 1
+
+
+    def _empilhar(self, etapa):
+        """
+        Começa a medir etapa e suspende a etapa de fora, se houver.
+        """
+        pilha = self._pilha()
+        agora = time.perf_counter()
+        if pilha:
+            externa = pilha[-1]
+            self._somar(externa.nome, agora - externa.inicio, False)
+        etapa.inicio = agora
+        pilha.append(etapa)
+
+
+    def _desempilhar(self, etapa, contar):
+        """
+        Termina (ou suspende) a medição de etapa e retoma a etapa de fora.
+        """
+        pilha = self._pilha()
+        agora = time.perf_counter()
+        self._somar(etapa.nome, agora - etapa.inicio, contar)
+        if pilha and pilha[-1] is etapa:
+            pilha.pop()
+        if pilha:
+            pilha[-1].inicio = agora
+
+
+    def _perfilar_thread(self, *args):
+        """
+        Chamada (via threading.setprofile) no início de cada thread nova:
+        liga um cProfile só para ela.
+        """
+        sys.setprofile(None)
+        perfil = cProfile.Profile()
+        with self._trava:
+            self._perfis.append(perfil)
+        perfil.enable()
+
+
+    def iniciar(self, cprofile=True):
+        """
+        Liga a medição das etapas e, se cprofile, o cProfile na thread atual
+        e nas threads criadas a partir de agora.
+        Args:
+            cprofile (boolean)
+        """
+        self.ativo = True
+        self._inicio = time.perf_counter()
+        if cprofile:
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError as erro:
+                #outro perfilador já está ativo (sys.monitoring)
+                print('cProfile desligado: {}'.format(erro))
+                return
+            self._perfis.append(perfil)
+            if not CPROFILE_GLOBAL:
+                threading.setprofile(self._perfilar_thread)
+
+
+    def encerrar(self):
+        """
+        Desliga a medição.
+        Return:
+            stats (Stats): estatísticas do cProfile de todas as threads, ou
+                None se o cProfile não foi ligado.
+        """
+        self.ativo = False
+        threading.setprofile(None)
+        with self._trava:
+            perfis = list(self._perfis)
+            self._perfis = []
+        if not perfis:
+            return None
+        stats = None
+        for perfil in perfis:
+            perfil.disable()
+            try:
+                if stats is None:
+                    stats = pstats.Stats(perfil)
+                else:
+                    stats.add(perfil)
+            except TypeError:
+                #thread que não chegou a executar nada
+                continue
+        return stats
+
+
+    def incorporar(self, medidas):
+        """
+        Soma as etapas medidas em outro processo (ver executar_medindo).
+        Args:
+            medidas (tuple): (tempos, contagens).
+        """
+        tempos, contagens = medidas
+        with self._trava:
+            for nome, tempo in tempos.items():
+                self.tempos[nome] = self.tempos.get(nome, 0.0) + tempo
+            for nome, contagem in contagens.items():
+                self.contagens[nome] = self.contagens.get(nome, 0) + contagem
+
+
+    def resumo(self):
+        """
+        Resumo das etapas.
+        Return:
+            resumo (dict): tempo total (parede) e, para cada etapa, tempo
+                somado em todas as threads, fração e número de trechos.
+        """
+        with self._trava:
+            tempos = dict(self.tempos)
+            contagens = dict(self.contagens)
+        total = sum(tempos.values())
+        return {'tempo_total_s': time.perf_counter() - self._inicio
+                                 if self._inicio is not None else None,
+                'etapas': {nome: {'tempo_s': tempo,
+                                  'fracao': tempo / total if total else None,
+                                  'trechos': contagens.get(nome, 0)}
+                           for nome, tempo in tempos.items()}}
+
+
+    def gravar(self, prefixo):
+        """
+        Encerra a medição e grava prefixo.etapas.txt, prefixo.etapas.json e
+        callgrind.out.<nome>, na pasta de prefixo.
+        Args:
+            prefixo (str): ex.: 'logs/perfil'.
+        """
+        stats = self.encerrar()
+        resumo = self.resumo()
+        pasta, nome = os.path.split(prefixo)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        linhas = ['Tempo total: {:.3f}s'.format(resumo['tempo_total_s']),
+                  '{:<10} {:>12} {:>8} {:>10}'.format('etapa', 'tempo (s)',
+                                                      '%', 'trechos')]
+        for etapa, dados in sorted(resumo['etapas'].items(),
+                                   key=lambda item: -item[1]['tempo_s']):
+            linhas.append('{:<10} {:>12.3f} {:>8.1f} {:>10}'.format(
+                etapa, dados['tempo_s'], 100 * (dados['fracao'] or 0),
+                dados['trechos']))
+        texto = '\n'.join(linhas)
+        print(texto)
+        with open(prefixo + '.etapas.txt', 'w', encoding='utf-8') as arq:
+            arq.write(texto + '\n')
+        with open(prefixo + '.etapas.json', 'w', encoding='utf-8') as arq:
+            json.dump(resumo, arq, indent=2, sort_keys=True)
+        if stats is not None:
+            gravar_callgrind(stats, os.path.join(pasta,
+                                                 'callgrind.out.' + nome))
+
+
+def executar_medindo(funcao, *args):
+    """
+    Executa funcao num processo de um pool medindo as etapas, para que elas
+    sejam somadas no processo principal com PERFIL.incorporar.
+    Args:
+        funcao (function)
+        args: argumentos de funcao.
+    Return:
+        (resultado, medidas): medidas é (tempos, contagens).
+    """
+    PERFIL.ativo = True
+    PERFIL.tempos = {}
+    PERFIL.contagens = {}
+    resultado = funcao(*args)
+    return resultado, (PERFIL.tempos, PERFIL.contagens)
+
+
+def desligar_cprofile():
+    """
+    Initializer dos processos de um pool: desliga o cProfile herdado do
+    processo principal (fork). As etapas continuam sendo medidas por
+    executar_medindo.
+    """
+    threading.setprofile(None)
+    sys.setprofile(None)
+    for perfil in PERFIL._perfis:
+        perfil.disable()
+    PERFIL._perfis = []
+
+
+def _nome_funcao(funcao):
+    """
+    Nome de uma função do pstats no callgrind.
+    Args:
+        funcao (tuple): (arquivo, linha, nome).
+    """
+    arquivo, linha, nome = funcao
+    if arquivo == '~':
+        #funções embutidas (ex.: <built-in method ...>)
+        return nome
+    return '{}:{}'.format(nome, linha)
+
+
+def gravar_callgrind(stats, caminho):
+    """
+    Grava as estatísticas do cProfile no formato do callgrind. Os custos são
+    em microssegundos.
+    Args:
+        stats (Stats)
+        caminho (str)
+    """
+    chamados = {}
+    for funcao, (_, _, _, _, chamadores) in stats.stats.items():
+        for chamador, dados in chamadores.items():
+            chamados.setdefault(chamador, []).append((funcao, dados))
+
+    def micro(segundos):
+        return int(round(segundos * 1e6))
+
+    linhas = ['# callgrind format', 'version: 1', 'creator: baixa_camara',
+              'events: Microssegundos',
+              'summary: {}'.format(micro(stats.total_tt)), '']
+    for funcao, (_, _, proprio, _, _) in stats.stats.items():
+        arquivo, linha, _ = funcao
+        linhas.append('fl={}'.format(arquivo))
+        linhas.append('fn={}'.format(_nome_funcao(funcao)))
+        linhas.append('{} {}'.format(linha, micro(proprio)))
+        for chamado, (_, chamadas, _, acumulado) in chamados.get(funcao, []):
+            linhas.append('cfl={}'.format(chamado[0]))
+            linhas.append('cfn={}'.format(_nome_funcao(chamado)))
+            linhas.append('calls={} {}'.format(chamadas, chamado[1]))
+            linhas.append('{} {}'.format(linha, micro(acumulado)))
+        linhas.append('')
+    with open(caminho, 'w', encoding='utf-8') as arq:
+        arq.write('\n'.join(linhas))
+
+
+#perfil do processo, ligado pela opção --profile
+PERFIL = PerfiladorEtapas()
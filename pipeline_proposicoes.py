@@ -0,0 +1,346 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Versão assíncrona (asyncio) de obter_proposicoes.
+
+A listagem de cada ano (ListarProposicoes), os detalhes de cada proposição
+(ObterProposicaoPorID) e as apensadas são etapas que se sobrepõem: assim que
+cada proposição da listagem de um ano chega, os seus detalhes são pedidos, e
+assim que os detalhes chegam, as suas apensadas são pedidas.
+Um semáforo limita o número de requisições em andamento no total. Quando
+vários pipelines rodam ao mesmo tempo (obter_proposicoes.py -assincrono
+-trabalhadores N, um asyncio.run por par (tipo, ano)), eles recebem o mesmo
+limite (threading.BoundedSemaphore), e o total de requisições em andamento
+continua sendo max_requisicoes.
+
+As requisições continuam sendo feitas pelo cliente_http, em threads, e o xml é
+interpretado pelas mesmas funções de obter_proposicoes.py. O arquivo gerado
+tem as mesmas proposições da versão sequencial, cada id uma vez só (ver
+DiarioProposicoes.compactar), mas a posição pode mudar: uma apensada citada
+por mais de uma proposição pode ficar junto de outra que a cita, e uma
+proposição da listagem que também é apensada pode ficar no lugar dela na
+listagem em vez de logo após a que a cita.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+import cliente_http
+from diario_proposicoes import DiarioProposicoes
+from indice_proposicoes import IndiceProposicoes
+from metricas import METRICAS
+from metricas import nome_endpoint
+from obter_proposicoes import PROP_DET_URL
+from obter_proposicoes import PROP_LISTA_URL
+from obter_proposicoes import PROP_APENS_URL
+from obter_proposicoes import arquivo_proposicoes
+from obter_proposicoes import monta_proposicao_lista
+from obter_proposicoes import preenche_detalhes
+from obter_proposicoes import identifica_apensada
+from obter_proposicoes import itera_proposicoes
+from perfilador import PERFIL
+
+
+class PipelineProposicoes:
+    """
+    Baixa as proposições de vários anos com requisições sobrepostas.
+    """
+
+
+    def __init__(self, max_requisicoes=8, indice=None, limite=None):
+        """
+        Método construtor.
+        Args:
+            max_requisicoes (int): número máximo de requisições em andamento.
+            indice (IndiceProposicoes): índice das proposições já baixadas. Se
+                None, é carregado do disco.
+            limite (BoundedSemaphore): limite de requisições compartilhado
+                com outros pipelines, que rodam em outras threads. Se None,
+                só o semáforo deste pipeline vale.
+        """
+        self.max_requisicoes = max_requisicoes
+        self._limite = limite
+        self._semaforo = None
+        self._executor = None
+        self._indice = indice
+        self._apensadas = set()
+        #arquivo -> {id: tarefa} das apensadas pedidas pelas proposições dele
+        self._pedidas = {}
+
+
+    def _limitado(self, funcao, *args):
+        """
+        Executa funcao (numa thread do executor) dentro do limite
+        compartilhado, se houver.
+        """
+        if self._limite is None:
+            return funcao(*args)
+        with self._limite:
+            return funcao(*args)
+
+
+    async def _obter_xml(self, url):
+        """
+        Requisita url sem bloquear o loop de eventos.
+        Args:
+            url (str)
+        Return:
+            data (Element)
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaforo:
+            corpo = await loop.run_in_executor(self._executor, self._limitado,
+                                               cliente_http.obter, url)
+        inicio = time.monotonic()
+        with PERFIL.etapa('xml'):
+            data = ET.fromstring(corpo)
+        METRICAS.registrar_interpretacao(nome_endpoint(url),
+                                         time.monotonic() - inicio)
+        return data
+
+
+    async def _listar(self, url):
+        """
+        Entrega as proposições do ListarProposicoes à medida que a resposta
+        chega. A leitura (iterparse) roda numa thread, e os detalhes de cada
+        proposição já podem ser pedidos antes de a listagem terminar.
+        Args:
+            url (str)
+        Return:
+            gerador assíncrono de Proposicao.
+        """
+        loop = asyncio.get_running_loop()
+        fila = asyncio.Queue()
+        fim = object()
+
+        def produzir():
+            try:
+                for prop in itera_proposicoes(url):
+                    loop.call_soon_threadsafe(fila.put_nowait, prop)
+            except Exception as erro:
+                loop.call_soon_threadsafe(fila.put_nowait, erro)
+            finally:
+                loop.call_soon_threadsafe(fila.put_nowait, fim)
+
+        async with self._semaforo:
+            produtor = loop.run_in_executor(self._executor, self._limitado,
+                                            produzir)
+            while True:
+                item = await fila.get()
+                if item is fim:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await produtor
+
+
+    async def _detalhar(self, prop):
+        """
+        Obtém os detalhes (ObterProposicaoPorID) de prop.
+        Args:
+            prop (Proposicao)
+        Return:
+            prop (Proposicao)
+        """
+        params_det = urllib.parse.urlencode({'IdProp': prop.id_})
+        detalhes = await self._obter_xml(PROP_DET_URL % params_det)
+        with PERFIL.etapa('objetos'):
+            return preenche_detalhes(prop, detalhes)
+
+
+    async def _baixar_apensada(self, sigla, numero, ano):
+        """
+        Busca e detalha uma proposição apensada.
+        Args:
+            sigla (str)
+            numero (str)
+            ano (str)
+        Return:
+            prop (Proposicao): None caso o WS não retorne nada ou, no modo
+                offline, a resposta não esteja no cache.
+        """
+        params = urllib.parse.urlencode({'sigla': sigla,
+                                         'numero': numero,
+                                         'ano': ano})
+        try:
+            data = await self._obter_xml(PROP_APENS_URL % params)
+            #se não retornou nada, não há apensada
+            if data.tag == 'erro':
+                return None
+            with PERFIL.etapa('objetos'):
+                prop = monta_proposicao_lista(data.find('proposicao'))
+            return await self._detalhar(prop)
+        except cliente_http.RespostaAusente as erro:
+            #no modo offline, uma apensada fora do cache não impede o ano
+            logging.warning('OFFLINE - apensada %s %s/%s fora do cache: %s',
+                            sigla, numero, ano, erro)
+            return None
+
+
+    def _obter_apensada(self, sigla, numero, ano, cod, arquivo):
+        """
+        Retorna a tarefa que baixa a apensada, ou None se ela já foi baixada
+        (está no índice) ou já foi pedida por outra proposição. Assim cada
+        apensada é gravada uma vez só.
+        Args:
+            sigla (str)
+            numero (str)
+            ano (str)
+            cod (str): id da apensada.
+            arquivo (str): arquivo da proposição que cita a apensada.
+        Return:
+            tarefa (Future)
+        """
+        chave = (sigla, numero, ano)
+        if chave in self._apensadas or self._indice.contem(*chave) or \
+                self._indice.contem_id(cod):
+            return None
+        self._apensadas.add(chave)
+        tarefa = asyncio.ensure_future(self._baixar_apensada(sigla, numero,
+                                                             ano))
+        self._pedidas.setdefault(arquivo, {})[cod] = tarefa
+        return tarefa
+
+
+    async def _processar(self, prop, apensadas, diario):
+        """
+        Detalha prop e, se for o caso, baixa as suas apensadas. O resultado é
+        registrado no diário.
+        Args:
+            prop (Proposicao)
+            apensadas (boolean)
+            diario (DiarioProposicoes)
+        """
+        await self._detalhar(prop)
+        apens = []
+        if apensadas and len(prop.apensadas) > 0:
+            tarefas = []
+            for nome, cod in prop.apensadas:
+                tarefa = self._obter_apensada(*identifica_apensada(nome), cod,
+                                              diario.arquivo)
+                if tarefa is not None:
+                    tarefas.append(tarefa)
+            apens = [apen for apen in await asyncio.gather(*tarefas)
+                     if apen is not None]
+            for apen in apens:
+                self._indice.adicionar(apen, diario.arquivo)
+        diario.registrar(prop, apens)
+        print('{} - {} {} (id: {})'.format(len(diario),
+                                           prop.nome,
+                                           prop.ano,
+                                           prop.id_))
+
+
+    async def obter_ano(self, sigla, ano, apensadas=False):
+        """
+        Baixa as proposições de sigla em ano e salva no mesmo arquivo da
+        versão sequencial.
+        Args:
+            sigla (str)
+            ano (int)
+            apensadas (boolean)
+        """
+        print('Obtendo proposições do tipo {} no ano {}'.format(sigla, ano))
+        arquivo = arquivo_proposicoes(sigla, ano, apensadas)
+        diario = DiarioProposicoes(arquivo,
+                                   descartar=cliente_http.CLIENTE.offline)
+        #o arquivo vai ser gerado de novo, então o que estava nele não conta
+        self._indice.remover_arquivo(arquivo)
+        ids_apensadas = set()
+        for prop, apens in diario.itera():
+            for baixada in [prop] + apens:
+                self._indice.adicionar(baixada, arquivo)
+            ids_apensadas.update(apen.id_ for apen in apens)
+        pedidas = self._pedidas.setdefault(arquivo, {})
+        params = urllib.parse.urlencode({'sigla': sigla, 'ano': ano})
+        ids = []
+        numeros = []
+        tarefas = []
+        pendentes = []
+        async for prop in self._listar(PROP_LISTA_URL % params):
+            ids.append(prop.id_)
+            numeros.append(prop.numero)
+            self._indice.adicionar(prop, arquivo)
+            #as proposições que já estão no diário, ou que já vieram (ou estão
+            #sendo baixadas) como apensadas, não são baixadas de novo
+            if prop.id_ in diario or prop.id_ in ids_apensadas:
+                continue
+            if prop.id_ in pedidas:
+                pendentes.append(prop)
+                continue
+            tarefas.append(asyncio.ensure_future(self._processar(
+                prop, apensadas, diario)))
+        await asyncio.gather(*tarefas)
+        #uma apensada que não pôde ser baixada é pedida como da listagem
+        tarefas = [asyncio.ensure_future(self._processar(prop, apensadas,
+                                                         diario))
+                   for prop in pendentes if await pedidas[prop.id_] is None]
+        await asyncio.gather(*tarefas)
+        diario.compactar(ids, numeros)
+        self._indice.salvar(arquivo)
+
+
+    async def obter(self, sigla, anos, apensadas=False):
+        """
+        Baixa todos os anos ao mesmo tempo, respeitando o limite de
+        requisições.
+        Args:
+            sigla (str)
+            anos (list)
+            apensadas (boolean)
+        """
+        self._semaforo = asyncio.Semaphore(self.max_requisicoes)
+        if self._indice is None:
+            self._indice = IndiceProposicoes()
+        self._apensadas = set()
+        self._pedidas = {}
+        with ThreadPoolExecutor(max_workers=self.max_requisicoes) as executor:
+            self._executor = executor
+            await asyncio.gather(
+                *(self.obter_ano(sigla, ano, apensadas) for ano in anos
+                  if cliente_http.precisa_gerar(
+                      arquivo_proposicoes(sigla, ano, apensadas))))
+
+
+def obter_proposicoes_assincrono(sigla, anos, apensadas=False,
+                                 max_requisicoes=8, indice=None,
+                                 limite=None):
+    """
+    Equivalente a obter_proposicoes, mas com as requisições sobrepostas.
+    Args:
+        sigla (str)
+        anos (list)
+        apensadas (boolean)
+        max_requisicoes (int): número máximo de requisições em andamento.
+        indice (IndiceProposicoes): índice das proposições já baixadas.
+        limite (BoundedSemaphore): limite de requisições compartilhado entre
+            chamadas simultâneas (ver PipelineProposicoes).
+    """
+    pipeline = PipelineProposicoes(max_requisicoes, indice, limite)
+    asyncio.run(pipeline.obter(sigla, anos, apensadas))
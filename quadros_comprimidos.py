@@ -0,0 +1,436 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Arquivos de registros em quadros comprimidos, menores que os pickles e com
+leitura parcial.
+
+Os registros (proposições ou deputados) são agrupados em quadros de
+por_quadro registros; cada quadro é um pickle da lista comprimido com zstd,
+lz4 ou zlib (o primeiro disponível, nessa ordem; zstd e lz4 são opcionais:
+pip install zstandard lz4). No fim do arquivo fica o índice dos quadros e dos
+ids:
+    down_files/prop_props_PL_2011_apens_True.quadros
+    down_files/deputados.quadros
+
+Ler um registro descomprime só o quadro dele:
+    with abrir_proposicoes('PL', 2011, True) as props:
+        props[10]
+        props.obter_por_id('1110000295')
+        props.ler([3, 500, 9000])       #quadros descomprimidos em paralelo
+Os quadros são descomprimidos em threads (zlib, zstd e lz4 liberam o GIL), e a
+iteração sobre o arquivo todo descomprime os quadros seguintes (no máximo
+threads quadros à frente) enquanto os anteriores são usados.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import argparse
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+import os
+import pickle as pkl
+import struct
+import zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+from indice_proposicoes import carrega_proposicoes
+from obter_proposicoes import arquivo_proposicoes
+
+
+ARQ_DEPUTADOS = 'down_files/deputados.pkl'
+
+MAGICO = b'BCQ1'
+#posição do índice, gravada nos últimos bytes do arquivo
+RODAPE = struct.Struct('<Q')
+
+
+def _codificadores():
+    """
+    Codificadores disponíveis: nome -> (comprimir(dados, nivel),
+    descomprimir(dados), nível padrão), na ordem de preferência.
+    """
+    codificadores = {}
+    if zstandard is not None:
+        codificadores['zstd'] = (
+            lambda dados, nivel: zstandard.ZstdCompressor(
+                level=nivel).compress(dados),
+            lambda dados: zstandard.ZstdDecompressor().decompress(dados),
+            3)
+    if lz4 is not None:
+        codificadores['lz4'] = (
+            lambda dados, nivel: lz4.frame.compress(
+                dados, compression_level=nivel),
+            lz4.frame.decompress,
+            0)
+    codificadores['zlib'] = (zlib.compress, zlib.decompress, 6)
+    return codificadores
+
+
+CODIFICADORES = _codificadores()
+
+
+def codificador(nome=None):
+    """
+    Funções de um codificador.
+    Args:
+        nome (str): 'zstd', 'lz4' ou 'zlib'. Se None, o melhor disponível.
+    Return:
+        (nome, comprimir, descomprimir, nivel_padrao)
+    """
+    if nome is None:
+        nome = next(iter(CODIFICADORES))
+    if nome not in CODIFICADORES:
+        raise ImportError('o codificador {} não está disponível (pip install '
+                          '{})'.format(nome, {'zstd': 'zstandard'}.get(
+                              nome, nome)))
+    return (nome,) + CODIFICADORES[nome]
+
+
+def arquivo_quadros(arquivo):
+    """
+    Arquivo de quadros de um arquivo pickle.
+    Ex.: down_files/prop_props_PL_2011_apens_True.quadros
+    """
+    return os.path.splitext(arquivo)[0] + '.quadros'
+
+
+def gravar_quadros(registros, caminho, id_de, por_quadro=256, nome=None,
+                   nivel=None, extra=None):
+    """
+    Grava registros em quadros comprimidos. O arquivo só é substituído no
+    fim, então uma gravação interrompida não estraga a anterior.
+    Args:
+        registros (iterable): objetos a gravar, em ordem.
+        caminho (str)
+        id_de (function): recebe um registro e retorna o id dele.
+        por_quadro (int): registros em cada quadro.
+        nome (str): codificador (ver codificador).
+        nivel (int): nível de compressão. Se None, o padrão do codificador.
+        extra: guardado no índice (ex.: os números da listagem).
+    Return:
+        total (int): número de registros gravados.
+    """
+    nome, comprimir, _, padrao = codificador(nome)
+    nivel = padrao if nivel is None else nivel
+    quadros = []
+    ids = {}
+    total = 0
+    tmp = caminho + '.tmp'
+
+    def gravar_quadro(arq, quadro):
+        dados = comprimir(pkl.dumps(quadro, pkl.HIGHEST_PROTOCOL), nivel)
+        quadros.append((arq.tell(), len(dados), len(quadro)))
+        arq.write(dados)
+
+    with open(tmp, 'wb') as arq:
+        arq.write(MAGICO)
+        quadro = []
+        for registro in registros:
+            #se o id se repetir (ex.: apensada em dois lugares), vale o
+            #primeiro
+            ids.setdefault(id_de(registro), total)
+            quadro.append(registro)
+            total += 1
+            if len(quadro) == por_quadro:
+                gravar_quadro(arq, quadro)
+                quadro = []
+        if quadro:
+            gravar_quadro(arq, quadro)
+        posicao = arq.tell()
+        pkl.dump({'codificador': nome, 'por_quadro': por_quadro,
+                  'quadros': quadros, 'ids': ids, 'extra': extra},
+                 arq, pkl.HIGHEST_PROTOCOL)
+        arq.write(RODAPE.pack(posicao))
+    os.replace(tmp, caminho)
+    return total
+
+
+class ArquivoQuadros(Sequence):
+    """
+    Sequência dos registros de um arquivo de quadros. Cada quadro só é lido e
+    descomprimido quando um registro dele é acessado.
+    """
+
+
+    def __init__(self, caminho, threads=None):
+        """
+        Método construtor. Carrega somente o índice.
+        Args:
+            caminho (str)
+            threads (int): threads para descomprimir quadros em paralelo.
+                Se None, o número de processadores.
+        """
+        self.caminho = caminho
+        self._fd = os.open(caminho, os.O_RDONLY)
+        tamanho = os.fstat(self._fd).st_size
+        if os.pread(self._fd, len(MAGICO), 0) != MAGICO:
+            os.close(self._fd)
+            raise ValueError('{} não é um arquivo de quadros'.format(caminho))
+        posicao, = RODAPE.unpack(os.pread(self._fd, RODAPE.size,
+                                          tamanho - RODAPE.size))
+        indice = pkl.loads(os.pread(self._fd, tamanho - RODAPE.size - posicao,
+                                    posicao))
+        self.codificador = indice['codificador']
+        self._descomprimir = codificador(self.codificador)[2]
+        self.por_quadro = indice['por_quadro']
+        self._quadros = indice['quadros']
+        self._ids = indice['ids']
+        self.extra = indice['extra']
+        self._total = sum(registros for _, _, registros in self._quadros)
+        self._threads = threads or os.cpu_count() or 1
+        self._executor = None
+        #último quadro lido, para acessos seguidos ao mesmo quadro
+        self._cache = (None, None)
+
+
+    def __len__(self):
+        return self._total
+
+
+    def numero_quadros(self):
+        return len(self._quadros)
+
+
+    def _bruto(self, numero):
+        """
+        Lê e descomprime um quadro, sem despickle. Pode ser chamada de várias
+        threads ao mesmo tempo.
+        """
+        inicio, tamanho, _ = self._quadros[numero]
+        return self._descomprimir(os.pread(self._fd, tamanho, inicio))
+
+
+    def quadro(self, numero):
+        """
+        Registros de um quadro.
+        Args:
+            numero (int)
+        Return:
+            registros (list)
+        """
+        numero_cache, registros = self._cache
+        if numero_cache != numero:
+            registros = pkl.loads(self._bruto(numero))
+            self._cache = (numero, registros)
+        return registros
+
+
+    def quadros(self, numeros):
+        """
+        Descomprime os quadros pedidos em paralelo, no máximo uma janela de
+        quadros à frente do que já foi consumido.
+        Args:
+            numeros (iterable): números dos quadros.
+        Return:
+            gerador de (numero, registros), na ordem de numeros.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._threads)
+        janela = deque()
+        for numero in numeros:
+            janela.append((numero, self._executor.submit(self._bruto,
+                                                          numero)))
+            if len(janela) > self._threads:
+                numero, futuro = janela.popleft()
+                yield numero, pkl.loads(futuro.result())
+        while janela:
+            numero, futuro = janela.popleft()
+            yield numero, pkl.loads(futuro.result())
+
+
+    def _localizar(self, posicao):
+        if posicao < 0:
+            posicao += self._total
+        if not 0 <= posicao < self._total:
+            raise IndexError('posição fora do arquivo')
+        #todos os quadros têm por_quadro registros, menos o último
+        return divmod(posicao, self.por_quadro)
+
+
+    def __getitem__(self, posicao):
+        if isinstance(posicao, slice):
+            return self.ler(range(*posicao.indices(len(self))))
+        numero, deslocamento = self._localizar(posicao)
+        return self.quadro(numero)[deslocamento]
+
+
+    def ler(self, posicoes):
+        """
+        Lê vários registros, descomprimindo uma vez só, e em paralelo, os
+        quadros envolvidos.
+        Args:
+            posicoes (iterable): posições dos registros.
+        Return:
+            registros (list): na ordem de posicoes.
+        """
+        locais = [self._localizar(posicao) for posicao in posicoes]
+        lidos = dict(self.quadros(sorted(set(numero for numero, _
+                                             in locais))))
+        return [lidos[numero][deslocamento]
+                for numero, deslocamento in locais]
+
+
+    def __iter__(self):
+        for _, registros in self.quadros(range(len(self._quadros))):
+            yield from registros
+
+
+    def ids(self):
+        """
+        Ids de todos os registros, sem lê-los.
+        """
+        return list(self._ids)
+
+
+    def obter_por_id(self, id_):
+        """
+        Lê o registro com id_.
+        Args:
+            id_ (str)
+        Return:
+            registro: None se não existir.
+        """
+        posicao = self._ids.get(id_, self._ids.get(str(id_)))
+        if posicao is None:
+            return None
+        return self[posicao]
+
+
+    def fechar(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._cache = (None, None)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+def converter_proposicoes(sigla, ano, apensadas, por_quadro=256, nome=None,
+                          nivel=None):
+    """
+    Grava o arquivo de quadros de um arquivo de proposições já baixado.
+    Return:
+        total (int): None se o arquivo não existir.
+    """
+    arquivo = arquivo_proposicoes(sigla, ano, apensadas)
+    if not os.path.isfile(arquivo):
+        return None
+    props, numeros = carrega_proposicoes(arquivo, com_numeros=True)
+    return gravar_quadros(props, arquivo_quadros(arquivo),
+                          lambda prop: prop.id_, por_quadro, nome, nivel,
+                          numeros)
+
+
+def converter_deputados(por_quadro=256, nome=None, nivel=None):
+    """
+    Grava o arquivo de quadros de down_files/deputados.pkl.
+    Return:
+        total (int): None se o arquivo não existir.
+    """
+    if not os.path.isfile(ARQ_DEPUTADOS):
+        return None
+    with open(ARQ_DEPUTADOS, 'rb') as arq:
+        deputados = pkl.load(arq)
+    return gravar_quadros(deputados, arquivo_quadros(ARQ_DEPUTADOS),
+                          lambda deputado: deputado.ide_cadastro,
+                          por_quadro, nome, nivel)
+
+
+def abrir_proposicoes(sigla, ano, apensadas, threads=None):
+    """
+    Abre o arquivo de quadros das proposições de um ano. Os números da
+    listagem ficam em extra.
+    Return:
+        props (ArquivoQuadros)
+    """
+    return ArquivoQuadros(arquivo_quadros(
+        arquivo_proposicoes(sigla, ano, apensadas)), threads)
+
+
+def abrir_deputados(threads=None):
+    """
+    Abre o arquivo de quadros dos deputados.
+    Return:
+        deputados (ArquivoQuadros): ids são os ide_cadastro.
+    """
+    return ArquivoQuadros(arquivo_quadros(ARQ_DEPUTADOS), threads)
+
+
+def main():
+    #tratando os argumentos da linha de comando
+    parser = argparse.ArgumentParser(
+            description="""Grava os arquivos pickle já baixados em quadros
+                        comprimidos (zstd, lz4 ou zlib), com índice, para
+                        leitura parcial.""",
+            epilog="""Ex. de uso: ./quadros_comprimidos.py -deputados
+                   -anos 2011 2012 -tipos PL -apensadas -codificador zstd""")
+    parser.add_argument('-deputados', action='store_true',
+                        help="""converte down_files/deputados.pkl.""")
+    parser.add_argument('-anos', type=int, nargs='*', default=[],
+                        help="""anos das proposições já baixadas.""")
+    parser.add_argument('-tipos', type=str, nargs='*', default=[],
+                        help="""tipos de proposição já baixadas.""")
+    parser.add_argument('-apensadas', action='store_true',
+                        help="""indica se o arquivo das proposições já baixadas
+                             contém apensadas ou não.""")
+    parser.add_argument('-por_quadro', type=int, default=256,
+                        help="""registros em cada quadro. Padrão 256.""")
+    parser.add_argument('-codificador', type=str, default=None,
+                        choices=['zstd', 'lz4', 'zlib'],
+                        help="""compressão dos quadros. Padrão: o primeiro
+                             disponível entre zstd, lz4 e zlib.""")
+    parser.add_argument('-nivel', type=int, default=None,
+                        help="""nível de compressão. Padrão: o do
+                             codificador.""")
+    args = vars(parser.parse_args())
+    opcoes = (args['por_quadro'], args['codificador'], args['nivel'])
+    if args['deputados']:
+        total = converter_deputados(*opcoes)
+        print('{} deputados convertidos'.format(total))
+    for tp in args['tipos']:
+        for ano in args['anos']:
+            total = converter_proposicoes(tp, ano, args['apensadas'], *opcoes)
+            if total is None:
+                print('\tarquivo de {} {} não encontrado.'.format(tp, ano))
+            else:
+                print('{} proposições de {} {} convertidas'.format(
+                    total, tp, ano))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Acesso preguiçoso, registro a registro, às proposições e aos deputados
+baixados.
+
+Os arquivos pickle (prop_props_*.pkl, deputados.pkl) precisam ser carregados
+inteiros, mesmo para ler uma proposição só. Aqui os registros são gravados
+numa pasta, em fragmentos (fragmento_0000.pkl, ...) com até por_fragmento
+registros cada, um pickle por registro. O indice.pkl da pasta guarda, para
+cada registro, o fragmento, a posição e o tamanho, e o id de cada um:
+    props = abrir_proposicoes('PL', 2011, True)
+    props[10]                       #só esse registro é lido
+    props.obter_por_id('1110000295')
+
+Os fragmentos são lidos com mmap, então o acesso aleatório não depende do
+tamanho do ano.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import argparse
+from collections.abc import Sequence
+import mmap
+import os
+import pickle as pkl
+import shutil
+from indice_proposicoes import carrega_proposicoes
+from obter_proposicoes import arquivo_proposicoes
+
+
+ARQ_DEPUTADOS = 'down_files/deputados.pkl'
+
+
+def pasta_fragmentos(arquivo):
+    """
+    Pasta dos fragmentos de um arquivo pickle.
+    Ex.: down_files/prop_props_PL_2011_apens_True.fragmentos
+    """
+    return os.path.splitext(arquivo)[0] + '.fragmentos'
+
+
+def gravar_fragmentado(registros, pasta, id_de, por_fragmento=1000,
+                       extra=None):
+    """
+    Grava registros em fragmentos na pasta. A pasta é substituída inteira
+    só no fim, então uma gravação interrompida não estraga a anterior.
+    Args:
+        registros (iterable): objetos a gravar, em ordem.
+        pasta (str)
+        id_de (function): recebe um registro e retorna o id dele.
+        por_fragmento (int): registros em cada fragmento.
+        extra: guardado no índice (ex.: os números da listagem).
+    Return:
+        total (int): número de registros gravados.
+    """
+    tmp = pasta + '.tmp'
+    if os.path.isdir(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+    posicoes = []
+    ids = {}
+    arq = None
+    for posicao, registro in enumerate(registros):
+        fragmento = posicao // por_fragmento
+        if posicao % por_fragmento == 0:
+            if arq is not None:
+                arq.close()
+            arq = open(os.path.join(tmp, 'fragmento_{:04d}.pkl'.format(
+                fragmento)), 'wb')
+        dados = pkl.dumps(registro, pkl.HIGHEST_PROTOCOL)
+        posicoes.append((fragmento, arq.tell(), len(dados)))
+        arq.write(dados)
+        #se o id se repetir (ex.: apensada em dois lugares), vale o primeiro
+        ids.setdefault(id_de(registro), posicao)
+    if arq is not None:
+        arq.close()
+    with open(os.path.join(tmp, 'indice.pkl'), 'wb') as arq:
+        pkl.dump({'posicoes': posicoes, 'ids': ids, 'extra': extra}, arq)
+    if os.path.isdir(pasta):
+        shutil.rmtree(pasta)
+    os.replace(tmp, pasta)
+    return len(posicoes)
+
+
+class SequenciaPreguicosa(Sequence):
+    """
+    Sequência dos registros de uma pasta de fragmentos. Cada registro só é
+    lido (e despicklado) quando é acessado.
+    """
+
+
+    def __init__(self, pasta):
+        """
+        Método construtor. Carrega somente o índice.
+        Args:
+            pasta (str)
+        """
+        self.pasta = pasta
+        with open(os.path.join(pasta, 'indice.pkl'), 'rb') as arq:
+            indice = pkl.load(arq)
+        self._posicoes = indice['posicoes']
+        self._ids = indice['ids']
+        self.extra = indice['extra']
+        self._mmaps = {}
+
+
+    def _fragmento(self, fragmento):
+        """
+        mmap de um fragmento, aberto na primeira vez que é usado.
+        """
+        if fragmento not in self._mmaps:
+            with open(os.path.join(self.pasta, 'fragmento_{:04d}.pkl'.format(
+                    fragmento)), 'rb') as arq:
+                self._mmaps[fragmento] = mmap.mmap(arq.fileno(), 0,
+                                                   access=mmap.ACCESS_READ)
+        return self._mmaps[fragmento]
+
+
+    def __len__(self):
+        return len(self._posicoes)
+
+
+    def __getitem__(self, posicao):
+        if isinstance(posicao, slice):
+            return [self[i] for i in range(*posicao.indices(len(self)))]
+        fragmento, inicio, tamanho = self._posicoes[posicao]
+        return pkl.loads(self._fragmento(fragmento)[inicio:inicio + tamanho])
+
+
+    def ids(self):
+        """
+        Ids de todos os registros, sem lê-los.
+        """
+        return list(self._ids)
+
+
+    def obter_por_id(self, id_):
+        """
+        Lê o registro com id_.
+        Args:
+            id_ (str)
+        Return:
+            registro: None se não existir.
+        """
+        posicao = self._ids.get(id_, self._ids.get(str(id_)))
+        if posicao is None:
+            return None
+        return self[posicao]
+
+
+    def fechar(self):
+        for fragmento in self._mmaps.values():
+            fragmento.close()
+        self._mmaps = {}
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+def fragmentar_proposicoes(sigla, ano, apensadas, por_fragmento=1000):
+    """
+    Grava os fragmentos de um arquivo de proposições já baixado.
+    Return:
+        total (int): None se o arquivo não existir.
+    """
+    arquivo = arquivo_proposicoes(sigla, ano, apensadas)
+    if not os.path.isfile(arquivo):
+        return None
+    props, numeros = carrega_proposicoes(arquivo, com_numeros=True)
+    return gravar_fragmentado(props, pasta_fragmentos(arquivo),
+                              lambda prop: prop.id_, por_fragmento, numeros)
+
+
+def fragmentar_deputados(por_fragmento=1000):
+    """
+    Grava os fragmentos de down_files/deputados.pkl.
+    Return:
+        total (int): None se o arquivo não existir.
+    """
+    if not os.path.isfile(ARQ_DEPUTADOS):
+        return None
+    with open(ARQ_DEPUTADOS, 'rb') as arq:
+        deputados = pkl.load(arq)
+    return gravar_fragmentado(deputados, pasta_fragmentos(ARQ_DEPUTADOS),
+                              lambda deputado: deputado.ide_cadastro,
+                              por_fragmento)
+
+
+def abrir_proposicoes(sigla, ano, apensadas):
+    """
+    Abre os fragmentos das proposições de um ano. Os números da listagem
+    ficam em extra.
+    Return:
+        props (SequenciaPreguicosa)
+    """
+    return SequenciaPreguicosa(pasta_fragmentos(
+        arquivo_proposicoes(sigla, ano, apensadas)))
+
+
+def abrir_deputados():
+    """
+    Abre os fragmentos dos deputados.
+    Return:
+        deputados (SequenciaPreguicosa): ids são os ide_cadastro.
+    """
+    return SequenciaPreguicosa(pasta_fragmentos(ARQ_DEPUTADOS))
+
+
+def main():
+    #tratando os argumentos da linha de comando
+    parser = argparse.ArgumentParser(
+            description="""Grava os arquivos pickle já baixados em
+                        fragmentos, para acesso registro a registro.""",
+            epilog="""Ex. de uso: ./registros_fragmentados.py -deputados
+                   -anos 2011 2012 -tipos PL -apensadas""")
+    parser.add_argument('-deputados', action='store_true',
+                        help="""fragmenta down_files/deputados.pkl.""")
+    parser.add_argument('-anos', type=int, nargs='*', default=[],
+                        help="""anos das proposições já baixadas.""")
+    parser.add_argument('-tipos', type=str, nargs='*', default=[],
+                        help="""tipos de proposição já baixadas.""")
+    parser.add_argument('-apensadas', action='store_true',
+                        help="""indica se o arquivo das proposições já baixadas
+                             contém apensadas ou não.""")
+    parser.add_argument('-por_fragmento', type=int, default=1000,
+                        help="""registros em cada fragmento. Padrão 1000.""")
+    args = vars(parser.parse_args())
+    if args['deputados']:
+        total = fragmentar_deputados(args['por_fragmento'])
+        print('{} deputados fragmentados'.format(total))
+    for tp in args['tipos']:
+        for ano in args['anos']:
+            total = fragmentar_proposicoes(tp, ano, args['apensadas'],
+                                           args['por_fragmento'])
+            if total is None:
+                print('\tarquivo de {} {} não encontrado.'.format(tp, ano))
+            else:
+                print('{} proposições de {} {} fragmentadas'.format(
+                    total, tp, ano))
+
+if __name__ == '__main__':
+    main()
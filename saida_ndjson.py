@@ -0,0 +1,234 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Saída em NDJSON (um objeto json por linha) das proposições e dos deputados,
+usada pela opção -ndjson de obter_proposicoes.py e obter_deputados.py.
+
+Cada proposição ou deputado é escrito assim que termina de ser montado, ao
+lado do arquivo pickle:
+    down_files/prop_props_PL_2011_apens_True.ndjson
+    down_files/deputados.ndjson
+Os dados são descarregados no disco a cada intervalo segundos ou a cada
+max_pendentes registros, o que vier primeiro, então outro programa pode ler o
+arquivo enquanto o download ainda está em andamento. A ordem das linhas é a
+ordem em que os registros terminaram, não a da listagem.
+
+Com a saída ligada, os registros já escritos não ficam na memória durante o
+download: ficam no diário (proposições, ver diario_proposicoes.py) ou num
+arquivo temporário (deputados), e o pickle é montado a partir deles no fim.
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import json
+import os
+import threading
+import time
+from classes_base import ObjetoCompacto
+
+
+def arquivo_ndjson(arquivo):
+    """
+    Caminho do NDJSON de um arquivo pickle.
+    Ex.: down_files/prop_props_PL_2011_apens_True.ndjson
+    """
+    return os.path.splitext(arquivo)[0] + '.ndjson'
+
+
+def para_json(objeto):
+    """
+    Converte um objeto das classes de deputados ou proposições (e tudo o que
+    ele contém) em tipos do json. Os atributos não preenchidos são omitidos.
+    Args:
+        objeto
+    Return:
+        dict, list, str, int, float, bool ou None.
+    """
+    if isinstance(objeto, ObjetoCompacto):
+        estado = {}
+        for nome, valor in objeto.__getstate__().items():
+            if nome.startswith('_'):
+                #datas (CampoData): o slot guarda o número do dia
+                nome = nome[1:]
+                valor = getattr(objeto, nome)
+            estado[nome] = para_json(valor)
+        return estado
+    if isinstance(objeto, (list, tuple)):
+        return [para_json(item) for item in objeto]
+    if isinstance(objeto, dict):
+        return {str(chave): para_json(valor)
+                for chave, valor in objeto.items()}
+    if objeto is None or isinstance(objeto, (str, int, float, bool)):
+        return objeto
+    return str(objeto)
+
+
+class EscritorNDJSON:
+    """
+    Escreve registros num arquivo NDJSON, descarregando-os no disco em
+    intervalos limitados.
+    """
+
+
+    def __init__(self, caminho, intervalo=1.0, max_pendentes=100):
+        """
+        Método construtor. Um arquivo existente é substituído.
+        Args:
+            caminho (str)
+            intervalo (float): segundos no máximo entre dois descarregamentos.
+            max_pendentes (int): registros no máximo sem descarregar.
+        """
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.max_pendentes = max_pendentes
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._arq = open(caminho, 'w', encoding='utf-8')
+        self._pendentes = 0
+        self._ultimo = time.monotonic()
+        self._trava = threading.Lock()
+        self._fechado = threading.Event()
+        #sem novas escritas, o que ficou pendente é descarregado por esta
+        #thread depois de intervalo segundos
+        self._relogio = threading.Thread(target=self._descarregar_sempre,
+                                         daemon=True)
+        self._relogio.start()
+
+
+    def escrever(self, objeto):
+        """
+        Acrescenta objeto como uma linha json.
+        Args:
+            objeto: ver para_json.
+        """
+        linha = json.dumps(para_json(objeto), ensure_ascii=False) + '\n'
+        with self._trava:
+            self._arq.write(linha)
+            self._pendentes += 1
+            if self._pendentes >= self.max_pendentes or \
+                    time.monotonic() - self._ultimo >= self.intervalo:
+                self._descarregar()
+
+
+    def _descarregar(self):
+        self._arq.flush()
+        self._pendentes = 0
+        self._ultimo = time.monotonic()
+
+
+    def _descarregar_sempre(self):
+        """
+        Descarrega os registros pendentes há intervalo segundos, até o
+        arquivo ser fechado.
+        """
+        while not self._fechado.wait(self.intervalo):
+            with self._trava:
+                if self._pendentes > 0 and \
+                        time.monotonic() - self._ultimo >= self.intervalo:
+                    self._descarregar()
+
+
+    def fechar(self):
+        """
+        Descarrega o que estiver pendente e fecha o arquivo.
+        """
+        self._fechado.set()
+        with self._trava:
+            if not self._arq.closed:
+                self._descarregar()
+                self._arq.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+class SaidaNDJSON:
+    """
+    Configuração da saída NDJSON do processo, ligada pela opção -ndjson.
+    """
+
+
+    def __init__(self):
+        self.ativa = False
+        self.intervalo = 1.0
+        self.max_pendentes = 100
+
+
+    def ativar(self, intervalo=1.0, max_pendentes=100):
+        """
+        Liga a saída NDJSON.
+        Args:
+            intervalo (float)
+            max_pendentes (int)
+        """
+        self.ativa = True
+        self.intervalo = intervalo
+        self.max_pendentes = max_pendentes
+
+
+    def abrir(self, arquivo):
+        """
+        Abre o NDJSON de um arquivo pickle.
+        Args:
+            arquivo (str): caminho do arquivo pickle.
+        Return:
+            escritor (EscritorNDJSON): None se a saída estiver desligada.
+        """
+        if not self.ativa:
+            return None
+        return EscritorNDJSON(arquivo_ndjson(arquivo), self.intervalo,
+                              self.max_pendentes)
+
+
+def adicionar_argumentos(parser):
+    """
+    Acrescenta ao parser as opções da saída NDJSON.
+    Args:
+        parser (ArgumentParser)
+    """
+    parser.add_argument('-ndjson', action='store_true',
+                        help="""escreve também cada registro, assim que
+                             termina, num arquivo .ndjson ao lado do pickle.""")
+    parser.add_argument('-ndjson_intervalo', type=float, default=1.0,
+                        help="""segundos no máximo entre dois
+                             descarregamentos do .ndjson. Padrão 1.""")
+
+
+def aplicar_argumentos(args):
+    """
+    Liga a saída NDJSON conforme os argumentos lidos pelo parser.
+    Args:
+        args (dict)
+    """
+    if args['ndjson']:
+        SAIDA.ativar(args['ndjson_intervalo'])
+
+
+#saída do processo, ligada pela opção -ndjson
+SAIDA = SaidaNDJSON()
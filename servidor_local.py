@@ -0,0 +1,583 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Servidor HTTP local que faz o papel dos Web Services da Câmara (SitCamaraWS),
+para testes de carga e medições sem acessar os servidores reais.
+
+As respostas vêm de duas fontes, nessa ordem:
+    - respostas gravadas: uma pasta no formato do cache_ws (por exemplo o
+    down_files/cache preenchido com a opção -cache), procurada pela mesma
+    chave (endpoint mais parâmetros ordenados).
+    - gerador sintético: monta respostas determinísticas para ObterDeputados,
+    ObterDetalhesDeputado, ListarProposicoes, ObterProposicaoPorID e para os
+    documentos de inteiro teor (pdf ou docx mínimos), na escala desejada.
+
+Cada resposta pode ter latência e erros (503 e 429) sorteados de acordo com um
+perfil. Para usar o servidor, os scripts recebem a opção -url_base, que troca
+o host de todas as requisições:
+    ./servidor_local.py -porta 8080 -perfil realista
+    ./obter_proposicoes.py -anos 2011 -tipos PL -url_base http://localhost:8080
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import argparse
+import gzip
+import http.server
+import io
+import random
+import threading
+import time
+import urllib.parse
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+from cache_ws import CacheRespostas
+
+
+#latência em segundos (média e desvio) e probabilidade de cada erro
+PERFIS = {
+    'nenhum': {'latencia': 0.0, 'desvio': 0.0,
+               'taxa_erro': 0.0, 'taxa_429': 0.0},
+    'realista': {'latencia': 0.15, 'desvio': 0.1,
+                 'taxa_erro': 0.01, 'taxa_429': 0.0},
+    'instavel': {'latencia': 0.5, 'desvio': 0.5,
+                 'taxa_erro': 0.1, 'taxa_429': 0.05},
+}
+
+#o índice da sigla entra no id das proposições sintéticas
+SIGLAS = ['PL', 'PEC', 'PLP', 'MPV', 'PDC', 'REQ', 'INC', 'RIC', 'PRC', 'PLV']
+
+LINK_INTEIRO_TEOR = ('http://www.camara.gov.br/proposicoesWeb/'
+                     'prop_mostrarintegra?codteor={}')
+
+
+def elemento(tag, valor=None):
+    """
+    Monta um elemento xml simples.
+    Args:
+        tag (str)
+        valor: texto do elemento. None gera um elemento vazio.
+    """
+    if valor is None:
+        return '<{}/>'.format(tag)
+    return '<{0}>{1}</{0}>'.format(tag, escape(str(valor)))
+
+
+def pdf_minimo(texto):
+    """
+    Monta um pdf de uma página com texto (somente ascii).
+    Args:
+        texto (str)
+    Return:
+        pdf (bytes)
+    """
+    texto = texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    conteudo = 'BT /F1 12 Tf 72 720 Td ({}) Tj ET'.format(texto)
+    objetos = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+        '/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>',
+        '<< /Length {} >>\nstream\n{}\nendstream'.format(len(conteudo),
+                                                        conteudo),
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    pdf = '%PDF-1.4\n'
+    posicoes = []
+    for num, objeto in enumerate(objetos, 1):
+        posicoes.append(len(pdf))
+        pdf += '{} 0 obj\n{}\nendobj\n'.format(num, objeto)
+    xref = len(pdf)
+    pdf += 'xref\n0 {}\n0000000000 65535 f \n'.format(len(objetos) + 1)
+    for posicao in posicoes:
+        pdf += '{:010d} 00000 n \n'.format(posicao)
+    pdf += ('trailer\n<< /Size {} /Root 1 0 R >>\nstartxref\n{}\n%%EOF\n'
+            .format(len(objetos) + 1, xref))
+    return pdf.encode('ascii')
+
+
+def docx_minimo(texto):
+    """
+    Monta um docx com um parágrafo de texto.
+    Args:
+        texto (str)
+    Return:
+        docx (bytes)
+    """
+    arquivos = {
+        '[Content_Types].xml':
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'content-types"><Default Extension="rels" ContentType="'
+            'application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="'
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.'
+            'document.main+xml"/></Types>',
+        '_rels/.rels':
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+            '2006/relationships"><Relationship Id="rId1" Type="http://'
+            'schemas.openxmlformats.org/officeDocument/2006/relationships/'
+            'officeDocument" Target="word/document.xml"/></Relationships>',
+        'word/document.xml':
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+            'wordprocessingml/2006/main"><w:body><w:p><w:r><w:t>' +
+            escape(texto) + '</w:t></w:r></w:p></w:body></w:document>'}
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as docx:
+        for nome, conteudo in arquivos.items():
+            docx.writestr(nome, conteudo)
+    return saida.getvalue()
+
+
+class GeradorSintetico:
+    """
+    Gera respostas determinísticas no formato dos Web Services da Câmara. A
+    mesma requisição sempre gera a mesma resposta.
+    """
+
+
+    def __init__(self, proposicoes_por_ano=1000, deputados=513, semente=0):
+        """
+        Método construtor.
+        Args:
+            proposicoes_por_ano (int): proposições de cada (sigla, ano).
+            deputados (int): número de deputados.
+            semente (int): muda todos os dados gerados.
+        """
+        self.proposicoes_por_ano = proposicoes_por_ano
+        self.deputados = deputados
+        self.semente = semente
+
+
+    def _sorteio(self, *chave):
+        """
+        Gerador aleatório determinístico para chave.
+        """
+        return random.Random('{}-{}'.format(self.semente, chave))
+
+
+    def responder(self, caminho, params):
+        """
+        Monta a resposta de uma requisição.
+        Args:
+            caminho (str): caminho da url.
+            params (dict): parâmetros da consulta.
+        Return:
+            (tipo, corpo): None se o endpoint não é conhecido.
+        """
+        endpoint = caminho.rstrip('/').rsplit('/', 1)[-1]
+        try:
+            if endpoint == 'ObterDeputados':
+                return 'text/xml', self.obter_deputados()
+            if endpoint == 'ObterDetalhesDeputado':
+                return 'text/xml', self.obter_detalhes_deputado(
+                    int(params['ideCadastro']))
+            if endpoint == 'ListarProposicoes':
+                return 'text/xml', self.listar_proposicoes(
+                    params['sigla'], int(params['ano']),
+                    params.get('numero'))
+            if endpoint == 'ObterProposicaoPorID':
+                return 'text/xml', self.obter_proposicao(int(params['IdProp']))
+            if endpoint == 'prop_mostrarintegra':
+                return self.inteiro_teor(int(params['codteor']))
+        except (KeyError, ValueError):
+            return 'text/xml', b'<erro>Parametros invalidos</erro>'
+        return None
+
+
+    def obter_deputados(self):
+        """
+        Resposta do ObterDeputados.
+        """
+        itens = []
+        for num in range(self.deputados):
+            sorteio = self._sorteio('deputado', num)
+            itens.append('<deputado>' + ''.join([
+                elemento('ideCadastro', 100000 + num),
+                elemento('condicao', 'Titular'),
+                elemento('nome', 'DEPUTADO {}'.format(num)),
+                elemento('nomeParlamentar', 'DEP {}'.format(num)),
+                elemento('urlFoto', 'http://www.camara.gov.br/foto{}.jpg'
+                         .format(num)),
+                elemento('sexo', sorteio.choice(['masculino', 'feminino'])),
+                elemento('uf', sorteio.choice(['SP', 'RJ', 'MG', 'BA'])),
+                elemento('partido', sorteio.choice(['PA', 'PB', 'PC'])),
+                elemento('gabinete', num),
+                elemento('anexo', 4),
+                elemento('fone', '3215-{:04d}'.format(num)),
+                elemento('email', 'dep{}@camara.leg.br'.format(num))]) +
+                         '</deputado>')
+        return ('<deputados>' + ''.join(itens) + '</deputados>')\
+                .encode('utf-8')
+
+
+    def obter_detalhes_deputado(self, ide_cadastro):
+        """
+        Resposta do ObterDetalhesDeputado.
+        Args:
+            ide_cadastro (int)
+        """
+        num = ide_cadastro - 100000
+        sorteio = self._sorteio('deputado', num)
+        sexo = sorteio.choice(['masculino', 'feminino'])
+        uf_ = sorteio.choice(['SP', 'RJ', 'MG', 'BA'])
+        partido = sorteio.choice(['PA', 'PB', 'PC'])
+        dep = ''.join([
+            elemento('ideCadastro', ide_cadastro),
+            elemento('email', 'dep{}@camara.leg.br'.format(num)),
+            elemento('nomeProfissao', 'Advogado'),
+            elemento('dataNascimento', '01/01/19{}'.format(40 + num % 50)),
+            elemento('dataFalecimento'),
+            elemento('ufRepresentacaoAtual', uf_),
+            elemento('situacaoNaLegislaturaAtual', 'Em Exercício'),
+            elemento('nomeParlamentarAtual', 'DEP {}'.format(num)),
+            elemento('nomeCivil', 'DEPUTADO {}'.format(num)),
+            elemento('sexo', sexo),
+            '<partidoAtual>' + elemento('idPartido', partido) +
+            elemento('sigla', partido) +
+            elemento('nome', 'Partido {}'.format(partido)) + '</partidoAtual>',
+            '<gabinete>' + elemento('numero', num) + elemento('anexo', 4) +
+            elemento('telefone', '3215-{:04d}'.format(num)) + '</gabinete>',
+            '<comissoes/>',
+            '<cargosComissoes/>',
+            '<periodosExercicio><periodoExercicio>' +
+            elemento('siglaUFRepresentacao', uf_) +
+            elemento('situacaoExercicio', 'Em Exercício') +
+            elemento('dataInicio', '01/02/2015') + elemento('dataFim') +
+            elemento('idCausaFimExercicio') +
+            elemento('descricaoCausaFimExercicio') +
+            elemento('idCadastroParlamentarAnterior') +
+            '</periodoExercicio></periodosExercicio>',
+            '<historicoNomeParlamentar/>',
+            '<filiacoesPartidarias/>',
+            '<historicoLider/>'])
+        return ('<Deputados><Deputado>' + dep + '</Deputado></Deputados>')\
+                .encode('utf-8')
+
+
+    def _id_proposicao(self, sigla, ano, numero):
+        """
+        Id sintético de uma proposição: codifica ano, sigla e número.
+        """
+        if sigla in SIGLAS:
+            ind = SIGLAS.index(sigla)
+        else:
+            ind = len(SIGLAS) + zlib.crc32(sigla.encode('utf-8')) % 50
+        return ((ano - 1900) * 100 + ind) * 100000 + numero
+
+
+    def _decodifica_id(self, id_):
+        """
+        Recupera (sigla, ano, numero) de um id sintético.
+        """
+        numero = id_ % 100000
+        ano = id_ // 10000000 + 1900
+        ind = id_ // 100000 % 100
+        sigla = SIGLAS[ind] if ind < len(SIGLAS) else 'PL'
+        return sigla, ano, numero
+
+
+    def _proposicao(self, sigla, ano, numero):
+        """
+        Elemento <proposicao> do ListarProposicoes.
+        """
+        sorteio = self._sorteio('proposicao', sigla, ano, numero)
+        id_ = self._id_proposicao(sigla, ano, numero)
+        partido = sorteio.choice(['PA', 'PB', 'PC'])
+        dia = sorteio.randint(1, 28)
+        mes = sorteio.randint(1, 12)
+        return '<proposicao>' + ''.join([
+            elemento('id', id_),
+            elemento('nome', '{} {}/{}'.format(sigla, numero, ano)),
+            '<tipoProposicao>' + elemento('id', 100 + SIGLAS.index(sigla)
+                                          if sigla in SIGLAS else 199) +
+            elemento('sigla', sigla) +
+            elemento('nome', 'Tipo {}'.format(sigla)) + '</tipoProposicao>',
+            elemento('numero', numero),
+            elemento('ano', ano),
+            '<orgaoNumerador>' + elemento('id', 180) +
+            elemento('sigla', 'PLEN') + elemento('nome', 'PLENÁRIO') +
+            '</orgaoNumerador>',
+            elemento('datApresentacao', '{:02d}/{:02d}/{} 00:00:00'.format(
+                dia, mes, ano)),
+            elemento('txtEmenta', 'Dispõe sobre o assunto {} de {}.'.format(
+                numero, ano)),
+            elemento('txtExplicacaoEmenta'),
+            '<regime>' + elemento('codRegime', 99) +
+            elemento('txtRegime', 'Ordinária') + '</regime>',
+            '<apreciacao>' + elemento('id', 1) +
+            elemento('txtApreciacao', 'Proposição Sujeita à Apreciação '
+                     'Conclusiva pelas Comissões') + '</apreciacao>',
+            '<autor1>' +
+            elemento('txtNomeAutor', 'DEP {}'.format(numero % self.deputados)) +
+            elemento('idecadastro', 100000 + numero % self.deputados) +
+            elemento('codPartido', partido) +
+            elemento('txtSiglaPartido', partido) +
+            elemento('txtSiglaUF', 'SP') + '</autor1>',
+            elemento('qtdAutores', sorteio.randint(1, 3)),
+            '<ultimoDespacho>' +
+            elemento('datDespacho', '{:02d}/{:02d}/{}'.format(dia, mes, ano)) +
+            elemento('txtDespacho', 'Às Comissões.') + '</ultimoDespacho>',
+            '<situacao>' + elemento('id', 924) +
+            elemento('descricao', 'Aguardando Parecer') +
+            '<orgao>' + elemento('codOrgaoEstado', 2003) +
+            elemento('siglaOrgaoEstado', 'CCJC') + '</orgao>' +
+            '<principal>' + elemento('codProposicaoPrincipal', 0) +
+            elemento('proposicaoPrincipal') + '</principal></situacao>',
+            elemento('indGenero', 'o'),
+            elemento('qtdOrgaosComEstado', 1)]) + '</proposicao>'
+
+
+    def listar_proposicoes(self, sigla, ano, numero=None):
+        """
+        Resposta do ListarProposicoes.
+        Args:
+            sigla (str)
+            ano (int)
+            numero (str): se informado, só a proposição com esse número.
+        """
+        if numero:
+            numeros = [int(numero)]
+        else:
+            numeros = range(1, self.proposicoes_por_ano + 1)
+        numeros = [num for num in numeros
+                   if 1 <= num <= self.proposicoes_por_ano]
+        if not numeros:
+            return '<erro>Nenhuma proposição encontrada</erro>'\
+                    .encode('utf-8')
+        return ('<proposicoes>' +
+                ''.join(self._proposicao(sigla, ano, num) for num in numeros) +
+                '</proposicoes>').encode('utf-8')
+
+
+    def obter_proposicao(self, id_):
+        """
+        Resposta do ObterProposicaoPorID.
+        Args:
+            id_ (int)
+        """
+        sigla, ano, numero = self._decodifica_id(id_)
+        sorteio = self._sorteio('detalhes', id_)
+        apensadas = ''
+        #cerca de 20% das proposições têm apensadas, algumas inexistentes
+        if sorteio.random() < 0.2:
+            for _ in range(sorteio.randint(1, 3)):
+                num = sorteio.randint(1, int(self.proposicoes_por_ano * 1.1))
+                apensadas += ('<proposicao>' +
+                              elemento('nomeProposicao', '{} {}/{}'.format(
+                                  sigla, num, ano)) +
+                              elemento('codProposicao', self._id_proposicao(
+                                  sigla, ano, num)) + '</proposicao>')
+        indexacao = ','.join('termo{}'.format(sorteio.randint(1, 500))
+                             for _ in range(sorteio.randint(1, 8)))
+        return ('<proposicao>' + ''.join([
+            elemento('tema', sorteio.choice(['Saúde', 'Educação',
+                                             'Tributação', 'Trabalho'])),
+            elemento('Indexacao', indexacao),
+            elemento('LinkInteiroTeor', LINK_INTEIRO_TEOR.format(id_)),
+            '<apensadas>' + apensadas + '</apensadas>']) +
+                '</proposicao>').encode('utf-8')
+
+
+    def inteiro_teor(self, codteor):
+        """
+        Documento de inteiro teor: cerca de 70% pdf e 30% docx.
+        Args:
+            codteor (int)
+        Return:
+            (tipo, corpo)
+        """
+        sorteio = self._sorteio('inteiro_teor', codteor)
+        palavras = ' '.join('palavra{}'.format(sorteio.randint(1, 2000))
+                            for _ in range(sorteio.randint(50, 300)))
+        if sorteio.random() < 0.3:
+            return ('application/vnd.openxmlformats-officedocument.'
+                    'wordprocessingml.document', docx_minimo(palavras))
+        return 'application/pdf', pdf_minimo(palavras)
+
+
+class ServidorLocal(http.server.ThreadingHTTPServer):
+    """
+    Servidor dos Web Services locais.
+    """
+
+    daemon_threads = True
+
+
+    def __init__(self, endereco, fixtures=None, gerador=None,
+                 perfil='nenhum', **ajustes):
+        """
+        Método construtor.
+        Args:
+            endereco (tuple): (host, porta).
+            fixtures (str): pasta com respostas gravadas (formato do
+                cache_ws). None para não usar.
+            gerador (GeradorSintetico): None para responder 404 ao que não
+                estiver nas respostas gravadas.
+            perfil (str): chave de PERFIS.
+            ajustes: sobrescrevem os valores do perfil (latencia, desvio,
+                taxa_erro, taxa_429).
+        """
+        super().__init__(endereco, ManipuladorWS)
+        self.fixtures = CacheRespostas(fixtures, ttl=None,
+                                       tamanho_maximo=None) \
+                if fixtures else None
+        self.gerador = gerador
+        self.perfil = dict(PERFIS[perfil])
+        self.perfil.update({chave: valor for chave, valor in ajustes.items()
+                            if valor is not None})
+        self.requisicoes = 0
+        self._trava = threading.Lock()
+
+
+    def responder(self, caminho_completo):
+        """
+        Procura a resposta de uma requisição.
+        Args:
+            caminho_completo (str): caminho com a consulta.
+        Return:
+            (tipo, corpo): None se não houver resposta.
+        """
+        if self.fixtures is not None:
+            corpo = self.fixtures.ler(caminho_completo, ignorar_ttl=True)
+            if corpo is not None:
+                tipo = 'text/xml' if corpo.lstrip().startswith(b'<') \
+                        else 'application/octet-stream'
+                return tipo, corpo
+        if self.gerador is not None:
+            partes = urllib.parse.urlsplit(caminho_completo)
+            params = dict(urllib.parse.parse_qsl(partes.query))
+            return self.gerador.responder(partes.path, params)
+        return None
+
+
+class ManipuladorWS(http.server.BaseHTTPRequestHandler):
+    """
+    Trata cada requisição GET do ServidorLocal.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    #cabeçalho e corpo saem em escritas separadas; com o algoritmo de Nagle
+    #cada resposta esperaria o ACK atrasado do cliente
+    disable_nagle_algorithm = True
+
+
+    def do_GET(self):
+        servidor = self.server
+        perfil = servidor.perfil
+        with servidor._trava:
+            servidor.requisicoes += 1
+        latencia = max(0.0, random.gauss(perfil['latencia'], perfil['desvio']))
+        if latencia > 0:
+            time.sleep(latencia)
+        sorteio = random.random()
+        if sorteio < perfil['taxa_erro']:
+            self._enviar(503, 'text/plain', b'Service Unavailable')
+            return
+        if sorteio < perfil['taxa_erro'] + perfil['taxa_429']:
+            self._enviar(429, 'text/plain', b'Too Many Requests')
+            return
+        resposta = servidor.responder(self.path)
+        if resposta is None:
+            self._enviar(404, 'text/plain', b'Not Found')
+            return
+        self._enviar(200, *resposta)
+
+
+    def _enviar(self, status, tipo, corpo):
+        """
+        Envia a resposta, comprimida se o cliente aceitar gzip.
+        Args:
+            status (int)
+            tipo (str): Content-Type.
+            corpo (bytes)
+        """
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            corpo = gzip.compress(corpo, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    #tratando os argumentos da linha de comando
+    parser = argparse.ArgumentParser(
+        description="""Servidor local que imita os Web Services da Câmara,
+                    para testes sem acessar os servidores reais.""",
+        epilog="""Ex. de uso: ./servidor_local.py -porta 8080 -perfil
+               realista e, em outro terminal, ./obter_proposicoes.py -anos
+               2011 -tipos PL -url_base http://localhost:8080""")
+    parser.add_argument('-porta', type=int, default=8080,
+                        help="""porta do servidor. Padrão 8080.""")
+    parser.add_argument('-fixtures', type=str, default=None,
+                        help="""pasta com respostas gravadas no formato do
+                             cache (ex.: down_files/cache).""")
+    parser.add_argument('-sem_sintetico', action='store_true',
+                        help="""responde 404 ao que não estiver nas respostas
+                             gravadas, em vez de gerar uma resposta.""")
+    parser.add_argument('-proposicoes_por_ano', type=int, default=1000,
+                        help="""proposições geradas para cada (sigla, ano).
+                             Padrão 1000.""")
+    parser.add_argument('-deputados', type=int, default=513,
+                        help="""número de deputados gerados. Padrão 513.""")
+    parser.add_argument('-perfil', type=str, default='nenhum',
+                        choices=sorted(PERFIS),
+                        help="""perfil de latência e erros. Padrão nenhum.""")
+    parser.add_argument('-latencia', type=float, default=None,
+                        help="""latência média em segundos (sobrescreve o
+                             perfil).""")
+    parser.add_argument('-desvio', type=float, default=None,
+                        help="""desvio padrão da latência em segundos.""")
+    parser.add_argument('-taxa_erro', type=float, default=None,
+                        help="""fração das respostas com erro 503.""")
+    parser.add_argument('-taxa_429', type=float, default=None,
+                        help="""fração das respostas com erro 429.""")
+    args = vars(parser.parse_args())
+    gerador = None
+    if not args['sem_sintetico']:
+        gerador = GeradorSintetico(args['proposicoes_por_ano'],
+                                   args['deputados'])
+    servidor = ServidorLocal(('127.0.0.1', args['porta']), args['fixtures'],
+                             gerador, args['perfil'],
+                             latencia=args['latencia'],
+                             desvio=args['desvio'],
+                             taxa_erro=args['taxa_erro'],
+                             taxa_429=args['taxa_429'])
+    print('Servindo em http://127.0.0.1:{}'.format(args['porta']))
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Testes da tokenização aos pedaços do inteiro teor (tokens_inteiro_teor.py e
+obter_inteiro_teor.itera_paginas) e do vetor de tokens gravado em disco.
+Ex.: python3 -m unittest
+test_tokens_inteiro_teor
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from tokens_inteiro_teor import EscritorTokens
+from tokens_inteiro_teor import LeitorTokens
+from tokens_inteiro_teor import TokensDocumento
+from tokens_inteiro_teor import Vocabulario
+from tokens_inteiro_teor import tokenizar
+try:
+    from docx import Document
+    from obter_inteiro_teor import itera_paginas
+except ImportError:
+    itera_paginas = None
+
+
+PARAGRAFOS = ['PROJETO DE LEI', 'Dispõe sobre a', 'matéria.']
+
+
+class TestTokenizar(unittest.TestCase):
+
+
+    def test_token_partido_entre_pedacos(self):
+        texto = 'Art. 1º Esta lei entra em vigor na data de sua publicação.'
+        pedacos = [texto[i:i + 7] for i in range(0, len(texto), 7)]
+        self.assertEqual(list(tokenizar(pedacos)),
+                         [token for token in re.split(r'\W+', texto)
+                          if token])
+
+
+    def test_pedacos_com_separador(self):
+        self.assertEqual(list(tokenizar(p + '\n' for p in PARAGRAFOS)),
+                         ['PROJETO', 'DE', 'LEI', 'Dispõe', 'sobre', 'a',
+                          'matéria'])
+
+
+    def test_contagens(self):
+        doc = TokensDocumento(tokenizar(['a b a', ' c a']))
+        self.assertEqual(doc.tokens(), ['a', 'b', 'a', 'c', 'a'])
+        self.assertEqual(dict(zip(doc.termos, doc.contagens)),
+                         {'a': 3, 'b': 1, 'c': 1})
+
+
+class TestVetorTokens(unittest.TestCase):
+
+
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.base = os.path.join(self.pasta, 'prop_tokens')
+        self.vocabulario = os.path.join(self.pasta, 'vocabulario.txt')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.pasta)
+
+
+    def gravar(self, id_prop, tokens):
+        with EscritorTokens(self.base,
+                            Vocabulario(self.vocabulario)) as escritor:
+            escritor.adicionar(id_prop, tokens)
+
+
+    def test_proposicao_gravada_de_novo(self):
+        with EscritorTokens(self.base,
+                            Vocabulario(self.vocabulario)) as escritor:
+            escritor.adicionar('1', ['a', 'b', 'c'])
+            escritor.adicionar('2', ['d', 'e'])
+        self.gravar('1', ['f'])
+        self.gravar('3', ['x', 'y', 'z'])
+        leitor = LeitorTokens(self.base, Vocabulario(self.vocabulario))
+        self.assertEqual(leitor.tokens('1'), ['f'])
+        self.assertEqual(leitor.tokens('2'), ['d', 'e'])
+        self.assertEqual(leitor.tokens('3'), ['x', 'y', 'z'])
+
+
+@unittest.skipIf(itera_paginas is None,
+                 'precisa de python-docx, python-magic e pdfminer')
+class TestParagrafosDocx(unittest.TestCase):
+
+
+    def test_paragrafos_nao_sao_emendados(self):
+        documento = Document()
+        for paragrafo in PARAGRAFOS:
+            documento.add_paragraph(paragrafo)
+        arq, caminho = tempfile.mkstemp(suffix='.docx')
+        os.close(arq)
+        try:
+            documento.save(caminho)
+            tokens = list(tokenizar(itera_paginas(caminho)))
+        finally:
+            os.remove(caminho)
+        self.assertEqual(tokens, ['PROJETO', 'DE', 'LEI', 'Dispõe', 'sobre',
+                                  'a', 'matéria'])
+
+
+if __name__ == '__main__':
+    unittest.main()
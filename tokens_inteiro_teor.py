@@ -0,0 +1,406 @@
+#!/usr/bin/python3
+#-*- encoding: utf-8 -*-
+#Copyright (C) 2016  Saullo Oliveira
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Armazenamento dos tokens do inteiro teor fora dos objetos Proposicao.
+
+Cada token distinto é guardado uma vez só num vocabulário compartilhado por
+todos os anos (down_files/vocabulario.txt, um token por linha, e o número da
+linha é o id do token). Os tokens das proposições de um arquivo ficam num
+vetor de uint32 (ids do vocabulário), e um índice guarda onde começa e quantos
+tokens tem cada proposição:
+    down_files/prop_tokens_PL_2011_apens_True.u32
+    down_files/prop_tokens_PL_2011_apens_True.idx
+
+O vetor é lido com mmap: ler os tokens de uma proposição não carrega os das
+outras, e LeitorTokens.ids devolve uma fatia do próprio mmap, sem cópia.
+
+A tokenização (tokenizar, TokensDocumento) consome o texto aos pedaços, uma
+página do pdf ou um parágrafo do docx de cada vez, sem montar o documento
+inteiro. Cada documento guarda os seus termos distintos uma vez só, os ids
+locais dos tokens (uint32) e a contagem de cada termo; ao ser gravado, os ids
+locais são trocados pelos do vocabulário, e as contagens de cada proposição
+vão para o .cnt, prontas para indexação:
+    down_files/prop_tokens_PL_2011_apens_True.cnt
+"""
+__author__ = "Saullo Oliveira"
+__copyright__ = "Copyright 2016"
+__credits__ = ["Saullo Oliveira"]
+__license__ = "GPLv3"
+__version__ = "0.1"
+__maintainer__ = "Saullo Oliveira"
+__email__ = "shgo@dca.fee.unicamp.br"
+__status__ = "Development"
+
+import array
+from collections import Counter
+import mmap
+import os
+import pickle as pkl
+import re
+import threading
+from obter_proposicoes import arquivo_proposicoes
+
+
+#código do array para uint32
+CODIGO_UINT32 = 'I' if array.array('I').itemsize == 4 else 'L'
+
+#um token é uma sequência de caracteres de palavra, como em re.split(r'\W+')
+REGEX_TOKEN = re.compile(r'\w+')
+
+
+def arquivo_tokens(sigla, ano, apensadas):
+    """
+    Caminho, sem extensão, dos tokens de um arquivo de proposições.
+    Ex.: down_files/prop_tokens_PL_2011_apens_True
+    """
+    base = os.path.splitext(arquivo_proposicoes(sigla, ano, apensadas))[0]
+    return base.replace('prop_props_', 'prop_tokens_', 1)
+
+
+class Vocabulario:
+    """
+    Vocabulário compartilhado: token <-> id. O arquivo só recebe acréscimos,
+    então os ids já gravados nunca mudam.
+    """
+
+
+    def __init__(self, caminho='down_files/vocabulario.txt'):
+        """
+        Método construtor. Carrega o vocabulário salvo, se existir.
+        Args:
+            caminho (str)
+        """
+        self.caminho = caminho
+        self.tokens = []
+        self.ids = {}
+        self._novos = 0
+        self._trava = threading.Lock()
+        if os.path.isfile(caminho):
+            with open(caminho, encoding='utf-8') as arq:
+                for linha in arq:
+                    self.ids[linha[:-1]] = len(self.tokens)
+                    self.tokens.append(linha[:-1])
+
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+    def id_de(self, token):
+        """
+        Id de token, que é acrescentado ao vocabulário se for novo.
+        Args:
+            token (str)
+        """
+        id_ = self.ids.get(token)
+        if id_ is None:
+            with self._trava:
+                id_ = self.ids.get(token)
+                if id_ is None:
+                    id_ = self.ids[token] = len(self.tokens)
+                    self.tokens.append(token)
+                    self._novos += 1
+        return id_
+
+
+    def codificar(self, tokens):
+        """
+        Converte tokens em ids.
+        Args:
+            tokens (list): lista de str.
+        Return:
+            ids (array): array de uint32.
+        """
+        return array.array(CODIGO_UINT32, [self.id_de(token)
+                                           for token in tokens])
+
+
+    def decodificar(self, ids):
+        """
+        Converte ids em tokens.
+        Args:
+            ids: sequência de ints.
+        Return:
+            tokens (list)
+        """
+        return [self.tokens[id_] for id_ in ids]
+
+
+    def salvar(self):
+        """
+        Acrescenta ao arquivo os tokens novos.
+        """
+        with self._trava:
+            if not self._novos:
+                return
+            pasta = os.path.dirname(self.caminho)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            with open(self.caminho, 'a', encoding='utf-8') as arq:
+                for token in self.tokens[len(self.tokens) - self._novos:]:
+                    arq.write(token + '\n')
+            self._novos = 0
+
+
+def tokenizar(pedacos):
+    """
+    Tokeniza um texto que chega aos pedaços. Um token partido entre dois
+    pedaços é emendado, então o resultado é o mesmo de tokenizar o texto
+    inteiro: pedaços que não devem ser emendados (ex.: parágrafos) precisam
+    terminar com um separador, como '\n'.
+    Args:
+        pedacos (iterable): str.
+    Return:
+        gerador de tokens (str), sem tokens vazios.
+    """
+    resto = ''
+    for pedaco in pedacos:
+        pedaco = resto + pedaco
+        resto = ''
+        for token in REGEX_TOKEN.finditer(pedaco):
+            if token.end() == len(pedaco):
+                #pode continuar no próximo pedaço
+                resto = token.group()
+            else:
+                yield token.group()
+    if resto:
+        yield resto
+
+
+class TokensDocumento:
+    """
+    Tokens de um documento, com vocabulário local: cada termo distinto é
+    guardado uma vez, e os tokens são ids (uint32) nesse vocabulário.
+    """
+    __slots__ = ('termos', 'ids', 'contagens')
+
+
+    def __init__(self, tokens=()):
+        """
+        Método construtor.
+        Args:
+            tokens (iterable): str, por exemplo de tokenizar.
+        """
+        self.termos = []
+        self.ids = array.array(CODIGO_UINT32)
+        self.contagens = array.array(CODIGO_UINT32)
+        locais = {}
+        for token in tokens:
+            if not token:
+                continue
+            id_ = locais.get(token)
+            if id_ is None:
+                id_ = locais[token] = len(self.termos)
+                self.termos.append(token)
+                self.contagens.append(0)
+            self.ids.append(id_)
+            self.contagens[id_] += 1
+
+
+    def __len__(self):
+        return len(self.ids)
+
+
+    def tokens(self):
+        """
+        Tokens do documento, como str.
+        Return:
+            tokens (list)
+        """
+        termos = self.termos
+        return [termos[id_] for id_ in self.ids]
+
+
+    def remapear(self, vocabulario):
+        """
+        Troca o vocabulário local pelo compartilhado.
+        Args:
+            vocabulario (Vocabulario)
+        Return:
+            (ids, contagens): ids (array de uint32) dos tokens no vocabulário,
+                e contagens (dict) id do termo no vocabulário -> ocorrências.
+        """
+        globais = vocabulario.codificar(self.termos)
+        ids = array.array(CODIGO_UINT32, [globais[id_] for id_ in self.ids])
+        return ids, dict(zip(globais, self.contagens))
+
+
+class EscritorTokens:
+    """
+    Acrescenta os tokens de proposições ao vetor de um arquivo.
+    """
+
+
+    def __init__(self, base, vocabulario):
+        """
+        Método construtor. Se o vetor já existir, as proposições novas são
+        acrescentadas no fim.
+        Args:
+            base (str): caminho sem extensão (ver arquivo_tokens).
+            vocabulario (Vocabulario)
+        """
+        self.base = base
+        self.vocabulario = vocabulario
+        self.posicoes = {}
+        self.contagens = {}
+        if os.path.isfile(base + '.idx'):
+            with open(base + '.idx', 'rb') as arq:
+                self.posicoes = pkl.load(arq)
+        if os.path.isfile(base + '.cnt'):
+            with open(base + '.cnt', 'rb') as arq:
+                self.contagens = pkl.load(arq)
+        self._arq = open(base + '.u32', 'ab')
+        #o índice só conhece o que foi gravado até o último fechar; uma
+        #proposição gravada de novo deixa a região antiga sem uso, então o
+        #fim é o da região que termina por último
+        self._arq.truncate(max((inicio + tamanho for inicio, tamanho
+                                in self.posicoes.values()), default=0) * 4)
+        self._arq.seek(0, os.SEEK_END)
+        self._trava = threading.Lock()
+
+
+    def adicionar(self, id_prop, tokens):
+        """
+        Grava os tokens de uma proposição e as contagens dos seus termos.
+        Tokens vazios são descartados.
+        Args:
+            id_prop (str)
+            tokens (TokensDocumento ou list): list de str.
+        """
+        if not isinstance(tokens, TokensDocumento):
+            tokens = TokensDocumento(tokens)
+        ids, contagens = tokens.remapear(self.vocabulario)
+        with self._trava:
+            inicio = self._arq.tell() // 4
+            ids.tofile(self._arq)
+            self.posicoes[id_prop] = (inicio, len(ids))
+            self.contagens[id_prop] = contagens
+
+
+    def fechar(self):
+        """
+        Grava o índice, as contagens e o vocabulário.
+        """
+        self._arq.close()
+        self.vocabulario.salvar()
+        for extensao, dados in (('.cnt', self.contagens),
+                                ('.idx', self.posicoes)):
+            with open(self.base + extensao + '.tmp', 'wb') as arq:
+                pkl.dump(dados, arq)
+            os.replace(self.base + extensao + '.tmp', self.base + extensao)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+class LeitorTokens:
+    """
+    Lê os tokens das proposições de um arquivo, com mmap.
+    """
+
+
+    def __init__(self, base, vocabulario=None):
+        """
+        Método construtor.
+        Args:
+            base (str): caminho sem extensão (ver arquivo_tokens).
+            vocabulario (Vocabulario): necessário somente para tokens().
+        """
+        self.vocabulario = vocabulario
+        with open(base + '.idx', 'rb') as arq:
+            self.posicoes = pkl.load(arq)
+        self._contagens = {}
+        if os.path.isfile(base + '.cnt'):
+            with open(base + '.cnt', 'rb') as arq:
+                self._contagens = pkl.load(arq)
+        self._mmap = None
+        self._ids = memoryview(b'').cast(CODIGO_UINT32)
+        if os.path.getsize(base + '.u32'):
+            with open(base + '.u32', 'rb') as arq:
+                self._mmap = mmap.mmap(arq.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+            self._ids = memoryview(self._mmap).cast(CODIGO_UINT32)
+
+
+    def __contains__(self, id_prop):
+        return id_prop in self.posicoes
+
+
+    def __len__(self):
+        return len(self.posicoes)
+
+
+    def ids(self, id_prop):
+        """
+        Ids dos tokens de uma proposição, sem cópia.
+        Args:
+            id_prop (str)
+        Return:
+            ids (memoryview): de uint32. Vale enquanto o leitor estiver
+                aberto.
+        """
+        inicio, tamanho = self.posicoes[id_prop]
+        return self._ids[inicio:inicio + tamanho]
+
+
+    def tokens(self, id_prop):
+        """
+        Tokens de uma proposição, como str.
+        Args:
+            id_prop (str)
+        Return:
+            tokens (list)
+        """
+        return self.vocabulario.decodificar(self.ids(id_prop))
+
+
+    def contagens(self, id_prop):
+        """
+        Ocorrências de cada termo numa proposição.
+        Args:
+            id_prop (str)
+        Return:
+            contagens (dict): id do termo no vocabulário -> ocorrências.
+        """
+        if id_prop in self._contagens:
+            return self._contagens[id_prop]
+        #vetores gravados antes das contagens
+        return dict(Counter(self.ids(id_prop)))
+
+
+    def fechar(self):
+        self._ids.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                #ainda há fatias de ids() em uso: o mmap é fechado quando
+                #elas forem liberadas
+                pass
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.fechar()